@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+/api/devices latency while slots are churning
+
+Runs the portal's HTTP handler in-process with N pseudo-terminal slots.
+Churn threads start and stop every slot in a loop through the API
+(/api/start and /api/stop with "wait": true, i.e. each request lasts as
+long as the proxy start or stop), while pollers hit /api/devices like the
+dashboard and CI discovery do.  Reports /api/devices latency percentiles for
+
+  single    - http.server.HTTPServer (the portal before, one request at a time)
+  threaded  - http.server.ThreadingHTTPServer (the portal now)
+
+Usage:
+    python3 pi/bench/bench_api_latency.py [-n SLOTS] [-t SECONDS] [--pollers N]
+"""
+
+import argparse
+import http.client
+import http.server
+import json
+import os
+import pty
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PI_DIR)
+
+import portal  # noqa: E402
+
+
+class QuietHandler(portal.Handler):
+    def log_message(self, fmt, *args):
+        pass
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body else None,
+                     headers={'Content-Type': 'application/json'})
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    finally:
+        conn.close()
+
+
+def setup_slots(n, base_port):
+    portal.PROXY_PATHS = [os.path.join(PI_DIR, 'serial_proxy.py')]
+    portal.LOG_DIR = tempfile.mkdtemp()
+    portal.slots = {}
+    fds = []
+    for i in range(n):
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        fds += [master, slave]
+        key = f'bench-{i}'
+        slot = portal._make_dynamic_slot(key)
+        slot.update(label=f'BENCH{i}', tcp_port=base_port + i, devnode=os.ttyname(slave))
+        portal.slots[key] = slot
+    return fds
+
+
+def run(server_cls, duration, pollers):
+    httpd = server_cls(('127.0.0.1', 0), QuietHandler)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    stop = threading.Event()
+    latencies = []
+    cycles = [0]
+
+    def churn(slot):
+        body = {'slot_key': slot['slot_key'], 'devnode': slot['devnode'], 'wait': True}
+        while not stop.is_set():
+            request(port, 'POST', '/api/start', body)
+            request(port, 'POST', '/api/stop', body)
+            cycles[0] += 1
+
+    def poll():
+        while not stop.is_set():
+            start = time.perf_counter()
+            status, _ = request(port, 'GET', '/api/devices')
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert status == 200
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=churn, args=(s,)) for s in portal.slots.values()]
+    threads += [threading.Thread(target=poll) for _ in range(pollers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    httpd.shutdown()
+    httpd.server_close()
+    for slot in portal.slots.values():
+        with slot['_lock']:
+            portal.stop_proxy(slot)
+    return latencies, cycles[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/devices latency under slot churn')
+    parser.add_argument('-n', '--slots', type=int, default=4)
+    parser.add_argument('-t', '--duration', type=float, default=10.0)
+    parser.add_argument('--pollers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=14500)
+    args = parser.parse_args()
+
+    setup_slots(args.slots, args.port)
+    for name, cls in (('single', http.server.HTTPServer),
+                      ('threaded', http.server.ThreadingHTTPServer)):
+        lat, cycles = run(cls, args.duration, args.pollers)
+        lat.sort()
+        p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+        print(f"{name:8s} requests {len(lat):5d}   p50 {statistics.median(lat):8.1f} ms   "
+              f"p99 {p99:8.1f} ms   max {lat[-1]:8.1f} ms   churn cycles {cycles}")
+
+
+if __name__ == '__main__':
+    main()
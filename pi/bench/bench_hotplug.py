@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Hotplug event to proxy start latency: udev netlink monitor vs. notify script
+
+Runs the portal's slot machinery in-process with a pseudo-terminal exposed
+as a ttyACM device and injects synthetic hotplug events, measuring
+
+  seen   - event injected until the slot is marked present
+  ready  - event injected until the slot's proxy reports ready
+
+for two delivery paths:
+
+  netlink - a libudev-format uevent sent to the portal's UdevMonitor over a
+            datagram socket (what udev multicasts on NETLINK_KOBJECT_UEVENT)
+  script  - rfc2217-udev-notify.sh (bash + curl) posting to /api/hotplug,
+            the path taken by the udev rule minus systemd-run
+
+Usage:
+    python3 pi/bench/bench_hotplug.py [-n RUNS] [--no-script]
+"""
+
+import argparse
+import http.server
+import os
+import pty
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PI_DIR)
+
+import portal  # noqa: E402
+
+NOTIFY_SCRIPT = os.path.join(PI_DIR, 'scripts', 'rfc2217-udev-notify.sh')
+ID_PATH = 'platform-bench-usb-0:1.1:1.0'
+DEVPATH = '/devices/platform/bench/usb1/1-1/1-1.1/1-1.1:1.0/tty/ttyACM0'
+
+
+def libudev_message(props):
+    """Encode *props* the way libudev's monitor sends them"""
+    payload = b''.join(f'{k}={v}'.encode() + b'\0' for k, v in props.items())
+    header_size = 40  # prefix, magic, 3 sizes, 2 filter hashes, tag bloom
+    header = portal.UDEV_HEADER.pack(b'libudev\0', header_size, header_size, len(payload))
+    header = header[:8] + portal.UDEV_MAGIC.pack(portal.UDEV_MONITOR_MAGIC) + header[12:]
+    return header.ljust(header_size, b'\0') + payload
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise RuntimeError('timed out')
+        time.sleep(0.0002)
+    return time.monotonic()
+
+
+class Bench:
+    def __init__(self, port):
+        portal.PROXY_PATHS = [os.path.join(PI_DIR, 'serial_proxy.py')]
+        portal.LOG_DIR = tempfile.mkdtemp()
+        self.dev_dir = tempfile.mkdtemp()
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.slave = slave
+        self.devnode = os.path.join(self.dev_dir, 'ttyACM0')
+        os.symlink(os.ttyname(slave), self.devnode)
+
+        self.slot = portal._make_dynamic_slot(ID_PATH)
+        self.slot.update(label='BENCH', tcp_port=port)
+        portal.slots = {ID_PATH: self.slot}
+        portal.pool = portal.ProxyPool(portal.PROXY_PATHS[0], portal.POOL_SIZE)
+        portal.pool.fill()
+        wait_until(lambda: len(portal.pool._idle) >= portal.POOL_SIZE)
+
+        self.inject, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        # Injected by this (possibly unprivileged) process, not by udev
+        portal.UdevMonitor(theirs, trusted_uids=(0, os.getuid())).start()
+        self.seqnum = 1000
+        self.scripts = []
+
+        self.httpd = http.server.HTTPServer(('127.0.0.1', 0), portal.Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def send_netlink(self, action):
+        self.seqnum += 1
+        self.inject.send(libudev_message({
+            'ACTION': action, 'DEVPATH': DEVPATH, 'SUBSYSTEM': 'tty',
+            'DEVNAME': self.devnode, 'SEQNUM': self.seqnum, 'ID_PATH': ID_PATH,
+        }))
+
+    def send_script(self, action):
+        self.seqnum += 1
+        self.scripts.append(subprocess.Popen(['bash', NOTIFY_SCRIPT, action, self.devnode, ID_PATH, DEVPATH,
+                          str(self.seqnum)],
+                         env=dict(os.environ, RFC2217_PORTAL_URL=self.url),
+                         stdout=subprocess.DEVNULL))
+
+    def cycle(self, send):
+        slot = self.slot
+        start = time.monotonic()
+        send('add')
+        seen = wait_until(lambda: slot['present'])
+        ready = wait_until(lambda: slot['running'])
+        send('remove')
+        wait_until(lambda: not slot['present'] and not slot['running'])
+        # Give the pool time to pre-start the next worker
+        wait_until(lambda: len(portal.pool._idle) >= portal.POOL_SIZE)
+        return (seen - start) * 1000, (ready - start) * 1000
+
+    def close(self):
+        for proc in self.scripts:
+            proc.wait()
+        self.httpd.shutdown()
+        portal.pool.close()
+        shutil.rmtree(self.dev_dir)
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hotplug latency benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    parser.add_argument('--port', type=int, default=14300)
+    parser.add_argument('--no-script', action='store_true',
+                        help='Skip the bash + curl notify script path')
+    args = parser.parse_args()
+
+    bench = Bench(args.port)
+    paths = [('netlink', bench.send_netlink)]
+    if not args.no_script and shutil.which('curl'):
+        paths.append(('script', bench.send_script))
+    try:
+        for name, send in paths:
+            results = [bench.cycle(send) for _ in range(args.runs)]
+            seen = [r[0] for r in results]
+            ready = [r[1] for r in results]
+            print(f"{name:8s} seen  median {statistics.median(seen):7.2f} ms   max {max(seen):7.2f} ms")
+            print(f"{name:8s} ready median {statistics.median(ready):7.2f} ms   max {max(ready):7.2f} ms")
+    finally:
+        bench.close()
+
+
+if __name__ == '__main__':
+    main()
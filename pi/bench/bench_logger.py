@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for serial log line rendering
+
+Compares the original per-character renderer (strftime on every call,
+character-by-character escaping) against TextRenderer.data on
+ESP32 boot-log text and on binary-heavy (flash/SLIP-like) input, and
+checks that both produce identical output.
+
+Usage:
+    python3 pi/bench/bench_logger.py [-n ITERATIONS]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from serial_proxy import TextRenderer  # noqa: E402
+
+ESP32_BOOT = (
+    b"ets Jun  8 2016 00:22:57\r\n\r\n"
+    b"rst:0x1 (POWERON_RESET),boot:0x13 (SPI_FAST_FLASH_BOOT)\r\n"
+    b"configsip: 0, SPIWP:0xee\r\n"
+    b"clk_drv:0x00,q_drv:0x00,d_drv:0x00,cs0_drv:0x00,hd_drv:0x00,wp_drv:0x00\r\n"
+    b"mode:DIO, clock div:2\r\nload:0x3fff0030,len:1184\r\n"
+    b"\x1b[0;32mI (29) boot: ESP-IDF v5.1.2 2nd stage bootloader\x1b[0m\r\n"
+    b"\x1b[0;32mI (29) boot: compile time Jan 10 2026 12:00:00\x1b[0m\r\n"
+    b"\x1b[0;32mI (31) boot: Multicore bootloader\x1b[0m\r\n"
+    b"\x1b[0;32mI (35) boot: chip revision: v3.0\x1b[0m\r\n"
+    b"\x1b[0;33mW (120) wifi: connecting to AP...\x1b[0m\r\n"
+)
+
+
+def legacy_format(ts, direction, data):
+    """Renderer as shipped before the fast path (reference)"""
+    timestamp = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    lines = []
+    text = data.decode('utf-8', errors='replace')
+    printable = ''.join(c if c.isprintable() or c in '\n\r\t' else f'\\x{ord(c):02x}' for c in text)
+    for line in printable.split('\n'):
+        if line.strip():
+            lines.append(f"[{timestamp}] [{direction}] {line.rstrip()}\n")
+    return lines
+
+
+def make_inputs():
+    rng = random.Random(2217)
+    boot = [ESP32_BOOT[i:i + 256] for i in range(0, len(ESP32_BOOT), 256)] * 40
+    binary = [bytes(rng.randrange(256) for _ in range(1024)) for _ in range(64)]
+    return {'esp32-boot': boot, 'binary': binary}
+
+
+def bench(fn, chunks, iterations):
+    ts = time.time()
+    total = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for chunk in chunks:
+            ts += 0.0003
+            fn(ts, 'RX', chunk)
+            total += len(chunk)
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SerialLogger rendering benchmark')
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    renderer = TextRenderer()
+    for name, chunks in make_inputs().items():
+        ts = time.time()
+        for chunk in chunks:
+            assert renderer.data(ts, 'RX', chunk) == legacy_format(ts, 'RX', chunk), name
+
+        old = bench(legacy_format, chunks, args.iterations)
+        new = bench(renderer.data, chunks, args.iterations)
+        print(f"{name:12s} legacy {old / 1e6:7.2f} MB/s   fast {new / 1e6:7.2f} MB/s   "
+              f"x{new / old:.1f}")
+
+
+if __name__ == '__main__':
+    main()
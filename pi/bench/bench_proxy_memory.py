@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Memory and CPU of one proxy process per slot vs. the multi-slot daemon
+
+Starts N slots on pseudo-terminals twice: once as N separate
+serial_proxy.py processes (today's portal model) and once as a single
+serial_proxy.py --daemon with N slots added over its control socket.
+Each slot gets a client that echoes a burst of serial traffic, then the
+resident memory and CPU time of the proxy process(es) are reported.
+
+Usage:
+    python3 pi/bench/bench_proxy_memory.py [-n SLOTS] [--bytes BYTES]
+"""
+
+import argparse
+import json
+import os
+import pty
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tty
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PI_DIR)
+
+from serial_proxy import process_usage  # noqa: E402
+
+PROXY = os.path.join(PI_DIR, 'serial_proxy.py')
+BASE_PORT = 14000
+
+
+def open_ptys(n):
+    ptys = []
+    for _ in range(n):
+        master, slave = pty.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        ptys.append((master, slave))
+    return ptys
+
+
+def wait_port(port, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"port {port} never came up")
+
+
+def control(path, msg):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(json.dumps(msg).encode() + b'\n')
+        return json.loads(s.makefile('rb').readline())
+
+
+def drive(ptys, ports, nbytes):
+    """Push *nbytes* from every device to its client and drain it"""
+    clients = [socket.create_connection(('127.0.0.1', port)) for port in ports]
+    time.sleep(0.2)
+    block = bytes(range(32, 127)) * 40 + b'\r\n'
+    for (master, _), client in zip(ptys, clients):
+        sent = 0
+        while sent < nbytes:
+            os.write(master, block)
+            sent += len(block)
+            client.settimeout(5)
+            received = 0
+            while received < len(block):
+                received += len(client.recv(65536))
+    for client in clients:
+        client.close()
+
+
+def report(name, pids, n):
+    usages = [process_usage(pid) for pid in pids]
+    rss = sum(u['rss_kb'] for u in usages)
+    cpu = sum(u['cpu_s'] for u in usages)
+    print(f"{name:8s} processes {len(pids):3d}   RSS {rss / 1024:7.1f} MB "
+          f"({rss / n / 1024:5.1f} MB/slot)   CPU {cpu:6.2f} s ({cpu / n:5.3f} s/slot)")
+
+
+def bench_processes(n, nbytes, log_dir):
+    ptys = open_ptys(n)
+    ports = [BASE_PORT + i for i in range(n)]
+    procs = [subprocess.Popen([sys.executable, PROXY, '-p', str(port), '-l', log_dir,
+                               '--log-name', f'P{i}', os.ttyname(slave)],
+                              stdout=subprocess.DEVNULL)
+             for i, (port, (_, slave)) in enumerate(zip(ports, ptys))]
+    try:
+        for port in ports:
+            wait_port(port)
+        drive(ptys, ports, nbytes)
+        report('process', [p.pid for p in procs], n)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+def bench_daemon(n, nbytes, log_dir):
+    ptys = open_ptys(n)
+    ports = [BASE_PORT + 100 + i for i in range(n)]
+    path = os.path.join(log_dir, 'proxyd.sock')
+    proc = subprocess.Popen([sys.executable, PROXY, '--daemon', '--control', path,
+                             '-l', log_dir], stdout=subprocess.DEVNULL)
+    try:
+        while not os.path.exists(path):
+            time.sleep(0.05)
+        for i, (port, (_, slave)) in enumerate(zip(ports, ptys)):
+            reply = control(path, {'cmd': 'add', 'label': f'D{i}',
+                                   'device': os.ttyname(slave), 'port': port})
+            assert reply['ok'], reply
+        drive(ptys, ports, nbytes)
+        report('daemon', [proc.pid], n)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-slot proxy memory/CPU benchmark')
+    parser.add_argument('-n', '--slots', type=int, default=8)
+    parser.add_argument('--bytes', type=int, default=256 * 1024,
+                        help='Serial bytes pushed through each slot (default: 256 KiB)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        bench_processes(args.slots, args.bytes, log_dir)
+        bench_daemon(args.slots, args.bytes, log_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Proxy start latency: cold spawn vs. assignment to a warm pool worker
+
+Measures the time from the portal's decision to start a slot until the
+proxy reports "listening" on its status channel, for
+
+  cold  - python3 serial_proxy.py ... --listen-fd --notify-fd (what the
+          portal does without a pool)
+  warm  - a serial_proxy.py --standby worker that has already started and
+          imported everything, handed the slot over its socketpair
+
+using pseudo-terminals as devices.
+
+Usage:
+    python3 pi/bench/bench_proxy_startup.py [-n RUNS]
+"""
+
+import argparse
+import json
+import os
+import pty
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tty
+
+PROXY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'serial_proxy.py')
+
+
+def wait_for(events, name):
+    """Read status lines from the buffered file *events* until *name* arrives"""
+    for line in events:
+        if json.loads(line)['event'] == name:
+            return
+    raise RuntimeError('proxy exited')
+
+
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(8)
+    return sock
+
+
+def device():
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, slave
+
+
+def cold(log_dir):
+    master, slave = device()
+    sock = listener()
+    notify_r, notify_w = os.pipe()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, PROXY, '-l', log_dir,
+                             '--listen-fd', str(sock.fileno()), '--notify-fd', str(notify_w),
+                             os.ttyname(slave)],
+                            pass_fds=(sock.fileno(), notify_w), stdout=subprocess.DEVNULL)
+    os.close(notify_w)
+    events = open(notify_r, 'rb')
+    wait_for(events, 'listening')
+    elapsed = time.perf_counter() - start
+    proc.terminate()
+    proc.wait()
+    events.close()
+    for fd in (master, slave):
+        os.close(fd)
+    sock.close()
+    return elapsed
+
+
+def warm(log_dir):
+    master, slave = device()
+    sock = listener()
+    ours, theirs = socket.socketpair()
+    proc = subprocess.Popen([sys.executable, PROXY, '-l', log_dir, '--standby', str(theirs.fileno())],
+                            pass_fds=(theirs.fileno(),), stdout=subprocess.DEVNULL)
+    theirs.close()
+    events = ours.makefile('rb')
+    wait_for(events, 'standby')
+
+    start = time.perf_counter()
+    request = {'label': 'BENCH', 'device': os.ttyname(slave), 'port': sock.getsockname()[1]}
+    socket.send_fds(ours, [json.dumps(request).encode() + b'\n'], [sock.fileno()])
+    wait_for(events, 'listening')
+    elapsed = time.perf_counter() - start
+    proc.terminate()
+    proc.wait()
+    for fd in (master, slave):
+        os.close(fd)
+    events.close()
+    ours.close()
+    sock.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Proxy start latency benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        for name, fn in (('cold', cold), ('warm', warm)):
+            times = [fn(log_dir) * 1000 for _ in range(args.runs)]
+            print(f"{name:5s} median {statistics.median(times):7.1f} ms   "
+                  f"min {min(times):7.1f} ms   max {max(times):7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Log reading throughput and CPU: raw port vs. RFC2217 port
+
+Runs serial_proxy.py as a subprocess on a pseudo-terminal with a raw port
+next to its RFC2217 port.  A forked writer pushes random data into the
+device side, paced at --rate, while one client reads it:
+
+  rfc2217  - pyserial's rfc2217:// client (telnet negotiation, IAC
+             decoding on every read), as a monitor or log collector uses it
+  raw      - a plain TCP socket on the raw port (read-only observer)
+
+Both ports share the proxy's RX path, so proxy CPU should match; the
+difference is what the reading side pays.  Reports MB/s, proxy CPU per MB
+(from /proc, including its log writer thread) and client CPU per MB.
+
+The rate keeps pyserial's reader thread ahead of the proxy's per-client
+queue limit; a client that falls behind gets overflow drops instead of data.
+The RFC2217 run must not see 0xFF (the proxy does not escape it on the
+way out), so the payload has every 0xFF replaced by 0xFE for both runs.
+
+Usage:
+    python3 pi/bench/bench_raw.py [-m MB] [--rate MB/s] [--chunk BYTES] [--log-format text|binary]
+"""
+
+import argparse
+import os
+import pty
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tty
+
+import serial
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PI_DIR)
+
+import serial_proxy as sp  # noqa: E402
+
+
+def wait_listening(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'proxy not listening on {port}')
+            time.sleep(0.05)
+
+
+def start_writer(master, payload, chunk, rate):
+    """Fork a process that writes *payload* to the device side at *rate* bytes/s"""
+    pid = os.fork()
+    if pid == 0:
+        view = memoryview(payload)
+        start = time.monotonic()
+        for i in range(0, len(view), chunk):
+            os.write(master, view[i:i + chunk])
+            ahead = start + (i + chunk) / rate - time.monotonic()
+            if ahead > 0:
+                time.sleep(ahead)
+        os._exit(0)
+    return pid
+
+
+def measure(proxy_pid, master, payload, chunk, rate, read):
+    """Read len(payload) bytes with *read*; returns (s, proxy CPU s, client CPU s)"""
+    proxy_cpu = sp.process_usage(proxy_pid)['cpu_s']
+    client_cpu = time.process_time()
+    start = time.perf_counter()
+    writer = start_writer(master, payload, chunk, rate)
+    got = 0
+    while got < len(payload):
+        data = read()
+        if not data:
+            raise RuntimeError(f'EOF after {got} of {len(payload)} bytes')
+        got += len(data)
+    elapsed = time.perf_counter() - start
+    client_cpu = time.process_time() - client_cpu
+    os.waitpid(writer, 0)
+    # /proc counts CPU in clock ticks; let the last ones land
+    time.sleep(0.05)
+    return elapsed, sp.process_usage(proxy_pid)['cpu_s'] - proxy_cpu, client_cpu
+
+
+def run_rfc2217(proxy_pid, master, port, payload, chunk, rate):
+    client = serial.serial_for_url(f'rfc2217://127.0.0.1:{port}?ign_set_control', baudrate=115200, timeout=5)
+    try:
+        time.sleep(0.2)     # negotiation settles
+        return measure(proxy_pid, master, payload, chunk, rate, lambda: client.read(65536))
+    finally:
+        client.close()
+        time.sleep(0.2)
+
+
+def run_raw(proxy_pid, master, port, payload, chunk, rate):
+    with socket.create_connection(('127.0.0.1', port)) as conn:
+        conn.settimeout(5)
+        time.sleep(0.2)     # let the proxy register the session
+        result = measure(proxy_pid, master, payload, chunk, rate, lambda: conn.recv(65536))
+    time.sleep(0.2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Raw vs. RFC2217 port benchmark')
+    parser.add_argument('-m', '--megabytes', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=0.1,
+                        help='Device output rate in MB/s (default: 0.1, about 921600 baud)')
+    parser.add_argument('--chunk', type=int, default=4096,
+                        help='Bytes per device write (default: 4096)')
+    parser.add_argument('--log-format', choices=('text', 'binary'), default='binary')
+    parser.add_argument('--port', type=int, default=14700)
+    args = parser.parse_args()
+
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    raw_port = args.port + 2000
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(PI_DIR, 'serial_proxy.py'), '-p', str(args.port),
+         '--raw-port', str(raw_port), '--scrollback-bytes', '0', '-l', tempfile.mkdtemp(),
+         '--log-format', args.log_format, os.ttyname(slave)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_listening(args.port)
+        wait_listening(raw_port)
+        payload = os.urandom(args.megabytes * 1024 * 1024).replace(b'\xff', b'\xfe')
+        mb = len(payload) / (1024 * 1024)
+        rate = args.rate * 1024 * 1024
+        print(f"{mb:.0f} MB random data at {args.rate:g} MB/s, {args.chunk}-byte writes, "
+              f"{args.log_format} log")
+        for name, run, port in (('rfc2217', run_rfc2217, args.port), ('raw', run_raw, raw_port)):
+            elapsed, proxy_cpu, client_cpu = run(proc.pid, master, port, payload, args.chunk, rate)
+            print(f"{name:8s} {mb / elapsed:7.1f} MB/s   proxy CPU {proxy_cpu * 1000 / mb:6.1f} ms/MB   "
+                  f"client CPU {client_cpu * 1000 / mb:6.1f} ms/MB")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Bootloader entry: network-driven DTR/RTS toggling vs. ESP_RESET in the proxy
+
+Runs serial_proxy's RFC2217Proxy in-process on a pseudo-terminal whose far
+end is a simulated ESP32.  The simulated chip follows the auto-reset
+circuit (DTR -> IO0, RTS -> EN): when EN is released it samples IO0
+SAMPLE_DELAY later (the EN RC delay) and enters the ROM download mode if
+IO0 is low, where it answers esptool SYNC frames.
+
+The client reaches the proxy through a relay that delays each packet it
+forwards by a random 0..JITTER ms while keeping their order, as a congested
+Wi-Fi link does.  For each run the client resets the chip and then sends
+SYNC frames until one is answered or SYNC_WINDOW has passed:
+
+  network  - esptool's classic reset as separate SET_CONTROL packets,
+             timed on the client
+  server   - one ESP_RESET "classic" request, timed in the proxy
+
+and reports the success rate and time from reset start to a SYNC reply.
+
+Usage:
+    python3 pi/bench/bench_reset.py [-n RUNS] [--jitter MS] [--sample-delay MS]
+"""
+
+import argparse
+import os
+import pty
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+import serial
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PI_DIR)
+
+import serial_proxy as sp  # noqa: E402
+
+SYNC_FRAME = (b'\xc0\x00\x08\x24\x00\x00\x00\x00\x00'
+              + b'\x07\x07\x12\x20' + b'\x55' * 32 + b'\xc0')
+SYNC_REPLY = b'\xc0\x01\x08\x04\x00\x00\x00\x00\x00\x00\x00\x00\x00\xc0'
+SYNC_WINDOW = 1.0       # seconds of SYNC attempts after a reset
+SYNC_INTERVAL = 0.05    # esptool waits this long for each SYNC reply
+
+
+class SimulatedChip:
+    """ESP32 strapping and ROM download mode behind the pty master *fd*"""
+
+    def __init__(self, fd, sample_delay):
+        self.fd = fd
+        self.sample_delay = sample_delay
+        self.dtr = self.rts = False
+        self.download = False
+        self._lock = threading.Lock()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def io0_low(self):
+        return self.dtr and not self.rts
+
+    def en_low(self):
+        return self.rts and not self.dtr
+
+    def set_lines(self, dtr, rts):
+        with self._lock:
+            was_reset = self.en_low()
+            self.dtr, self.rts = dtr, rts
+            if self.en_low() and not was_reset:
+                self.download = False
+            elif was_reset and not self.en_low():
+                threading.Timer(self.sample_delay, self._boot).start()
+
+    def _boot(self):
+        with self._lock:
+            if self.en_low():
+                return
+            self.download = self.io0_low()
+        banner = b'waiting for download\r\n' if self.download else b'app running\r\n'
+        os.write(self.fd, banner)
+
+    def _serve(self):
+        buf = b''
+        while True:
+            try:
+                buf += os.read(self.fd, 4096)
+            except OSError:
+                return
+            while SYNC_FRAME in buf:
+                buf = buf.split(SYNC_FRAME, 1)[1]
+                if self.download:
+                    os.write(self.fd, SYNC_REPLY)
+            buf = buf[-len(SYNC_FRAME):]
+
+
+class SimulatedPort(serial.Serial):
+    """pyserial port whose DTR/RTS changes go to the simulated chip"""
+
+    chip = None
+
+    def _update_dtr_state(self):
+        self.chip.set_lines(self._dtr_state, self._rts_state)
+
+    def _update_rts_state(self):
+        self.chip.set_lines(self._dtr_state, self._rts_state)
+
+
+class BenchProxy(sp.RFC2217Proxy):
+    def open_serial(self):
+        self.serial = SimulatedPort(self.device, baudrate=self.baudrate, timeout=0, write_timeout=0)
+        os.set_blocking(self.serial.fileno(), False)
+
+
+class JitterRelay:
+    """TCP relay delaying client -> proxy chunks by 0..jitter s, in order"""
+
+    def __init__(self, target_port, jitter):
+        self.target_port = target_port
+        self.jitter = jitter
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.sock.accept()
+            upstream = socket.create_connection(('127.0.0.1', self.target_port))
+            for s in (client, upstream):
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._forward, args=(client, upstream, self.jitter),
+                             daemon=True).start()
+            threading.Thread(target=self._forward, args=(upstream, client, 0),
+                             daemon=True).start()
+
+    @staticmethod
+    def _forward(src, dst, jitter):
+        release = 0.0
+        while True:
+            try:
+                data = src.recv(4096)
+            except OSError:
+                data = b''
+            if not data:
+                try:
+                    dst.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                return
+            if jitter:
+                release = max(release, time.monotonic() + random.uniform(0, jitter))
+                time.sleep(max(0.0, release - time.monotonic()))
+            try:
+                dst.sendall(data)
+            except OSError:
+                return
+
+
+def com_port(subcmd, payload):
+    return bytes([sp.IAC, sp.SB, sp.COM_PORT_OPTION, subcmd]) + payload + bytes([sp.IAC, sp.SE])
+
+
+def network_reset(conn):
+    """esptool's ClassicReset as individual SET_CONTROL packets"""
+    for op, value in sp.RESET_SEQUENCES['classic']:
+        if op == 'sleep':
+            time.sleep(value)
+        elif op == 'dtr':
+            conn.sendall(com_port(sp.SET_CONTROL, bytes([8 if value else 9])))
+        else:
+            conn.sendall(com_port(sp.SET_CONTROL, bytes([11 if value else 12])))
+
+
+def server_reset(conn):
+    conn.sendall(com_port(sp.ESP_RESET, b'classic'))
+    wait_for(conn, bytes([sp.ESP_RESET + 100]) + b'ok', 2.0)
+
+
+def wait_for(conn, needle, timeout):
+    """Read from *conn* until *needle* arrives; True if it did"""
+    deadline = time.monotonic() + timeout
+    buf = b''
+    while needle not in buf:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        conn.settimeout(remaining)
+        try:
+            data = conn.recv(4096)
+        except socket.timeout:
+            return False
+        if not data:
+            return False
+        buf = buf[-len(needle):] + data
+    return True
+
+
+def attempt(port, reset):
+    """Reset, then SYNC until answered.  Returns ms to the SYNC reply or None."""
+    with socket.create_connection(('127.0.0.1', port)) as conn:
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        start = time.monotonic()
+        reset(conn)
+        deadline = time.monotonic() + SYNC_WINDOW
+        while time.monotonic() < deadline:
+            conn.sendall(SYNC_FRAME)
+            if wait_for(conn, SYNC_REPLY, SYNC_INTERVAL):
+                return (time.monotonic() - start) * 1000
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reset sequence benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--jitter', type=float, default=80.0,
+                        help='Maximum added delay per client packet in ms (default: 80)')
+    parser.add_argument('--sample-delay', type=float, default=10.0,
+                        help='Time from EN release to IO0 sampling in ms (default: 10)')
+    args = parser.parse_args()
+
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    SimulatedPort.chip = SimulatedChip(master, args.sample_delay / 1000)
+    proxy = BenchProxy(os.ttyname(slave), 0, log_dir=tempfile.mkdtemp())
+    proxy.listen_socket = socket.create_server(('127.0.0.1', 0))
+    threading.Thread(target=proxy.run, daemon=True).start()
+    while proxy.server_socket is None:
+        time.sleep(0.01)
+    relay = JitterRelay(proxy.port, args.jitter / 1000)
+
+    print(f"jitter 0..{args.jitter:.0f} ms per packet, IO0 sampled {args.sample_delay:.0f} ms "
+          f"after EN release")
+    for name, reset in (('network', network_reset), ('server', server_reset)):
+        results = []
+        for _ in range(args.runs):
+            results.append(attempt(relay.port, reset))
+            # The next connection must find the controlling seat free
+            while proxy.client is not None:
+                time.sleep(0.005)
+        synced = [r for r in results if r is not None]
+        line = f"{name:8s} synced {len(synced):3d}/{len(results)}"
+        if synced:
+            line += (f"   time-to-sync median {statistics.median(synced):7.1f} ms   "
+                     f"max {max(synced):7.1f} ms")
+        print(line)
+    proxy.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Crash detection and recovery time of the portal's proxy supervision
+
+Runs the portal's slot machinery in-process against pseudo-terminal
+devices, SIGKILLs the slot's proxy and measures
+
+  detect   - kill until the slot is marked down (pidfd exit + reap)
+  recover  - kill until a restarted proxy reports ready again; includes
+             the first restart backoff (RESTART_BACKOFF_BASE)
+
+and checks that no zombie is left behind.  Before pidfd supervision a
+killed proxy was only noticed by a later /api/devices call, and an
+unreaped zombie kept passing the kill(pid, 0) liveness check.
+
+Usage:
+    python3 pi/bench/bench_supervision.py [-n RUNS]
+"""
+
+import argparse
+import os
+import pty
+import signal
+import statistics
+import sys
+import tempfile
+import time
+import tty
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PI_DIR)
+
+import portal  # noqa: E402
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise RuntimeError('timed out')
+        time.sleep(0.0005)
+    return time.monotonic()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Proxy supervision benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    parser.add_argument('--port', type=int, default=14200)
+    args = parser.parse_args()
+
+    portal.PROXY_PATHS = [os.path.join(PI_DIR, 'serial_proxy.py')]
+    portal.LOG_DIR = tempfile.mkdtemp()
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    slot = portal._make_dynamic_slot('bench')
+    slot.update(label='BENCH', tcp_port=args.port, devnode=os.ttyname(slave), present=True)
+    portal.slots = {'bench': slot}
+    assert portal.start_proxy(slot), slot['last_error']
+
+    detect, recover = [], []
+    for _ in range(args.runs):
+        pid = slot['pid']
+        killed = time.monotonic()
+        os.kill(pid, signal.SIGKILL)
+        detect.append((wait_until(lambda: not slot['running']) - killed) * 1000)
+        recover.append((wait_until(lambda: slot['running']) - killed) * 1000)
+        try:
+            os.waitpid(pid, os.WNOHANG)
+            print(f"pid {pid} was not reaped")
+        except ChildProcessError:
+            pass
+        # Let the proxy stay up long enough for the backoff to reset
+        slot['_up_since'] -= portal.RESTART_RESET_AFTER
+
+    print(f"detect   median {statistics.median(detect):7.1f} ms   max {max(detect):7.1f} ms")
+    print(f"recover  median {statistics.median(recover):7.1f} ms   max {max(recover):7.1f} ms   "
+          f"(backoff {portal.RESTART_BACKOFF_BASE * 1000:.0f} ms)")
+    print(f"slot metrics: restarts={slot['restarts']} recover_ms={slot['recover_ms']}")
+    with slot['_lock']:
+        portal.stop_proxy(slot)
+
+
+if __name__ == '__main__':
+    main()
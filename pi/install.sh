@@ -20,11 +20,14 @@ sudo mkdir -p /var/log/serial
 echo "Installing scripts..."
 sudo cp "$SCRIPT_DIR/portal.py" /usr/local/bin/rfc2217-portal
 sudo cp "$SCRIPT_DIR/serial_proxy.py" /usr/local/bin/serial_proxy.py
+sudo cp "$SCRIPT_DIR/usb_sysfs.py" /usr/local/bin/usb_sysfs.py
 sudo cp "$SCRIPT_DIR/rfc2217-learn-slots" /usr/local/bin/rfc2217-learn-slots
+sudo cp "$SCRIPT_DIR/rfc2217-log-export" /usr/local/bin/rfc2217-log-export
 
 sudo chmod +x /usr/local/bin/rfc2217-portal
 sudo chmod +x /usr/local/bin/serial_proxy.py
 sudo chmod +x /usr/local/bin/rfc2217-learn-slots
+sudo chmod +x /usr/local/bin/rfc2217-log-export
 
 # Install udev notify script
 echo "Installing udev notify script..."
@@ -43,9 +46,13 @@ fi
 echo "Installing systemd services..."
 sudo cp "$SCRIPT_DIR/systemd/rfc2217-portal.service" /etc/systemd/system/
 
-# Install udev rules
-echo "Installing udev rules..."
-sudo cp "$SCRIPT_DIR/udev/99-rfc2217-hotplug.rules" /etc/udev/rules.d/
+# The portal receives hotplug events from udev's netlink socket itself.
+# The udev rule (systemd-run + curl per event) is only needed when the
+# portal runs with RFC2217_UDEV_MONITOR=0; remove copies left by older installs.
+if [ -f /etc/udev/rules.d/99-rfc2217-hotplug.rules ]; then
+    echo "Removing legacy udev hotplug rule..."
+    sudo rm -f /etc/udev/rules.d/99-rfc2217-hotplug.rules
+fi
 
 # Reload systemd and udev
 echo "Reloading systemd and udev..."
@@ -7,17 +7,31 @@ serial_proxy.py lifecycle.  On hotplug add → start proxy; on remove → stop i
 Slot configuration is loaded from slots.json.
 """
 
+import base64
+import errno
+import glob
+import gzip
+import hashlib
 import http.server
 import json
 import os
+import queue
+import re
+import selectors
+import shutil
 import signal
 import socket
+import struct
 import subprocess
 import sys
+import tempfile
 import threading
 import time
+from collections import deque
 from datetime import datetime, timezone
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, unquote, urlparse
+
+import usb_sysfs  # installed alongside
 
 PORT = 8080
 CONFIG_FILE = os.environ.get("RFC2217_CONFIG", "/etc/rfc2217/slots.json")
@@ -27,12 +41,114 @@ PROXY_PATHS = [
     "/usr/local/bin/serial-proxy",
 ]
 LOG_DIR = "/var/log/serial"
+# Backlog of the pre-bound slot sockets; holds clients while a proxy starts
+LISTEN_BACKLOG = 8
+# Default replay port of a slot (scrollback, then live data): tcp_port + this
+REPLAY_PORT_OFFSET = 1000
+# Default raw port of a slot (bytes verbatim, no telnet/RFC2217): tcp_port + this
+RAW_PORT_OFFSET = 2000
+# Seconds a proxy may take to report "listening" on its notify pipe
+PROXY_READY_TIMEOUT = 5.0
+# Restart backoff for crashed proxies: BASE * 2**n seconds, capped at MAX;
+# a proxy that stayed up RESET_AFTER seconds starts again from BASE
+RESTART_BACKOFF_BASE = 0.5
+RESTART_BACKOFF_MAX = 30.0
+RESTART_RESET_AFTER = 60.0
+# Idle pre-started proxies kept for fast hotplug starts (process mode only)
+POOL_SIZE = int(os.environ.get("RFC2217_PROXY_POOL", "1"))
+# Receive hotplug events straight from udev's netlink multicast group
+UDEV_MONITOR = os.environ.get("RFC2217_UDEV_MONITOR", "1") != "0"
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_GROUP_UDEV = 2
+# libudev message header: "libudev\0", magic (big-endian), header size,
+# properties offset and length (the filter fields that follow are unused)
+UDEV_HEADER = struct.Struct("=8s4xIII")
+UDEV_MAGIC = struct.Struct(">I")
+UDEV_MONITOR_MAGIC = 0xFEEDCAFE
+UCRED = struct.Struct("=iII")
+HOTPLUG_TTY_PREFIXES = ("ttyACM", "ttyUSB")
+# Finished start/stop jobs kept for GET /api/jobs/<id>
+JOB_HISTORY = 256
+# Seconds a request with "wait": true waits for its job before getting 202
+JOB_WAIT_TIMEOUT = 30.0
+# Largest JSON body accepted by the control endpoints
+MAX_JSON_BODY = 64 * 1024
+# Local flashing (POST /api/flash): esptool command, default baud rate,
+# body limits (JSON with base64 images, or raw images streamed to disk in
+# FLASH_CHUNK pieces, up to the largest ESP32 flash) and how long one
+# esptool run may take
+ESPTOOL = os.environ.get("RFC2217_ESPTOOL", f"{sys.executable} -m esptool").split()
+FLASH_BAUD = int(os.environ.get("RFC2217_FLASH_BAUD", "921600"))
+FLASH_MAX_JSON = 8 * 1024 * 1024
+FLASH_MAX_UPLOAD = 16 * 1024 * 1024
+FLASH_CHUNK = 64 * 1024
+FLASH_TIMEOUT = 600
+# esptool progress: "Writing at 0x00010000... (37 %)" (v4) or
+# "Writing at 0x00010000 [====>   ]  37.5% ..." (v5)
+FLASH_PROGRESS_RE = re.compile(r"Writing at (0x[0-9a-fA-F]+)\D*?(\d+(?:\.\d+)?) ?%")
+# Slot change events kept for GET /api/events?since=<seq>
+EVENT_HISTORY = 1000
+# Seconds between keepalive comments on an idle /api/events stream
+SSE_KEEPALIVE = 15.0
+# /api/devices checks proxy liveness at most this often (seconds); the
+# watcher already reports exits as they happen
+HEALTH_INTERVAL = 1.0
+# Seconds a built /api/info body is reused (it includes proxy memory/CPU)
+INFO_TTL = 2.0
+# Responses at least this large are gzipped for clients that accept it
+GZIP_MIN_SIZE = 512
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = 30
+# Per-slot log and scrollback settings; top-level keys in slots.json set
+# the defaults.  log_retention_bytes budgets the whole log directory, so it
+# is only read from the top level (GLOBAL_LOG_SETTINGS)
+LOG_SETTINGS = {
+    "log_format": "text",
+    "log_max_bytes": 0,
+    "log_compress": "none",
+    "log_retention_bytes": 0,
+    "log_flash": "summary",
+    "scrollback_bytes": 64 * 1024,
+}
+GLOBAL_LOG_SETTINGS = ("log_retention_bytes",)
+
+# "process": one serial_proxy per slot; "daemon": one serial_proxy --daemon
+# serving every slot, driven over its control socket
+PROXY_MODE = os.environ.get("RFC2217_PROXY_MODE", "process")
+DAEMON_CONTROL = os.environ.get("RFC2217_PROXY_CONTROL", "/run/rfc2217/proxyd.sock")
 
 # Module-level state
 slots: dict[str, dict] = {}
 seq_counter: int = 0
 host_ip: str = "127.0.0.1"
 hostname: str = "localhost"
+hotplug_lock = threading.Lock()
+daemon_lock = threading.Lock()
+daemon_proc: subprocess.Popen | None = None
+# Orders slot start/stop against exit notifications from the watcher thread
+state_lock = threading.Lock()
+watcher = None
+watcher_lock = threading.Lock()
+pool = None
+jobs: dict[int, dict] = {}
+# Published slot changes (oldest first) for /api/events; seq of the newest
+# event that fell out of the history
+events: deque[dict] = deque(maxlen=EVENT_HISTORY)
+events_evicted: int = 0
+events_cond = threading.Condition()
+# Prebuilt response bodies: name -> (etag, body, gzipped body, built at)
+response_cache: dict[str, tuple] = {}
+cache_lock = threading.Lock()
+# Distinguishes ETags of this portal run from those of an earlier one
+BOOT_TAG = format(time.time_ns(), "x")
+health_checked: float = 0.0
+health_lock = threading.Lock()
+job_counter: int = 0
+jobs_lock = threading.Lock()
+# Notified whenever a job changes state or reports progress
+jobs_changed = threading.Condition(jobs_lock)
+# The job a slot worker thread is running, for job bodies that report progress
+worker_job = threading.local()
 
 
 # ---------------------------------------------------------------------------
@@ -47,10 +163,22 @@ def load_config(path: str) -> dict[str, dict]:
             cfg = json.load(f)
         for entry in cfg.get("slots", []):
             key = entry["slot_key"]
+            settings = {k: entry.get(k, cfg.get(k, v)) for k, v in LOG_SETTINGS.items()}
+            for k in GLOBAL_LOG_SETTINGS:
+                if k in entry:
+                    print(f"[portal] {entry['label']}: per-slot {k} ignored, "
+                          f"set it at top level", flush=True)
+                settings[k] = cfg.get(k, LOG_SETTINGS[k])
+            replay_port = None
+            if settings["scrollback_bytes"] > 0:
+                replay_port = entry.get("replay_port", entry["tcp_port"] + REPLAY_PORT_OFFSET)
             result[key] = {
                 "label": entry["label"],
                 "slot_key": key,
                 "tcp_port": entry["tcp_port"],
+                "replay_port": replay_port,
+                "raw_port": entry.get("raw_port", entry["tcp_port"] + RAW_PORT_OFFSET),
+                **settings,
                 "present": False,
                 "running": False,
                 "pid": None,
@@ -60,7 +188,26 @@ def load_config(path: str) -> dict[str, dict]:
                 "last_event_ts": None,
                 "url": None,
                 "last_error": None,
+                "client": None,
+                "observers": [],
+                "flashing": False,
+                "restarts": 0,
+                "detect_ms": None,
+                "recover_ms": None,
                 "_lock": threading.Lock(),
+                "_listener": None,
+                "_replay_listener": None,
+                "_raw_listener": None,
+                "_proc": None,
+                "_fatal": None,
+                "_fatal_ts": None,
+                "_failures": 0,
+                "_restart_timer": None,
+                "_down_since": None,
+                "_up_since": None,
+                "_seqnum": None,
+                "_jobs": None,
+                "_published": None,
             }
         print(f"[portal] loaded {len(result)} slot(s) from {path}", flush=True)
     except FileNotFoundError:
@@ -87,8 +234,10 @@ def get_hostname() -> str:
     return socket.gethostname()
 
 
-def _find_proxy_exe() -> str | None:
+def _find_proxy_exe(daemon: bool = False) -> str | None:
     for p in PROXY_PATHS:
+        if daemon and "serial" not in os.path.basename(p):
+            continue
         if os.path.exists(p):
             return p
     return None
@@ -109,6 +258,474 @@ def wait_for_device(devnode: str, timeout: float = 5.0) -> bool:
     return False
 
 
+class ProxyWatcher:
+    """Selector loop, on its own thread, supervising proxy processes.
+
+    For every proxy it reads the status channel (newline-delimited JSON from
+    the proxy's StatusNotifier) and waits on a pidfd, so an exit is noticed
+    and reaped the moment it happens instead of at the next health check.
+    Callbacks run on the watcher thread.
+    """
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._buffers: dict[int, bytes] = {}
+        threading.Thread(target=self._run, name="proxy-watcher", daemon=True).start()
+
+    def supervise(self, proc: subprocess.Popen, notify_fd: int | None, on_message, on_exit):
+        """Watch *proc* until it exits.
+
+        on_message(obj) runs for each status line read from *notify_fd*
+        (None for proxies without one; the watcher closes it).  on_exit(code)
+        runs once, after the process has been reaped and its last messages
+        delivered.  Without pidfd support (Linux < 5.3) the exit is taken
+        from EOF on *notify_fd*, or from a waiter thread if there is none.
+        """
+        try:
+            pidfd = os.pidfd_open(proc.pid)
+        except (AttributeError, OSError):
+            pidfd = None
+        if pidfd is None and notify_fd is None:
+            threading.Thread(target=lambda: self._call(on_exit, proc.wait()), daemon=True).start()
+            return
+        if notify_fd is not None:
+            os.set_blocking(notify_fd, False)
+        watch = {"proc": proc, "notify": notify_fd, "pidfd": pidfd,
+                 "on_message": on_message, "on_exit": on_exit}
+        with self._lock:
+            self._pending.append(watch)
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._register_pending()
+                    continue
+                kind, watch = key.data
+                if kind == "notify":
+                    self._read(watch)
+                elif self._selector.get_map().get(key.fd) is key:
+                    self._exited(watch)
+
+    def _register_pending(self):
+        try:
+            while os.read(self._wakeup_r, 512):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for watch in pending:
+            if watch["notify"] is not None:
+                self._buffers[watch["notify"]] = b""
+                self._selector.register(watch["notify"], selectors.EVENT_READ, ("notify", watch))
+            if watch["pidfd"] is not None:
+                self._selector.register(watch["pidfd"], selectors.EVENT_READ, ("exit", watch))
+
+    def _read(self, watch: dict) -> bool:
+        """Deliver complete lines from the status channel; False once nothing is left."""
+        fd = watch["notify"]
+        if fd is None:
+            return False
+        try:
+            data = os.read(fd, 4096)
+        except BlockingIOError:
+            return False
+        except OSError:
+            data = b""
+        if not data:
+            self._selector.unregister(fd)
+            os.close(fd)
+            del self._buffers[fd]
+            watch["notify"] = None
+            if watch["pidfd"] is None:
+                self._exited(watch)
+            return False
+        lines = (self._buffers[fd] + data).split(b"\n")
+        self._buffers[fd] = lines.pop()
+        for line in lines:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            self._call(watch["on_message"], msg)
+        return True
+
+    def _exited(self, watch: dict):
+        if watch["pidfd"] is not None:
+            self._selector.unregister(watch["pidfd"])
+            os.close(watch["pidfd"])
+            watch["pidfd"] = None
+            # Deliver whatever the proxy wrote before exiting (e.g. "fatal")
+            while self._read(watch):
+                pass
+            if watch["notify"] is not None:
+                fd = watch["notify"]
+                self._selector.unregister(fd)
+                os.close(fd)
+                del self._buffers[fd]
+                watch["notify"] = None
+        try:
+            code = watch["proc"].wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            code = None
+        self._call(watch["on_exit"], code)
+
+    @staticmethod
+    def _call(callback, *args):
+        try:
+            callback(*args)
+        except Exception as exc:
+            print(f"[portal] proxy watcher: {exc!r}", flush=True)
+
+
+class ProxyPool:
+    """Idle, pre-started serial_proxy workers for fast slot starts.
+
+    A worker (``serial_proxy.py --standby FD``) has already paid for the
+    interpreter start and imports and waits on its end of a socketpair.
+    assign() sends it the slot and the pre-bound listening socket; the
+    portal's end of the pair then carries the worker's status notifications
+    exactly like a --notify-fd pipe.  Each assignment refills the pool in
+    the background.
+    """
+
+    def __init__(self, proxy_exe: str, size: int):
+        self.proxy_exe = proxy_exe
+        self.size = size
+        self._idle: list[tuple[subprocess.Popen, socket.socket]] = []
+        self._lock = threading.Lock()
+        self._filling = False
+
+    def fill(self):
+        """Start warming workers in the background up to the pool size."""
+        with self._lock:
+            if self._filling or len(self._idle) >= self.size:
+                return
+            self._filling = True
+        threading.Thread(target=self._fill, name="proxy-pool", daemon=True).start()
+
+    def _fill(self):
+        try:
+            while len(self._idle) < self.size:
+                worker = self._spawn()
+                if worker is None:
+                    return
+                with self._lock:
+                    self._idle.append(worker)
+        finally:
+            with self._lock:
+                self._filling = False
+
+    def _spawn(self) -> tuple[subprocess.Popen, socket.socket] | None:
+        ours, theirs = socket.socketpair()
+        cmd = ["python3", self.proxy_exe, "--standby", str(theirs.fileno()), "-l", LOG_DIR]
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                pass_fds=(theirs.fileno(),),
+            )
+        except Exception as exc:
+            ours.close()
+            print(f"[portal] proxy pool: popen failed: {exc}", flush=True)
+            return None
+        finally:
+            theirs.close()
+
+        ours.settimeout(PROXY_READY_TIMEOUT * 2)
+        line = b""
+        try:
+            while not line.endswith(b"\n"):
+                data = ours.recv(256)
+                if not data:
+                    break
+                line += data
+            ready = json.loads(line).get("event") == "standby"
+        except (OSError, ValueError):
+            ready = False
+        if not ready:
+            ours.close()
+            _stop_pid(proc.pid)
+            proc.wait()
+            print("[portal] proxy pool: worker failed to reach standby", flush=True)
+            return None
+        ours.settimeout(None)
+        return proc, ours
+
+    def assign(self, slot: dict, listener: socket.socket, replay: socket.socket | None = None,
+               raw: socket.socket | None = None) -> tuple[subprocess.Popen, int] | None:
+        """Hand *slot* to an idle worker.  Returns (process, notify fd) or None."""
+        request = {
+            "label": slot["label"],
+            "device": slot["devnode"],
+            "port": slot["tcp_port"],
+            "replay_fd": replay is not None,
+            "raw_fd": raw is not None,
+            **{k: slot.get(k, v) for k, v in LOG_SETTINGS.items()},
+        }
+        fds = [s.fileno() for s in (listener, replay, raw) if s is not None]
+        data = json.dumps(request).encode() + b"\n"
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        return None
+                    proc, chan = self._idle.pop(0)
+                try:
+                    sent = socket.send_fds(chan, [data], fds)
+                    chan.sendall(data[sent:])
+                    return proc, chan.detach()
+                except OSError:
+                    # Worker died while idle; reap it and try the next one
+                    chan.close()
+                    proc.wait()
+        finally:
+            self.fill()
+
+    def close(self):
+        """Dismiss idle workers; each exits when its socket closes."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for proc, chan in idle:
+            chan.close()
+            proc.wait()
+
+
+def _get_watcher() -> ProxyWatcher:
+    global watcher
+    with watcher_lock:
+        if watcher is None:
+            watcher = ProxyWatcher()
+        return watcher
+
+
+def _mark_dead(slot: dict, error: str, exited_at: float | None = None):
+    """Record that a running slot's proxy is gone and schedule a restart.
+
+    *exited_at* (time.monotonic(), from the proxy's fatal report) gives the
+    detection latency.  Caller holds state_lock.
+    """
+    now = time.monotonic()
+    _close_listener(slot)
+    slot["running"] = False
+    slot["pid"] = None
+    slot["url"] = None
+    slot["client"] = None
+    slot["observers"] = []
+    slot["last_error"] = error
+    slot["detect_ms"] = round((now - exited_at) * 1000, 1) if exited_at else None
+    slot["_down_since"] = now
+    print(f"[portal] {slot['label']}: proxy down: {error}", flush=True)
+    _schedule_restart(slot)
+    publish_slot(slot)
+
+
+def _mark_running(slot: dict, pid: int):
+    now = time.monotonic()
+    slot["running"] = True
+    slot["pid"] = pid
+    slot["last_error"] = None
+    slot["url"] = f"rfc2217://{host_ip}:{slot['tcp_port']}"
+    if slot["_down_since"] is not None:
+        slot["recover_ms"] = round((now - slot["_down_since"]) * 1000, 1)
+        slot["_down_since"] = None
+    slot["_up_since"] = now
+    publish_slot(slot)
+
+
+def _schedule_restart(slot: dict):
+    """Restart a crashed proxy after an exponential backoff (caller holds state_lock).
+
+    Only while the device is present; the backoff resets once a proxy has
+    stayed up for RESTART_RESET_AFTER seconds.
+    """
+    if not slot["present"] or slot["tcp_port"] is None:
+        return
+    up_since = slot["_up_since"]
+    if up_since is not None and time.monotonic() - up_since >= RESTART_RESET_AFTER:
+        slot["_failures"] = 0
+    slot["_up_since"] = None
+    delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2 ** slot["_failures"])
+    slot["_failures"] += 1
+    _cancel_restart(slot)
+    timer = threading.Timer(delay, _restart_slot, args=(slot,))
+    timer.daemon = True
+    slot["_restart_timer"] = timer
+    timer.start()
+    print(f"[portal] {slot['label']}: restarting in {delay:.1f} s", flush=True)
+
+
+def _cancel_restart(slot: dict):
+    timer = slot["_restart_timer"]
+    slot["_restart_timer"] = None
+    if timer is not None:
+        timer.cancel()
+
+
+def _restart_slot(slot: dict):
+    with slot["_lock"]:
+        with state_lock:
+            slot["_restart_timer"] = None
+        devnode = slot["devnode"]
+        if slot["running"] or not slot["present"] or not devnode or not os.path.exists(devnode):
+            return
+        slot["restarts"] += 1
+        print(f"[portal] {slot['label']}: restarting proxy (attempt {slot['_failures']})", flush=True)
+        ok = start_proxy(slot)
+        publish_slot(slot)
+        if ok:
+            return
+    with state_lock:
+        _schedule_restart(slot)
+
+
+def _on_client_event(slot: dict, event: str, msg: dict):
+    """Track the controlling client and read-only observers of a slot."""
+    peer = msg.get("peer")
+    if msg.get("role") == "observer":
+        observers = [p for p in slot["observers"] if p != peer]
+        if event == "client_connected":
+            observers.append(peer)
+            print(f"[portal] {slot['label']}: observer {peer} connected", flush=True)
+        slot["observers"] = observers
+    elif event == "client_connected":
+        slot["client"] = peer
+        print(f"[portal] {slot['label']}: client {peer} connected", flush=True)
+    else:
+        slot["client"] = None
+    publish_slot(slot)
+
+
+def _on_proxy_message(slot: dict, proc: subprocess.Popen, msg: dict, startup: dict | None):
+    """Status line from a per-slot proxy process."""
+    if slot["_proc"] is not proc:
+        return
+    event = msg.get("event")
+    if event == "listening" and startup:
+        startup["ready"] = True
+        startup["event"].set()
+    elif event in ("client_connected", "client_disconnected"):
+        _on_client_event(slot, event, msg)
+    elif event == "fatal":
+        slot["_fatal"] = msg.get("error")
+        slot["_fatal_ts"] = msg.get("ts")
+        print(f"[portal] {slot['label']}: proxy error: {slot['_fatal']}", flush=True)
+
+
+def _on_proxy_exit(slot: dict, proc: subprocess.Popen, startup: dict | None, code: int | None):
+    """The proxy process has exited and been reaped."""
+    with state_lock:
+        if slot["_proc"] is proc:
+            slot["_proc"] = None
+            if slot["running"]:
+                _mark_dead(slot, slot["_fatal"] or f"Proxy exited (code {code})", slot["_fatal_ts"])
+    if startup:
+        startup["event"].set()
+
+
+def _all_slots() -> list[dict]:
+    """Snapshot of the slots, safe to iterate while hotplug adds new ones."""
+    return list(slots.values())
+
+
+def _slot_by_label(label: str) -> dict | None:
+    for slot in _all_slots():
+        if slot["label"] == label:
+            return slot
+    return None
+
+
+def _on_daemon_message(msg: dict, startup: dict):
+    """Status line from the proxy daemon; slot events carry the slot label."""
+    event = msg.get("event")
+    if "label" not in msg:
+        if event == "listening":
+            startup["ready"] = True
+            startup["event"].set()
+        return
+    slot = _slot_by_label(msg["label"])
+    if slot is None or not slot["running"]:
+        return
+    if event in ("client_connected", "client_disconnected"):
+        _on_client_event(slot, event, msg)
+    elif event == "fatal":
+        with state_lock:
+            _mark_dead(slot, msg.get("error") or "Proxy daemon dropped the slot", msg.get("ts"))
+
+
+def _on_daemon_exit(proc: subprocess.Popen, startup: dict, code: int | None):
+    global daemon_proc
+    with state_lock:
+        if daemon_proc is proc:
+            daemon_proc = None
+        for slot in _all_slots():
+            if slot["running"] and slot["pid"] == proc.pid:
+                _mark_dead(slot, f"Proxy daemon exited (code {code})")
+    startup["event"].set()
+
+
+def _slot_listener(slot: dict) -> socket.socket:
+    """The slot's portal-owned listening socket, bound on first use.
+
+    Handed to each proxy started for the slot, so clients connecting while
+    the proxy starts queue in the backlog instead of being refused.
+    """
+    if slot["_listener"] is None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("0.0.0.0", slot["tcp_port"]))
+            sock.listen(LISTEN_BACKLOG)
+        except OSError:
+            sock.close()
+            raise
+        slot["_listener"] = sock
+    return slot["_listener"]
+
+
+def _extra_listener(slot: dict, kind: str) -> socket.socket | None:
+    """The slot's pre-bound "replay" or "raw" port socket, or None without one.
+
+    A port that cannot be bound is logged and left out; the slot still
+    starts.
+    """
+    port = slot[f"{kind}_port"]
+    if slot[f"_{kind}_listener"] is None and port:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("0.0.0.0", port))
+            sock.listen(LISTEN_BACKLOG)
+        except OSError as exc:
+            sock.close()
+            print(f"[portal] {slot['label']}: cannot bind {kind} port {port}: {exc}", flush=True)
+            return None
+        slot[f"_{kind}_listener"] = sock
+    return slot[f"_{kind}_listener"]
+
+
+def _close_listener(slot: dict):
+    """Close the portal's copies of the slot's listening sockets."""
+    for name in ("_listener", "_replay_listener", "_raw_listener"):
+        sock = slot[name]
+        slot[name] = None
+        if sock is not None:
+            sock.close()
+
+
 def is_port_listening(port: int) -> bool:
     """Quick TCP connect check on localhost."""
     try:
@@ -129,12 +746,123 @@ def _is_process_alive(pid: int) -> bool:
         return False
 
 
+def _daemon_request(msg: dict, timeout: float = 5.0, fds: list[int] | None = None) -> dict:
+    """Send one JSON request (plus any *fds*) to the proxy daemon and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(DAEMON_CONTROL)
+        data = json.dumps(msg).encode() + b"\n"
+        if fds:
+            sent = socket.send_fds(s, [data], fds)
+            data = data[sent:]
+        s.sendall(data)
+        reply = s.makefile("rb").readline()
+    if not reply:
+        raise OSError("proxy daemon closed the control connection")
+    return json.loads(reply)
+
+
+def _ensure_daemon() -> str | None:
+    """Start the proxy daemon unless it already answers.  Returns an error or None."""
+    global daemon_proc
+    with daemon_lock:
+        try:
+            _daemon_request({"cmd": "status"})
+            return None
+        except (OSError, ValueError):
+            pass
+
+        proxy_exe = _find_proxy_exe(daemon=True)
+        if not proxy_exe:
+            return "No serial_proxy executable found for daemon mode"
+        notify_r, notify_w = os.pipe()
+        cmd = ["python3", proxy_exe, "--daemon", "--control", DAEMON_CONTROL,
+               "-l", LOG_DIR, "--notify-fd", str(notify_w)]
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                pass_fds=(notify_w,),
+            )
+        except Exception as exc:
+            os.close(notify_r)
+            return f"proxy daemon popen failed: {exc}"
+        finally:
+            os.close(notify_w)
+
+        daemon_proc = proc
+        startup = {"event": threading.Event(), "ready": False}
+        _get_watcher().supervise(
+            proc,
+            notify_r,
+            lambda msg: _on_daemon_message(msg, startup),
+            lambda code: _on_daemon_exit(proc, startup, code),
+        )
+        if not startup["event"].wait(PROXY_READY_TIMEOUT):
+            _stop_pid(proc.pid)
+            return f"Proxy daemon not ready after {PROXY_READY_TIMEOUT:.0f} s"
+        if not startup["ready"]:
+            return f"Proxy daemon exited during startup (code {proc.returncode})"
+        print(f"[portal] proxy daemon started (pid {proc.pid})", flush=True)
+        return None
+
+
+def _start_in_daemon(slot: dict) -> bool:
+    """Add *slot* to the proxy daemon.  Returns True on success."""
+    label = slot["label"]
+    try:
+        listener = _slot_listener(slot)
+        error = _ensure_daemon()
+    except OSError as exc:
+        error = f"Cannot bind port {slot['tcp_port']}: {exc}"
+    if error is None:
+        replay = _extra_listener(slot, "replay")
+        raw = _extra_listener(slot, "raw")
+        request = {
+            "cmd": "add",
+            "label": label,
+            "device": slot["devnode"],
+            "port": slot["tcp_port"],
+            "listen_fd": True,
+            "replay_fd": replay is not None,
+            "raw_fd": raw is not None,
+            **{k: slot.get(k, v) for k, v in LOG_SETTINGS.items()},
+        }
+        fds = [s.fileno() for s in (listener, replay, raw) if s is not None]
+        try:
+            reply = _daemon_request(request, fds=fds)
+            error = None if reply.get("ok") else reply.get("error", "add failed")
+        except (OSError, ValueError) as exc:
+            error = f"proxy daemon: {exc}"
+    if error:
+        _close_listener(slot)
+        slot["last_error"] = error
+        print(f"[portal] {label}: {error}", flush=True)
+        return False
+
+    _mark_running(slot, reply["pid"])
+    print(
+        f"[portal] {label}: slot added to proxy daemon (pid {reply['pid']}, port {slot['tcp_port']})",
+        flush=True,
+    )
+    return True
+
+
 def start_proxy(slot: dict) -> bool:
     """Start serial_proxy for *slot*.  Returns True on success."""
     devnode = slot["devnode"]
     tcp_port = slot["tcp_port"]
     label = slot["label"]
 
+    if PROXY_MODE == "daemon":
+        if not wait_for_device(devnode):
+            slot["last_error"] = f"Device {devnode} not ready after settle timeout"
+            print(f"[portal] {label}: {slot['last_error']}", flush=True)
+            return False
+        return _start_in_daemon(slot)
+
     proxy_exe = _find_proxy_exe()
     if not proxy_exe:
         slot["last_error"] = "No serial proxy executable found"
@@ -147,48 +875,136 @@ def start_proxy(slot: dict) -> bool:
         print(f"[portal] {label}: {slot['last_error']}", flush=True)
         return False
 
-    cmd = ["python3", proxy_exe, "-p", str(tcp_port)]
-    if "serial_proxy" in proxy_exe:
-        cmd.extend(["-l", LOG_DIR])
-    cmd.append(devnode)
+    handoff = "serial_proxy" in proxy_exe
+    listener = replay = raw = None
+    if handoff:
+        try:
+            listener = _slot_listener(slot)
+        except OSError as exc:
+            slot["last_error"] = f"Cannot bind port {tcp_port}: {exc}"
+            print(f"[portal] {label}: {slot['last_error']}", flush=True)
+            return False
+        replay = _extra_listener(slot, "replay")
+        raw = _extra_listener(slot, "raw")
+
+    started = time.monotonic()
+    assigned = pool.assign(slot, listener, replay, raw) if handoff and pool else None
+    if assigned:
+        proc, notify_r = assigned
+    else:
+        cmd = ["python3", proxy_exe, "-p", str(tcp_port)]
+        pass_fds = ()
+        if handoff:
+            notify_r, notify_w = os.pipe()
+            pass_fds = (listener.fileno(), notify_w)
+            cmd.extend(["--listen-fd", str(listener.fileno()), "--notify-fd", str(notify_w)])
+            cmd.extend(["-l", LOG_DIR, "--log-name", label])
+            for key, default in LOG_SETTINGS.items():
+                cmd.extend([f"--{key.replace('_', '-')}", str(slot.get(key, default))])
+            if replay is not None:
+                pass_fds += (replay.fileno(),)
+                cmd.extend(["--replay-listen-fd", str(replay.fileno())])
+            if raw is not None:
+                pass_fds += (raw.fileno(),)
+                cmd.extend(["--raw-listen-fd", str(raw.fileno())])
+        cmd.append(devnode)
 
-    try:
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            start_new_session=True,
-        )
-    except Exception as exc:
-        slot["last_error"] = str(exc)
-        print(f"[portal] {label}: popen failed: {exc}", flush=True)
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                pass_fds=pass_fds,
+            )
+        except Exception as exc:
+            if handoff:
+                os.close(notify_r)
+            _close_listener(slot)
+            slot["last_error"] = str(exc)
+            print(f"[portal] {label}: popen failed: {exc}", flush=True)
+            return False
+        finally:
+            if handoff:
+                os.close(notify_w)
+
+    if handoff:
+        ready = _await_ready(slot, proc, notify_r)
+    else:
+        # esp_rfc2217_server has no notify pipe: poll until it is listening
+        ready = _wait_listening(slot, proc)
+        if ready:
+            with state_lock:
+                slot["_proc"] = proc
+                slot["_fatal"] = None
+                slot["_fatal_ts"] = None
+            _get_watcher().supervise(
+                proc, None, None, lambda code: _on_proxy_exit(slot, proc, None, code))
+    if not ready:
+        _close_listener(slot)
+        print(f"[portal] {label}: {slot['last_error']}", flush=True)
         return False
 
+    print(
+        f"[portal] {label}: proxy started (pid {proc.pid}, port {tcp_port}, "
+        f"{'warm' if assigned else 'cold'}, ready in {(time.monotonic() - started) * 1000:.0f} ms)",
+        flush=True,
+    )
+    return True
+
+
+def _await_ready(slot: dict, proc: subprocess.Popen, notify_r: int) -> bool:
+    """Wait for the proxy to report "listening" on its notify pipe.
+
+    On failure last_error carries the proxy's own fatal error when it sent
+    one, otherwise its exit code or the timeout.
+    """
+    startup = {"event": threading.Event(), "ready": False}
+    with state_lock:
+        slot["_proc"] = proc
+        slot["_fatal"] = None
+        slot["_fatal_ts"] = None
+    _get_watcher().supervise(
+        proc,
+        notify_r,
+        lambda msg: _on_proxy_message(slot, proc, msg, startup),
+        lambda code: _on_proxy_exit(slot, proc, startup, code),
+    )
+    startup["event"].wait(PROXY_READY_TIMEOUT)
+
+    with state_lock:
+        if slot["_proc"] is proc and startup["ready"]:
+            _mark_running(slot, proc.pid)
+            return True
+        if slot["_proc"] is proc:
+            slot["_proc"] = None
+            error = f"Proxy not ready after {PROXY_READY_TIMEOUT:.0f} s"
+        else:
+            error = slot["_fatal"] or f"Proxy exited during startup (code {proc.returncode})"
+        slot["last_error"] = error
+    if proc.poll() is None:
+        _stop_pid(proc.pid)
+    return False
+
+
+def _wait_listening(slot: dict, proc: subprocess.Popen) -> bool:
+    """Poll until a proxy that binds its own port is listening (sets last_error)."""
     # Brief pause then check it didn't die immediately
     time.sleep(0.5)
     if proc.poll() is not None:
         slot["last_error"] = f"Proxy exited immediately (code {proc.returncode})"
-        print(f"[portal] {label}: {slot['last_error']}", flush=True)
         return False
 
     # Wait up to 2 s for port to be listening
     for _ in range(20):
-        if is_port_listening(tcp_port):
-            slot["running"] = True
-            slot["pid"] = proc.pid
-            slot["last_error"] = None
-            slot["url"] = f"rfc2217://{host_ip}:{tcp_port}"
-            print(
-                f"[portal] {label}: proxy started (pid {proc.pid}, port {tcp_port})",
-                flush=True,
-            )
+        if is_port_listening(slot["tcp_port"]):
+            _mark_running(slot, proc.pid)
             return True
         time.sleep(0.1)
 
     # Port never came up — kill the process
     _stop_pid(proc.pid)
     slot["last_error"] = "Proxy started but port not listening"
-    print(f"[portal] {label}: {slot['last_error']}", flush=True)
     return False
 
 
@@ -209,26 +1025,259 @@ def _stop_pid(pid: int, timeout: float = 5.0):
         pass
 
 
-def stop_proxy(slot: dict) -> bool:
-    """Stop proxy for *slot*.  Returns True if stopped (or already stopped)."""
+def stop_proxy(slot: dict, keep_listener: bool = False) -> bool:
+    """Stop proxy for *slot*.  Returns True if stopped (or already stopped).
+
+    With *keep_listener* the portal keeps the slot's listening sockets, so
+    clients connecting until the next start_proxy wait in the backlog.
+    """
     label = slot["label"]
     pid = slot["pid"]
-    if pid and _is_process_alive(pid):
+    with state_lock:
+        # An exit from here on is intentional, not a crash
+        slot["_proc"] = None
+        _cancel_restart(slot)
+    if PROXY_MODE == "daemon":
+        if slot["running"]:
+            print(f"[portal] {label}: removing slot from proxy daemon", flush=True)
+            try:
+                _daemon_request({"cmd": "remove", "label": label})
+            except (OSError, ValueError) as exc:
+                print(f"[portal] {label}: proxy daemon: {exc}", flush=True)
+    elif pid and _is_process_alive(pid):
         print(f"[portal] {label}: stopping proxy (pid {pid})", flush=True)
         _stop_pid(pid)
+    if not keep_listener:
+        _close_listener(slot)
     slot["running"] = False
     slot["pid"] = None
     slot["url"] = None
+    slot["client"] = None
+    slot["observers"] = []
     slot["last_error"] = None
+    publish_slot(slot)
     return True
 
 
+def _restart_proxy(slot: dict) -> bool:
+    """Job body: (re)start *slot*'s proxy on its current devnode."""
+    if slot["running"] and slot["pid"]:
+        stop_proxy(slot)
+    return start_proxy(slot)
+
+
+def _update_job(job: dict, **fields):
+    """Change *job* and wake /api/jobs/<id>/events streams."""
+    with jobs_changed:
+        job.update(fields)
+        jobs_changed.notify_all()
+
+
+def _slot_worker(slot: dict):
+    """Run *slot*'s jobs one at a time, in submission order."""
+    while True:
+        job, fn = slot["_jobs"].get()
+        _update_job(job, state="running")
+        worker_job.job = job
+        try:
+            with slot["_lock"]:
+                ok = bool(fn(slot))
+            job["error"] = None if ok else slot["last_error"]
+        except Exception as exc:
+            ok = False
+            job["error"] = f"{type(exc).__name__}: {exc}"
+            print(f"[portal] {slot['label']}: {job['action']} job failed: {job['error']}", flush=True)
+        publish_slot(slot)
+        _update_job(job, ok=ok, running=slot["running"], state="done",
+                    finished=datetime.now(timezone.utc).isoformat())
+        job["_done"].set()
+
+
+def submit_job(slot: dict, action: str, fn) -> dict:
+    """Queue fn(slot) on the slot's worker thread and return the job.
+
+    Jobs of one slot run in order under the slot lock, so a slow stop or
+    start never holds up an HTTP request or another slot.
+    """
+    global job_counter
+    with jobs_lock:
+        job_counter += 1
+        job = {
+            "id": job_counter,
+            "slot_key": slot["slot_key"],
+            "label": slot["label"],
+            "action": action,
+            "state": "queued",
+            "ok": None,
+            "error": None,
+            "running": None,
+            "progress": None,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "finished": None,
+            "_done": threading.Event(),
+        }
+        jobs[job["id"]] = job
+        # Forget the oldest finished jobs beyond the history limit
+        excess = len(jobs) - JOB_HISTORY
+        if excess > 0:
+            for old in [i for i, j in jobs.items() if j["_done"].is_set()][:excess]:
+                del jobs[old]
+        if slot["_jobs"] is None:
+            slot["_jobs"] = queue.Queue()
+            threading.Thread(target=_slot_worker, args=(slot,),
+                             name=f"slot-{slot['label']}", daemon=True).start()
+    slot["_jobs"].put((job, fn))
+    return job
+
+
+def _parse_flash_request(body: dict, tmp: str) -> list[tuple[int, str]]:
+    """Decode the images of a JSON POST /api/flash body into files in *tmp*.
+
+    Returns (offset, path) pairs; raises ValueError.
+    """
+    files = body.get("files")
+    if not isinstance(files, list) or not files:
+        raise ValueError("missing files")
+    images = []
+    for i, entry in enumerate(files):
+        if not isinstance(entry, dict):
+            raise ValueError(f"bad file entry {i}")
+        offset = entry.get("offset")
+        offset = int(offset, 0) if isinstance(offset, str) else offset
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError(f"bad offset {entry.get('offset')!r}")
+        try:
+            data = base64.b64decode(entry.get("data") or "", validate=True)
+        except ValueError:
+            raise ValueError(f"bad base64 data at {offset:#x}") from None
+        if not data:
+            raise ValueError(f"empty image at {offset:#x}")
+        path = os.path.join(tmp, f"{i}.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        images.append((offset, path))
+    return images
+
+
+def _parse_image_sizes(offsets: list[str], sizes: list[str], length: int) -> list[tuple[int, int]]:
+    """(offset, size) pairs for an octet-stream upload of *length* bytes.
+
+    Every image but the last needs a size; the last one takes the rest of
+    the body.  Raises ValueError.
+    """
+    if not offsets:
+        raise ValueError("missing offset")
+    if len(sizes) not in (len(offsets) - 1, len(offsets)):
+        raise ValueError("every image but the last needs a size")
+    parsed = [int(offset, 0) for offset in offsets]
+    lengths = [int(size) for size in sizes[:len(offsets) - 1]]
+    lengths.append(length - sum(lengths))
+    if len(sizes) == len(offsets) and int(sizes[-1]) != lengths[-1]:
+        raise ValueError("sizes do not add up to the body length")
+    for offset, size in zip(parsed, lengths):
+        if offset < 0:
+            raise ValueError(f"bad offset {offset:#x}")
+        if size <= 0:
+            raise ValueError(f"empty image at {offset:#x}")
+    return list(zip(parsed, lengths))
+
+
+def flash_slot(slot: dict, images: list[tuple[int, str]], baud: int, chip: str,
+               options: dict) -> bool:
+    """Job body: flash *images* locally with esptool, pausing the slot's proxy.
+
+    The slot's listening sockets stay open while esptool owns the device,
+    so RFC2217 clients connecting meanwhile are served once the proxy is
+    back on the same port.  Progress goes to the running job's "progress".
+    """
+    label = slot["label"]
+    devnode = slot["devnode"]
+    job = worker_job.job
+    if not slot["present"] or not devnode:
+        slot["last_error"] = "No device present"
+        return False
+    was_running = slot["running"]
+    if was_running:
+        stop_proxy(slot, keep_listener=True)
+        print(f"[portal] {label}: proxy paused for flashing", flush=True)
+    slot["flashing"] = True
+    publish_slot(slot)
+    started = time.monotonic()
+    try:
+        error = _run_esptool(job, devnode, images, baud, chip, options)
+    finally:
+        slot["flashing"] = False
+    total = sum(os.path.getsize(path) for _, path in images)
+    if error:
+        print(f"[portal] {label}: flash failed: {error}", flush=True)
+    else:
+        print(f"[portal] {label}: flashed {total} bytes in {len(images)} image(s) at {baud} baud "
+              f"in {time.monotonic() - started:.1f} s", flush=True)
+    if was_running and slot["present"]:
+        start_proxy(slot)
+    else:
+        _close_listener(slot)
+    if error:
+        slot["last_error"] = error
+        return False
+    return True
+
+
+def _run_esptool(job: dict, devnode: str, images: list[tuple[int, str]], baud: int,
+                 chip: str, options: dict) -> str | None:
+    """Run esptool write_flash on *devnode*.  Returns an error or None."""
+    cmd = [*ESPTOOL, "--chip", chip, "--port", devnode, "--baud", str(baud),
+           "--before", "default_reset", "--after", "hard_reset", "write_flash"]
+    for key in ("flash_mode", "flash_freq", "flash_size"):
+        if options.get(key):
+            cmd.extend([f"--{key}", str(options[key])])
+    for offset, path in images:
+        cmd.extend([f"{offset:#x}", path])
+
+    _update_job(job, progress={"image": 0, "images": len(images), "address": None, "percent": 0})
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, text=True,
+                                env=dict(os.environ, PYTHONUNBUFFERED="1"))
+    except OSError as exc:
+        return f"Cannot run esptool: {exc}"
+    timer = threading.Timer(FLASH_TIMEOUT, proc.kill)
+    timer.start()
+    image = 0
+    last_line = ""
+    try:
+        for line in proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            last_line = line
+            match = FLASH_PROGRESS_RE.search(line)
+            if match:
+                _update_job(job, progress={"image": image + 1, "images": len(images),
+                                           "address": match.group(1),
+                                           "percent": float(match.group(2))})
+            elif line.startswith("Wrote "):
+                image += 1
+                _update_job(job, progress={"image": image, "images": len(images),
+                                           "address": job["progress"]["address"],
+                                           "percent": 100.0})
+        code = proc.wait()
+    finally:
+        timer.cancel()
+    if code != 0:
+        return f"esptool exited with code {code}: {last_line}"
+    return None
+
+
 def _make_dynamic_slot(slot_key: str) -> dict:
     """Create a minimal slot dict for an unknown (unconfigured) slot_key."""
     return {
         "label": None,
         "slot_key": slot_key,
         "tcp_port": None,
+        "replay_port": None,
+        "raw_port": None,
+        **LOG_SETTINGS,
         "present": False,
         "running": False,
         "pid": None,
@@ -238,7 +1287,26 @@ def _make_dynamic_slot(slot_key: str) -> dict:
         "last_event_ts": None,
         "url": None,
         "last_error": None,
+        "client": None,
+        "observers": [],
+        "flashing": False,
+        "restarts": 0,
+        "detect_ms": None,
+        "recover_ms": None,
         "_lock": threading.Lock(),
+        "_listener": None,
+        "_replay_listener": None,
+        "_raw_listener": None,
+        "_proc": None,
+        "_fatal": None,
+        "_fatal_ts": None,
+        "_failures": 0,
+        "_restart_timer": None,
+        "_down_since": None,
+        "_up_since": None,
+        "_seqnum": None,
+        "_jobs": None,
+        "_published": None,
     }
 
 
@@ -246,63 +1314,352 @@ def scan_existing_devices():
     """Scan for already-plugged-in USB serial devices and start proxies.
 
     Called once at startup so devices present at boot are recognized
-    without requiring a hotplug event.
+    without requiring a hotplug event.  Slot keys are computed from sysfs
+    (no udevadm per device) and all proxies start concurrently on their slot
+    workers.  Returns once the starts are queued; a watcher thread logs
+    boot-to-ready when the last one finishes.
     """
-    import glob as _glob
-    import subprocess as _sp
-
-    devnodes = sorted(_glob.glob("/dev/ttyACM*") + _glob.glob("/dev/ttyUSB*"))
+    started = time.monotonic()
+    devnodes = sorted(glob.glob("/dev/ttyACM*") + glob.glob("/dev/ttyUSB*"))
     if not devnodes:
         print("[portal] boot scan: no USB serial devices found", flush=True)
         return
 
     print(f"[portal] boot scan: found {len(devnodes)} device(s)", flush=True)
+    boot_jobs = []
     for devnode in devnodes:
-        # Get ID_PATH from udevadm
-        try:
-            out = _sp.check_output(
-                ["udevadm", "info", "-q", "property", "-n", devnode],
-                text=True, timeout=5,
-            )
-        except Exception as exc:
-            print(f"[portal] boot scan: udevadm failed for {devnode}: {exc}", flush=True)
-            continue
-
-        props = {}
-        for line in out.splitlines():
-            if "=" in line:
-                k, v = line.split("=", 1)
-                props[k] = v
-
-        id_path = props.get("ID_PATH", "")
-        devpath = props.get("DEVPATH", "")
-        slot_key = id_path if id_path else devpath
+        props = usb_sysfs.lookup(devnode)
+        slot_key = props["slot_key"] if props else None
         if not slot_key:
             print(f"[portal] boot scan: no slot_key for {devnode}, skipping", flush=True)
             continue
 
+        # The udev monitor and the HTTP server already run, so hotplug events
+        # may arrive during the scan: update slots under the same lock
+        # as handle_hotplug
+        with hotplug_lock:
+            if slot_key not in slots:
+                slots[slot_key] = _make_dynamic_slot(slot_key)
+                print(f"[portal] boot scan: unknown slot_key={slot_key} (tracked, no proxy)",
+                      flush=True)
+            slot = slots[slot_key]
+            if slot["last_action"] is not None:
+                # A hotplug event since startup is newer than this scan
+                print(f"[portal] boot scan: {devnode} already handled by a hotplug event",
+                      flush=True)
+                continue
+            slot["present"] = True
+            slot["devnode"] = devnode
+        publish_slot(slot)
+
+        if slot["tcp_port"] is not None and not slot["running"]:
+            print(f"[portal] boot scan: starting proxy for {slot['label']} ({devnode})", flush=True)
+            boot_jobs.append(submit_job(slot, "start", lambda s: s["running"] or start_proxy(s)))
+
+    threading.Thread(target=_log_boot_ready, args=(boot_jobs, started),
+                     name="boot-ready", daemon=True).start()
+
+
+def _log_boot_ready(boot_jobs: list[dict], started: float):
+    """Wait for the boot scan's start jobs and log how long they took."""
+    for job in boot_jobs:
+        job["_done"].wait()
+    elapsed_ms = (time.monotonic() - started) * 1000
+    ready = sum(1 for job in boot_jobs if job["ok"])
+    print(
+        f"[portal] boot scan: {ready}/{len(boot_jobs)} proxies ready "
+        f"in {elapsed_ms:.0f} ms",
+        flush=True,
+    )
+
+
+def handle_hotplug(action: str, devnode: str | None, id_path: str, devpath: str,
+                   seqnum: str | None = None, source: str = "http") -> dict:
+    """Feed one add/remove event into the slot state machine.
+
+    Shared by POST /api/hotplug and the udev netlink monitor.  An add
+    without id_path/devpath is resolved from sysfs via *devnode*.  An event
+    carrying the same udev SEQNUM as the slot's previous one (delivered by
+    both paths) is acknowledged but not acted on.  Raises ValueError when
+    the event has neither id_path nor devpath.
+    """
+    global seq_counter
+
+    # The device number may now belong to a different device; POST
+    # /api/hotplug is the only event source with the udev monitor off
+    if devpath:
+        usb_sysfs.resolver.invalidate(devpath=devpath)
+    if not id_path and not devpath and action == "add" and devnode:
+        props = usb_sysfs.lookup(devnode, refresh=True)
+        if props:
+            id_path, devpath = props["id_path"], props["devpath"]
+    slot_key = id_path if id_path else devpath
+    if not slot_key:
+        raise ValueError("missing id_path and devpath")
+
+    with hotplug_lock:
+        # Look up or create slot
         if slot_key not in slots:
             slots[slot_key] = _make_dynamic_slot(slot_key)
-            print(f"[portal] boot scan: unknown slot_key={slot_key} (tracked, no proxy)", flush=True)
 
         slot = slots[slot_key]
+        configured = slot["tcp_port"] is not None
+        if seqnum and seqnum == slot["_seqnum"]:
+            return {"ok": True, "slot_key": slot_key, "seq": slot["seq"],
+                    "accepted": configured, "duplicate": True}
+
+        # Update event bookkeeping (always, even for unknown slots)
+        seq_counter += 1
+        slot["seq"] = seq_counter
+        slot["_seqnum"] = seqnum
+        slot["last_action"] = action
+        slot["last_event_ts"] = datetime.now(timezone.utc).isoformat()
+        seq = seq_counter
+
+    job = None
+    if action == "add":
         slot["present"] = True
         slot["devnode"] = devnode
 
-        if slot["tcp_port"] is not None and not slot["running"]:
-            print(f"[portal] boot scan: starting proxy for {slot['label']} ({devnode})", flush=True)
-            with slot["_lock"]:
-                start_proxy(slot)
+        if configured:
+            # Start on the slot's worker so we don't block the HTTP
+            # response (or the next uevent) for the settle + ready wait.
+            job = submit_job(slot, "start", _restart_proxy)
+        else:
+            print(
+                f"[portal] hotplug: unknown slot_key={slot_key} "
+                f"(tracked, no proxy)",
+                flush=True,
+            )
 
+    elif action == "remove":
+        slot["present"] = False
+        if configured:
+            # Queued behind any pending start, so that start cannot win
+            job = submit_job(slot, "stop", stop_proxy)
 
-def _refresh_slot_health(slot: dict):
-    """Check that a slot's proxy is still alive; mark dead if not."""
-    if slot["running"] and slot["pid"]:
-        if not _is_process_alive(slot["pid"]):
-            slot["running"] = False
-            slot["pid"] = None
-            slot["url"] = None
-            slot["last_error"] = "Process died"
+    publish_slot(slot)
+    print(
+        f"[portal] hotplug ({source}): {action} slot_key={slot_key} "
+        f"devnode={devnode} seq={seq}",
+        flush=True,
+    )
+    return {"ok": True, "slot_key": slot_key, "seq": seq, "accepted": configured,
+            "job": job["id"] if job else None}
+
+
+def parse_uevent(data: bytes) -> dict[str, str] | None:
+    """Properties of one netlink uevent, in libudev or raw kernel format."""
+    if data.startswith(b"libudev\0"):
+        if len(data) < UDEV_HEADER.size:
+            return None
+        _, _, props_off, props_len = UDEV_HEADER.unpack_from(data)
+        if UDEV_MAGIC.unpack_from(data, 8)[0] != UDEV_MONITOR_MAGIC:
+            return None
+        payload = data[props_off:props_off + props_len]
+    else:
+        # Kernel: "ACTION@DEVPATH\0KEY=VALUE\0..."
+        head, _, payload = data.partition(b"\0")
+        if b"@" not in head:
+            return None
+    props = {}
+    for field in payload.decode(errors="replace").split("\0"):
+        key, sep, value = field.partition("=")
+        if sep:
+            props[key] = value
+    return props
+
+
+class UdevMonitor:
+    """Feeds udev's netlink uevents for USB serial ttys into handle_hotplug().
+
+    Listens on the udev multicast group, so events arrive after udev has
+    processed them (ID_PATH set, device node created), without the
+    udev rule -> systemd-run -> notify script -> curl chain.  Only messages
+    sent by root (SCM_CREDENTIALS) are accepted, as udev itself does.  *sock*
+    lets a test harness inject synthetic uevents over any datagram socket;
+    such a harness runs unprivileged and passes its own uid in
+    *trusted_uids*.
+    """
+
+    def __init__(self, sock: socket.socket | None = None, trusted_uids: tuple[int, ...] = (0,)):
+        if sock is None:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+            sock.bind((0, UEVENT_GROUP_UDEV))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_PASSCRED, 1)
+        self.sock = sock
+        self.trusted_uids = trusted_uids
+
+    def start(self):
+        threading.Thread(target=self._run, name="udev-monitor", daemon=True).start()
+
+    def _run(self):
+        ancsize = socket.CMSG_SPACE(UCRED.size)
+        while True:
+            try:
+                data, ancdata, _, _ = self.sock.recvmsg(16384, ancsize)
+            except OSError as exc:
+                if exc.errno == errno.ENOBUFS:
+                    print("[portal] udev monitor: receive buffer overrun, events lost", flush=True)
+                    continue
+                print(f"[portal] udev monitor stopped: {exc}", flush=True)
+                return
+            if not data or not self._trusted(ancdata):
+                continue
+            props = parse_uevent(data)
+            if props:
+                try:
+                    self._dispatch(props)
+                except Exception as exc:
+                    print(f"[portal] udev monitor: {exc!r}", flush=True)
+
+    def _trusted(self, ancdata) -> bool:
+        for level, kind, cdata in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_CREDENTIALS:
+                _, uid, _ = UCRED.unpack_from(cdata)
+                return uid in self.trusted_uids
+        return False
+
+    @staticmethod
+    def _dispatch(props: dict[str, str]):
+        action = props.get("ACTION")
+        if action not in ("add", "remove") or props.get("SUBSYSTEM") != "tty":
+            return
+        # The device number may now belong to a different device
+        if "MAJOR" in props and "MINOR" in props:
+            usb_sysfs.resolver.invalidate(f"{props['MAJOR']}:{props['MINOR']}")
+        devnode = props.get("DEVNAME", "")
+        if not os.path.basename(devnode).startswith(HOTPLUG_TTY_PREFIXES):
+            return
+        if not devnode.startswith("/"):
+            devnode = "/dev/" + devnode
+        handle_hotplug(action, devnode, props.get("ID_PATH", ""), props.get("DEVPATH", ""),
+                       props.get("SEQNUM"), source="udev")
+
+
+def _daemon_status() -> dict | None:
+    """Status reply of the proxy daemon, or None when not in daemon mode / unreachable."""
+    if PROXY_MODE != "daemon":
+        return None
+    try:
+        reply = _daemon_request({"cmd": "status"}, timeout=2.0)
+    except (OSError, ValueError):
+        return None
+    return reply if reply.get("ok") else None
+
+
+def _refresh_slot_health(slot: dict, daemon_status: dict | None = None):
+    """Check that a slot's proxy is still alive; mark dead if not.
+
+    In daemon mode *daemon_status* (from _daemon_status()) tells which slots
+    the daemon still serves; a slot it dropped carries the daemon's error.
+    """
+    if not (slot["running"] and slot["pid"]):
+        return
+    error = None
+    if daemon_status is not None:
+        if slot["label"] not in daemon_status["slots"]:
+            error = daemon_status["failed"].get(slot["label"]) or "Slot missing from proxy daemon"
+    elif not _is_process_alive(slot["pid"]):
+        error = "Process died"
+    if error:
+        with state_lock:
+            _mark_dead(slot, error)
+
+
+def _refresh_health():
+    """Liveness sweep over all slots, at most once per HEALTH_INTERVAL."""
+    global health_checked
+    with health_lock:
+        now = time.monotonic()
+        if now - health_checked < HEALTH_INTERVAL:
+            return
+        health_checked = now
+        daemon_status = _daemon_status()
+        for slot in _all_slots():
+            _refresh_slot_health(slot, daemon_status)
+
+
+def _cached_response(name: str, etag: str | None, build, ttl: float | None = None) -> tuple:
+    """Return (etag, body, gzipped body) for *name*, rebuilding when stale.
+
+    With *etag* (derived from state), the cached body is reused until the
+    tag changes.  Without it, the body is reused for *ttl* seconds and
+    tagged with a hash of its content.
+    """
+    now = time.monotonic()
+    with cache_lock:
+        entry = response_cache.get(name)
+        if entry and (entry[0] == etag if etag else now - entry[3] < ttl):
+            return entry[:3]
+        body = json.dumps(build()).encode()
+        if etag is None:
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        gz = gzip.compress(body, 6) if len(body) >= GZIP_MIN_SIZE else None
+        response_cache[name] = (etag, body, gz, now)
+        return etag, body, gz
+
+
+def _devices_response() -> tuple:
+    # Every public slot change goes through publish_slot(), which advances
+    # seq_counter, so the counter identifies the body
+    return _cached_response("devices", f'"{BOOT_TAG}-{seq_counter}"', lambda: {
+        "slots": [_slot_info(s) for s in _all_slots()],
+        "host_ip": host_ip,
+        "hostname": hostname,
+    })
+
+
+def _info_response() -> tuple:
+    return _cached_response("info", None, lambda: {
+        "host_ip": host_ip,
+        "hostname": hostname,
+        "slots_configured": sum(1 for s in _all_slots() if s["tcp_port"] is not None),
+        "slots_running": sum(1 for s in _all_slots() if s["running"]),
+        "proxy_usage": _proxy_usage(),
+    }, ttl=INFO_TTL)
+
+
+def _proxy_usage() -> dict:
+    """Memory and CPU used by the proxies, in total and per running slot.
+
+    In process mode every slot has its own interpreter; in daemon mode all
+    slots share the daemon's pid, so the totals are split across slots.
+    """
+    running = [s for s in _all_slots() if s["running"] and s["pid"]]
+    pids = {s["pid"] for s in running}
+    try:
+        # Same /proc reader the daemon uses for its status (installed alongside)
+        from serial_proxy import process_usage
+    except ImportError as exc:
+        return {"mode": PROXY_MODE, "error": f"usage reader unavailable: {exc}"}
+    usages = [process_usage(pid) for pid in pids]
+    rss_kb = sum(u["rss_kb"] for u in usages)
+    cpu_s = round(sum(u["cpu_s"] for u in usages), 2)
+    n = len(running)
+    return {
+        "mode": PROXY_MODE,
+        "processes": len(pids),
+        "slots": n,
+        "rss_kb": rss_kb,
+        "cpu_s": cpu_s,
+        "rss_kb_per_slot": rss_kb // n if n else 0,
+        "cpu_s_per_slot": round(cpu_s / n, 2) if n else 0.0,
+    }
+
+
+def _parse_log_time(value: str | None, default: float) -> float:
+    """Parse a log query bound: epoch seconds, ISO datetime or HH:MM[:SS] today."""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    if len(value) <= 8 and ":" in value:
+        value = f"{datetime.now():%Y-%m-%d}T{value}"
+    return datetime.fromisoformat(value).timestamp()
 
 
 def _slot_info(slot: dict) -> dict:
@@ -310,11 +1667,43 @@ def _slot_info(slot: dict) -> dict:
     return {k: v for k, v in slot.items() if not k.startswith("_")}
 
 
+def _job_info(job: dict) -> dict:
+    """Return a JSON-safe copy of a job (excludes _done)."""
+    return {k: v for k, v in job.items() if not k.startswith("_")}
+
+
+def publish_slot(slot: dict):
+    """Record a change of *slot* for /api/events subscribers.
+
+    Cheap to call after any state change: nothing is recorded unless a
+    public field differs from the slot's previous event.  Each event takes
+    the next seq_counter value.
+    """
+    global seq_counter, events_evicted
+    info = _slot_info(slot)
+    with events_cond:
+        last = slot["_published"]
+        if info == last:
+            return
+        with hotplug_lock:
+            seq_counter += 1
+            seq = seq_counter
+        changed = [k for k in info if last is None or info[k] != last.get(k)]
+        slot["_published"] = info
+        if len(events) == events.maxlen:
+            events_evicted = events[0]["seq"]
+        events.append({"seq": seq, "slot": info, "changed": changed})
+        events_cond.notify_all()
+
+
 # ---------------------------------------------------------------------------
 # HTTP Handler
 # ---------------------------------------------------------------------------
 
 class Handler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive for pollers; streaming responses close the connection
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
 
     def log_message(self, fmt, *args):
         print(f"[portal] {self.address_string()} {fmt % args}", flush=True)
@@ -327,14 +1716,87 @@ class Handler(http.server.BaseHTTPRequestHandler):
         self.send_header("Content-Type", "application/json")
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Content-Length", len(body))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_cached(self, entry: tuple, content_type="application/json"):
+        """Send a prebuilt (etag, body, gzipped body) response.
+
+        Answers 304 when If-None-Match carries the ETag, and sends the
+        gzipped body to clients that accept it.
+        """
+        etag, body, gz = entry
+        match = self.headers.get("If-None-Match", "")
+        if etag in [tag.strip() for tag in match.split(",")] or match.strip() == "*":
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if gz is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gz
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", len(body))
         self.end_headers()
         self.wfile.write(body)
 
-    def _read_json(self):
-        length = int(self.headers.get("Content-Length", 0))
+    def _send_stream_headers(self, content_type: str):
+        """Start a response whose body runs until the connection closes."""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Connection", "close")
+
+    def _send_job(self, job: dict, wait: bool, timeout: float = JOB_WAIT_TIMEOUT):
+        """202 with the job handle, or the job's outcome once done if *wait*."""
+        if wait and job["_done"].wait(timeout):
+            self._send_json({"ok": job["ok"], "slot_key": job["slot_key"],
+                             "running": job["running"], "job": _job_info(job)})
+        else:
+            self._send_json({"ok": True, "slot_key": job["slot_key"], "job": _job_info(job)}, 202)
+
+    def _content_length(self) -> int | None:
+        """The request's Content-Length, or None once a 400 has been sent."""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send_json({"ok": False, "error": "bad Content-Length"}, 400)
+            return None
+        return length
+
+    def _read_json(self, limit: int = MAX_JSON_BODY) -> dict | None:
+        """The request's JSON object, or None once a 400/413 has been sent."""
+        length = self._content_length()
+        if length is None:
+            return None
         if length == 0:
+            self._send_json({"ok": False, "error": "empty body"}, 400)
+            return None
+        if length > limit:
+            # The unread request body would corrupt the next keep-alive request
+            self.close_connection = True
+            self._send_json({"ok": False, "error": f"body larger than {limit} bytes"}, 413)
+            return None
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError as exc:
+            self._send_json({"ok": False, "error": f"invalid JSON: {exc}"}, 400)
+            return None
+        if not isinstance(body, dict):
+            self._send_json({"ok": False, "error": "body is not a JSON object"}, 400)
             return None
-        return json.loads(self.rfile.read(length))
+        return body
 
     # -- routes --
 
@@ -343,22 +1805,36 @@ class Handler(http.server.BaseHTTPRequestHandler):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", 0)
         self.end_headers()
 
     def do_GET(self):
-        path = urlparse(self.path).path
+        url = urlparse(self.path)
+        path = url.path
 
         if path == "/api/devices":
             self._handle_get_devices()
         elif path == "/api/info":
             self._handle_get_info()
+        elif path == "/api/events":
+            self._handle_events(parse_qs(url.query))
+        elif path == "/api/jobs":
+            with jobs_lock:
+                self._send_json({"jobs": [_job_info(j) for j in jobs.values()]})
+        elif path.startswith("/api/jobs/") and path.endswith("/events"):
+            self._handle_job_events(path[len("/api/jobs/"):-len("/events")])
+        elif path.startswith("/api/jobs/"):
+            self._handle_get_job(path[len("/api/jobs/"):])
+        elif path.startswith("/api/logs/"):
+            self._handle_get_logs(unquote(path[len("/api/logs/"):]), parse_qs(url.query))
         elif path in ("/", "/index.html"):
             self._serve_ui()
         else:
             self._send_json({"error": "not found"}, 404)
 
     def do_POST(self):
-        path = urlparse(self.path).path
+        url = urlparse(self.path)
+        path = url.path
 
         if path == "/api/hotplug":
             self._handle_hotplug()
@@ -366,32 +1842,152 @@ class Handler(http.server.BaseHTTPRequestHandler):
             self._handle_start()
         elif path == "/api/stop":
             self._handle_stop()
+        elif path == "/api/flash":
+            self._handle_flash(parse_qs(url.query))
         else:
+            # The unread request body would corrupt the next keep-alive request
+            self.close_connection = True
             self._send_json({"error": "not found"}, 404)
 
     # -- handlers --
 
     def _handle_get_devices(self):
-        infos = []
-        for slot in slots.values():
-            _refresh_slot_health(slot)
-            infos.append(_slot_info(slot))
-        self._send_json({"slots": infos, "host_ip": host_ip, "hostname": hostname})
+        _refresh_health()
+        self._send_cached(_devices_response())
 
     def _handle_get_info(self):
-        self._send_json({
-            "host_ip": host_ip,
-            "hostname": hostname,
-            "slots_configured": sum(1 for s in slots.values() if s["tcp_port"] is not None),
-            "slots_running": sum(1 for s in slots.values() if s["running"]),
-        })
+        self._send_cached(_info_response())
 
-    def _handle_hotplug(self):
-        global seq_counter
+    def _handle_events(self, query):
+        """Server-Sent Events stream of slot changes.
 
+        Starts with a "snapshot" event (all slots) unless ?since=<seq> or
+        Last-Event-ID names a seq still covered by the event history, in
+        which case the missed "slot" events are replayed instead.
+        """
+        since = query.get("since", [None])[0] or self.headers.get("Last-Event-ID")
+        try:
+            last = int(since) if since is not None else None
+        except ValueError:
+            self._send_json({"error": "bad since"}, 400)
+            return
+
+        self._send_stream_headers("text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                with events_cond:
+                    if (last is not None and events_evicted <= last <= seq_counter
+                            and not (events and events[-1]["seq"] > last)):
+                        events_cond.wait(SSE_KEEPALIVE)
+                    if last is None or not events_evicted <= last <= seq_counter:
+                        # New subscriber, too far behind to replay, or a seq
+                        # from before a portal restart
+                        last = seq_counter
+                        pending = [("snapshot", {
+                            "seq": last,
+                            "slots": [_slot_info(s) for s in _all_slots()],
+                            "host_ip": host_ip,
+                            "hostname": hostname,
+                        })]
+                    else:
+                        pending = [("slot", e) for e in events if e["seq"] > last]
+                if not pending:
+                    self.wfile.write(b": keepalive\n\n")
+                for kind, data in pending:
+                    last = data["seq"]
+                    self.wfile.write(
+                        f"id: {last}\nevent: {kind}\ndata: {json.dumps(data)}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _handle_get_job(self, job_id):
+        try:
+            job = jobs.get(int(job_id))
+        except ValueError:
+            job = None
+        if job is None:
+            self._send_json({"error": "unknown job"}, 404)
+            return
+        self._send_json(_job_info(job))
+
+    def _handle_job_events(self, job_id):
+        """Server-Sent Events stream of one job: a "job" event per change.
+
+        The stream ends after the event that reports the job done.
+        """
+        try:
+            job = jobs.get(int(job_id))
+        except ValueError:
+            job = None
+        if job is None:
+            self._send_json({"error": "unknown job"}, 404)
+            return
+
+        self._send_stream_headers("text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        last = None
+        try:
+            while True:
+                with jobs_changed:
+                    info = _job_info(job)
+                    if info == last:
+                        jobs_changed.wait(SSE_KEEPALIVE)
+                        info = _job_info(job)
+                if info == last:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write(f"event: job\ndata: {json.dumps(info)}\n\n".encode())
+                    last = info
+                self.wfile.flush()
+                if info["state"] == "done":
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _handle_get_logs(self, label, query):
+        """Stream a slot's log lines between ?from= and ?to= (plain text)."""
+        if not label or "/" in label or label.startswith("."):
+            self._send_json({"error": "invalid label"}, 400)
+            return
+        try:
+            now = time.time()
+            start = _parse_log_time(query.get("from", [None])[0], now - 3600)
+            end = _parse_log_time(query.get("to", [None])[0], now)
+        except ValueError as exc:
+            self._send_json({"error": f"bad time: {exc}"}, 400)
+            return
+        try:
+            # Reader lives next to the writer in serial_proxy.py (installed alongside)
+            from serial_proxy import iter_log_range
+        except ImportError as exc:
+            self._send_json({"error": f"log reader unavailable: {exc}"}, 501)
+            return
+
+        self._send_stream_headers("text/plain; charset=utf-8")
+        self.end_headers()
+        chunk = []
+        size = 0
+        try:
+            for line in iter_log_range(LOG_DIR, label, start, end):
+                chunk.append(line)
+                size += len(line)
+                if size >= 64 * 1024:
+                    self.wfile.write("".join(chunk).encode())
+                    chunk, size = [], 0
+            if chunk:
+                self.wfile.write("".join(chunk).encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as exc:
+            print(f"[portal] logs {label}: {exc}", flush=True)
+
+    def _handle_hotplug(self):
         body = self._read_json()
         if body is None:
-            self._send_json({"ok": False, "error": "empty body"}, 400)
             return
 
         action = body.get("action")
@@ -403,70 +1999,16 @@ class Handler(http.server.BaseHTTPRequestHandler):
             self._send_json({"ok": False, "error": "missing action"}, 400)
             return
 
-        slot_key = id_path if id_path else devpath
-        if not slot_key:
-            self._send_json({"ok": False, "error": "missing id_path and devpath"}, 400)
+        try:
+            result = handle_hotplug(action, devnode, id_path, devpath, body.get("seqnum"))
+        except ValueError as exc:
+            self._send_json({"ok": False, "error": str(exc)}, 400)
             return
-
-        # Look up or create slot
-        if slot_key not in slots:
-            slots[slot_key] = _make_dynamic_slot(slot_key)
-
-        slot = slots[slot_key]
-        lock = slot["_lock"]
-
-        # Update event bookkeeping (always, even for unknown slots)
-        seq_counter += 1
-        slot["seq"] = seq_counter
-        slot["last_action"] = action
-        slot["last_event_ts"] = datetime.now(timezone.utc).isoformat()
-
-        configured = slot["tcp_port"] is not None
-
-        if action == "add":
-            slot["present"] = True
-            slot["devnode"] = devnode
-
-            if configured:
-                # Start proxy in a background thread so we don't block the
-                # HTTP response for the settle + port-listen check.
-                def _bg_start(s=slot, lk=lock):
-                    with lk:
-                        # Stop existing proxy first if still running
-                        if s["running"] and s["pid"]:
-                            stop_proxy(s)
-                        start_proxy(s)
-                threading.Thread(target=_bg_start, daemon=True).start()
-            else:
-                print(
-                    f"[portal] hotplug: unknown slot_key={slot_key} "
-                    f"(tracked, no proxy)",
-                    flush=True,
-                )
-
-        elif action == "remove":
-            slot["present"] = False
-            if configured and slot["running"]:
-                with lock:
-                    stop_proxy(slot)
-
-        print(
-            f"[portal] hotplug: {action} slot_key={slot_key} "
-            f"devnode={devnode} seq={seq_counter}",
-            flush=True,
-        )
-
-        self._send_json({
-            "ok": True,
-            "slot_key": slot_key,
-            "seq": seq_counter,
-            "accepted": configured,
-        })
+        self._send_json(result)
 
     def _handle_start(self):
         body = self._read_json()
         if body is None:
-            self._send_json({"ok": False, "error": "empty body"}, 400)
             return
 
         slot_key = body.get("slot_key")
@@ -479,19 +2021,16 @@ class Handler(http.server.BaseHTTPRequestHandler):
             self._send_json({"ok": False, "error": "unknown slot_key"}, 404)
             return
 
-        slot = slots[slot_key]
-        with slot["_lock"]:
-            if slot["running"] and slot["pid"]:
-                stop_proxy(slot)
+        def _start(slot, devnode=devnode):
             slot["devnode"] = devnode
             slot["present"] = True
-            ok = start_proxy(slot)
-        self._send_json({"ok": ok, "slot_key": slot_key, "running": slot["running"]})
+            return _restart_proxy(slot)
+
+        self._send_job(submit_job(slots[slot_key], "start", _start), body.get("wait", False))
 
     def _handle_stop(self):
         body = self._read_json()
         if body is None:
-            self._send_json({"ok": False, "error": "empty body"}, 400)
             return
 
         slot_key = body.get("slot_key")
@@ -503,19 +2042,101 @@ class Handler(http.server.BaseHTTPRequestHandler):
             self._send_json({"ok": False, "error": "unknown slot_key"}, 404)
             return
 
-        slot = slots[slot_key]
-        with slot["_lock"]:
-            stop_proxy(slot)
-        self._send_json({"ok": True, "slot_key": slot_key, "running": False})
+        self._send_job(submit_job(slots[slot_key], "stop", stop_proxy), body.get("wait", False))
+
+    def _handle_flash(self, query):
+        """POST /api/flash: base64 images in JSON, or raw application/octet-stream.
+
+        A raw upload takes its parameters from the query string.  Either
+        way the images go to a temporary directory that the job removes
+        when it is done.
+        """
+        tmp = tempfile.mkdtemp(prefix="rfc2217-flash-")
+        submitted = False
+        try:
+            submitted = self._submit_flash(query, tmp)
+        finally:
+            if not submitted:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def _submit_flash(self, query, tmp: str) -> bool:
+        """Store the images in *tmp* and queue the flash job; False once an error was sent."""
+        upload = self.headers.get_content_type() == "application/octet-stream"
+        if upload:
+            params = {k: v[-1] for k, v in query.items()}
+            params["wait"] = params.get("wait", "").lower() in ("1", "true")
+        else:
+            params = self._read_json(FLASH_MAX_JSON)
+            if params is None:
+                return False
+
+        slot_key, label = params.get("slot_key"), params.get("label")
+        slot = (slots.get(slot_key) if isinstance(slot_key, str) else None) or _slot_by_label(label)
+        if slot is None:
+            self.close_connection = upload
+            self._send_json({"ok": False, "error": "unknown slot_key or label"}, 404)
+            return False
+        try:
+            baud = int(params.get("baud", FLASH_BAUD))
+            if not upload:
+                images = _parse_flash_request(params, tmp)
+        except (ValueError, TypeError) as exc:
+            self.close_connection = upload
+            self._send_json({"ok": False, "error": str(exc)}, 400)
+            return False
+        if upload:
+            images = self._receive_images(query, tmp)
+            if images is None:
+                return False
+        chip = str(params.get("chip", "auto"))
+        options = {k: params[k] for k in ("flash_mode", "flash_freq", "flash_size") if k in params}
+
+        def _flash(slot, images=images, baud=baud, chip=chip, options=options):
+            try:
+                return flash_slot(slot, images, baud, chip, options)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        self._send_job(submit_job(slot, "flash", _flash), params.get("wait", False), FLASH_TIMEOUT)
+        return True
+
+    def _receive_images(self, query, tmp: str) -> list[tuple[int, str]] | None:
+        """Stream an octet-stream body into image files in *tmp*.
+
+        ?offset= gives each image's flash offset and ?size= the length of
+        every image but the last, which takes the rest of the body.  Returns
+        (offset, path) pairs, or None once an error has been sent.
+        """
+        length = self._content_length()
+        if length is None:
+            return None
+        if length > FLASH_MAX_UPLOAD:
+            self.close_connection = True
+            self._send_json({"ok": False, "error": f"body larger than {FLASH_MAX_UPLOAD} bytes"}, 413)
+            return None
+        try:
+            layout = _parse_image_sizes(query.get("offset", []), query.get("size", []), length)
+        except ValueError as exc:
+            self.close_connection = True
+            self._send_json({"ok": False, "error": str(exc)}, 400)
+            return None
+        images = []
+        for i, (offset, size) in enumerate(layout):
+            path = os.path.join(tmp, f"{i}.bin")
+            with open(path, "wb") as f:
+                while size:
+                    chunk = self.rfile.read(min(FLASH_CHUNK, size))
+                    if not chunk:
+                        self.close_connection = True
+                        self._send_json({"ok": False, "error": "body shorter than Content-Length"}, 400)
+                        return None
+                    f.write(chunk)
+                    size -= len(chunk)
+            images.append((offset, path))
+        return images
 
     def _serve_ui(self):
-        html = _UI_HTML
-        body = html.encode()
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html")
-        self.send_header("Content-Length", len(body))
-        self.end_headers()
-        self.wfile.write(body)
+        self._send_cached(_UI_RESPONSE, "text/html")
 
 
 _UI_HTML = """\
@@ -576,29 +2197,53 @@ _UI_HTML = """\
 <body>
     <h1 id="title">RFC2217 Serial Portal</h1>
     <div class="slots" id="slots"></div>
-    <div class="info" id="info">Auto-refresh every 2 seconds</div>
+    <div class="info" id="info">Connecting…</div>
 <script>
 let hostName = '';
 let hostIp = '';
+let slotList = [];
+
+function showAll(data, mode) {
+    hostName = data.hostname || '';
+    hostIp = data.host_ip || '';
+    if (hostName) {
+        document.getElementById('title').textContent = hostName + ' — RFC2217 Serial Portal';
+        document.title = hostName + ' — RFC2217 Serial Portal';
+    }
+    slotList = data.slots;
+    renderSlots(slotList);
+    showMode(mode);
+}
+
+function showMode(mode) {
+    document.getElementById('info').textContent =
+        (hostIp ? 'Hostname: ' + hostName + '  |  IP: ' + hostIp + '  |  ' : '') + mode;
+}
 
 async function fetchDevices() {
     try {
         const resp = await fetch('/api/devices');
-        const data = await resp.json();
-        hostName = data.hostname || '';
-        hostIp = data.host_ip || '';
-        if (hostName) {
-            document.getElementById('title').textContent = hostName + ' — RFC2217 Serial Portal';
-            document.title = hostName + ' — RFC2217 Serial Portal';
-        }
-        renderSlots(data.slots);
-        document.getElementById('info').textContent =
-            'Hostname: ' + hostName + '  |  IP: ' + hostIp + '  |  Auto-refresh every 2s';
+        showAll(await resp.json(), 'Auto-refresh every 2s');
     } catch (e) {
         console.error('Error fetching devices:', e);
     }
 }
 
+// Live updates: a snapshot, then one event per changed slot.  EventSource
+// reconnects by itself and resumes from the last event id.
+function subscribe() {
+    const es = new EventSource('/api/events');
+    es.onopen = () => showMode('Live updates');
+    es.onerror = () => showMode('Connection lost, reconnecting…');
+    es.addEventListener('snapshot', e => showAll(JSON.parse(e.data), 'Live updates'));
+    es.addEventListener('slot', e => {
+        const s = JSON.parse(e.data).slot;
+        const i = slotList.findIndex(x => x.slot_key === s.slot_key);
+        if (i >= 0) slotList[i] = s; else slotList.push(s);
+        renderSlots(slotList);
+    });
+}
+
 function slotStatus(s) {
     if (s.running) return 'running';
     if (s.present) return 'present';
@@ -645,12 +2290,18 @@ function copyUrl(url, el) {
     setTimeout(() => { el.classList.remove('copied'); el.textContent = url; }, 1000);
 }
 
-fetchDevices();
-setInterval(fetchDevices, 2000);
+if (window.EventSource) {
+    subscribe();
+} else {
+    fetchDevices();
+    setInterval(fetchDevices, 2000);
+}
 </script>
 </body>
 </html>
 """
+_UI_BODY = _UI_HTML.encode()
+_UI_RESPONSE = (f'"{hashlib.sha1(_UI_BODY).hexdigest()[:16]}"', _UI_BODY, gzip.compress(_UI_BODY, 6))
 
 
 # ---------------------------------------------------------------------------
@@ -658,7 +2309,7 @@ setInterval(fetchDevices, 2000);
 # ---------------------------------------------------------------------------
 
 def main():
-    global slots, host_ip, hostname
+    global slots, host_ip, hostname, pool
 
     slots = load_config(CONFIG_FILE)
     host_ip = get_host_ip()
@@ -671,25 +2322,48 @@ def main():
 
     os.makedirs(LOG_DIR, exist_ok=True)
 
-    # Scan for devices already plugged in at boot
-    scan_existing_devices()
+    # Warm workers so hotplug starts skip interpreter startup and imports
+    proxy_exe = _find_proxy_exe()
+    if PROXY_MODE == "process" and POOL_SIZE > 0 and proxy_exe and "serial_proxy" in proxy_exe:
+        pool = ProxyPool(proxy_exe, POOL_SIZE)
+        pool.fill()
+
+    # Subscribe to hotplug events before the boot scan so none are missed
+    if UDEV_MONITOR:
+        try:
+            UdevMonitor().start()
+            print("[portal] udev monitor: listening for tty uevents", flush=True)
+        except OSError as exc:
+            print(f"[portal] udev monitor unavailable ({exc}); relying on /api/hotplug", flush=True)
 
     addr = ("", PORT)
-    http.server.HTTPServer.allow_reuse_address = True
-    httpd = http.server.HTTPServer(addr, Handler)
+    # One thread per connection: a slow request never stalls the others
+    http.server.ThreadingHTTPServer.allow_reuse_address = True
+    httpd = http.server.ThreadingHTTPServer(addr, Handler)
+    server = threading.Thread(target=httpd.serve_forever, name="http", daemon=True)
+    server.start()
     print(
         f"[portal] v3 listening on http://0.0.0.0:{PORT}  "
-        f"host_ip={host_ip}  hostname={hostname}",
+        f"host_ip={host_ip}  hostname={hostname}  proxy_mode={PROXY_MODE}",
         flush=True,
     )
+
+    # Scan for devices already plugged in at boot; the API is already up
+    # and the proxies start in the background
+    scan_existing_devices()
+
     try:
-        httpd.serve_forever()
+        while server.is_alive():
+            server.join(1.0)
     except KeyboardInterrupt:
         print("[portal] shutting down", flush=True)
+        httpd.shutdown()
         # Stop all running proxies
-        for slot in slots.values():
+        for slot in _all_slots():
             if slot["running"] and slot["pid"]:
                 stop_proxy(slot)
+        if pool:
+            pool.close()
         httpd.server_close()
 
 
@@ -1,15 +1,18 @@
 #!/bin/bash
 # Notify the RFC2217 portal of a udev hotplug event.
-# Called via systemd-run from 99-rfc2217-hotplug.rules.
+# Called via systemd-run from 99-rfc2217-hotplug.rules, which is only
+# needed when the portal's own udev monitor is disabled (RFC2217_UDEV_MONITOR=0).
 #
-# Args: ACTION DEVNAME ID_PATH DEVPATH
+# Args: ACTION DEVNAME ID_PATH DEVPATH [SEQNUM]
 
 ACTION="$1"
 DEVNAME="$2"
 ID_PATH="$3"
 DEVPATH="$4"
+SEQNUM="$5"
+PORTAL_URL="${RFC2217_PORTAL_URL:-http://127.0.0.1:8080}"
 
-curl -m 2 -s -X POST http://127.0.0.1:8080/api/hotplug \
+curl -m 2 -s -X POST "$PORTAL_URL/api/hotplug" \
   -H 'Content-Type: application/json' \
-  -d "{\"action\":\"$ACTION\",\"devnode\":\"$DEVNAME\",\"id_path\":\"${ID_PATH:-}\",\"devpath\":\"$DEVPATH\"}" \
+  -d "{\"action\":\"$ACTION\",\"devnode\":\"$DEVNAME\",\"id_path\":\"${ID_PATH:-}\",\"devpath\":\"$DEVPATH\",\"seqnum\":\"$SEQNUM\"}" \
   || true
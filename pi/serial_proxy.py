@@ -10,17 +10,32 @@ A proxy that:
 
 Usage:
     serial_proxy.py -p 4001 -l /var/log/serial/ /dev/ttyUSB0
+    serial_proxy.py -p 4001 --log-format binary /dev/ttyUSB0
+    serial_proxy.py -p 4001 --replay-port 5001 /dev/ttyUSB0
+    serial_proxy.py -p 4001 --raw-port 6001 /dev/ttyUSB0
+    serial_proxy.py --daemon --control /run/rfc2217/proxyd.sock
 """
 
 import argparse
+import fcntl
+import functools
+import gzip
+import heapq
+import json
 import os
+import queue
+import re
 import sys
 import time
 import socket
-import select
+import selectors
 import threading
+import shutil
 import signal
+import struct
 import serial
+import usb_sysfs
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
@@ -45,10 +60,769 @@ SET_MODEMSTATE_MASK = 11
 SET_DTR = 8
 SET_RTS = 11
 
-class SerialLogger:
-    """Logs serial data with timestamps"""
+# Extension (not in RFC 2217): run a named reset sequence on the server.
+# The payload is the sequence name in ASCII; the reply (ESP_RESET + 100) is
+# sent once the sequence has finished: "ok <name> <ms>" or "error <reason>".
+ESP_RESET = 50
+
+# Sequences for ESP_RESET, with esptool's timing.  DTR drives IO0 and RTS
+# drives EN through the usual two-transistor auto-reset circuit.
+# Steps: ('dtr', level), ('rts', level) or ('sleep', seconds).
+RESET_SEQUENCES = {
+    # Reset into the bootloader through a USB-UART bridge
+    'classic': (
+        ('dtr', False), ('rts', True),      # IO0 high, EN low: in reset
+        ('sleep', 0.1),
+        ('dtr', True), ('rts', False),      # IO0 low, EN high: out of reset
+        ('sleep', 0.05),
+        ('dtr', False),                     # IO0 high again
+    ),
+    # Reset into the bootloader through the built-in USB-Serial/JTAG
+    'usb-jtag': (
+        ('rts', False), ('dtr', False),     # idle
+        ('sleep', 0.1),
+        ('dtr', True), ('rts', False),      # IO0 low
+        ('sleep', 0.1),
+        ('rts', True), ('dtr', False), ('rts', True),  # reset, through (1,1)
+        ('sleep', 0.1),
+        ('dtr', False), ('rts', False),     # out of reset
+    ),
+    # Reset and run the application
+    'hard': (
+        ('rts', True),                      # EN low
+        ('sleep', 0.1),
+        ('rts', False),
+    ),
+}
+
+# Maximum bytes pulled from the tty / client socket per readiness event
+READ_CHUNK = 4096
+
+# Per-direction write queue bounds (bytes)
+RX_QUEUE_LIMIT = 256 * 1024     # serial -> client; overflow is dropped
+OBSERVER_QUEUE_LIMIT = 64 * 1024  # serial -> each read-only observer
+TX_QUEUE_LIMIT = 64 * 1024      # client -> serial; overflow pauses client reads
+IOV_MAX = 64                    # buffers handed to one writev()/sendmsg()
+
+# Recent RX kept per proxy for clients connecting to the replay port
+SCROLLBACK_BYTES = 64 * 1024
+
+# Read-only clients allowed alongside the controlling one; more are refused
+MAX_OBSERVERS = 8
+LISTEN_BACKLOG = 8
+# TCP keepalive on the controlling connection, so a client that vanished
+# without closing (cable pulled, host crashed) frees the slot in ~25 s
+KEEPALIVE_IDLE = 10
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+
+# Control socket of the multi-slot daemon (--daemon)
+DAEMON_CONTROL_PATH = '/run/rfc2217/proxyd.sock'
+
+
+class WriteQueue:
+    """Bounded FIFO of pending output for one direction of the proxy.
+
+    Data is written straight through while the queue is empty; whatever the
+    non-blocking sink does not accept is queued and drained on writability.
+    Once *limit* bytes are pending, new data is dropped and counted.
+
+    *write* takes a list of buffers and returns the number of bytes
+    accepted (``socket.sendmsg`` / ``os.writev`` semantics), raising
+    BlockingIOError when the sink is full.
+    """
+
+    def __init__(self, write, limit):
+        self.write = write
+        self.limit = limit
+        self._chunks = deque()
+        self.pending = 0        # bytes currently queued
+        self.peak = 0           # high-water mark of pending
+        self.written = 0        # bytes accepted by the sink
+        self.stalled = 0        # bytes that had to wait for writability
+        self.dropped = 0        # bytes discarded because the queue was full
+        self.stalls = 0         # times the sink refused data
+
+    def __len__(self):
+        return self.pending
+
+    def push(self, data):
+        """Write *data* now if possible and queue the rest.
+
+        Returns the number of bytes dropped.
+        """
+        if not data:
+            return 0
+        if not self._chunks:
+            n = self._write([data])
+            if n == len(data):
+                return 0
+            self.stalls += 1
+            data = memoryview(data)[n:]
+
+        space = max(self.limit - self.pending, 0)
+        dropped = 0
+        if len(data) > space:
+            dropped = len(data) - space
+            self.dropped += dropped
+            data = data[:space]
+        if data:
+            self._chunks.append(data)
+            self.pending += len(data)
+            self.stalled += len(data)
+            self.peak = max(self.peak, self.pending)
+        return dropped
+
+    def flush(self):
+        """Drain as much as the sink accepts.  Returns True once empty."""
+        while self._chunks:
+            batch = [self._chunks[i] for i in range(min(len(self._chunks), IOV_MAX))]
+            n = self._write(batch)
+            if n == 0:
+                self.stalls += 1
+                return False
+            self.pending -= n
+            while n:
+                head = self._chunks[0]
+                if n >= len(head):
+                    n -= len(head)
+                    self._chunks.popleft()
+                else:
+                    self._chunks[0] = memoryview(head)[n:]
+                    n = 0
+        return True
+
+    def clear(self):
+        """Discard pending data (counted as dropped)"""
+        self.dropped += self.pending
+        self._chunks.clear()
+        self.pending = 0
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'peak': self.peak,
+            'written': self.written,
+            'stalled': self.stalled,
+            'dropped': self.dropped,
+            'stalls': self.stalls,
+        }
+
+    def _write(self, buffers):
+        try:
+            n = self.write(buffers)
+        except BlockingIOError:
+            return 0
+        self.written += n
+        return n
+
+
+class ScrollbackBuffer:
+    """Fixed-size ring of the most recent bytes read from the device.
+
+    The storage is allocated once; write() copies each chunk in at most two
+    slice assignments and never allocates.  snapshot() returns the buffered
+    bytes oldest first as one bytes object, ready for a single send.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._pos = 0           # next write offset
+        self.filled = 0         # valid bytes, up to size
+        self.total = 0          # bytes ever written
+
+    def __len__(self):
+        return self.filled
+
+    def write(self, data):
+        n = len(data)
+        self.total += n
+        if n >= self.size:
+            # Only the tail fits
+            self._view[:] = memoryview(data)[n - self.size:]
+            self._pos = 0
+            self.filled = self.size
+            return
+        end = self._pos + n
+        if end <= self.size:
+            self._view[self._pos:end] = data
+        else:
+            split = self.size - self._pos
+            self._view[self._pos:] = memoryview(data)[:split]
+            self._view[:end - self.size] = memoryview(data)[split:]
+        self._pos = end % self.size
+        self.filled = min(self.filled + n, self.size)
+
+    def snapshot(self):
+        if self.filled < self.size:
+            return bytes(self._view[:self.filled])
+        return b''.join((self._view[self._pos:], self._view[:self._pos]))
+
+
+class RFC2217Parser:
+    """Incremental telnet/RFC2217 stream parser.
+
+    Keeps its state between feed() calls, so IAC, option and SB ... SE
+    sequences split across recv() boundaries are handled correctly.
+    Chunks without IAC are returned unchanged (one bytes.find, no copy);
+    otherwise the data between IACs is sliced out in bulk.
+
+    on_negotiation(cmd, opt) is called for DO/DONT/WILL/WONT, and
+    on_subnegotiation(opt, payload) for each complete subnegotiation.
+    """
+
+    DATA, IAC_SEEN, NEG, SB_OPT, SB_DATA, SB_IAC = range(6)
+    MAX_SB = 1024   # subnegotiation payloads larger than this are truncated
+
+    def __init__(self, on_negotiation, on_subnegotiation):
+        self.on_negotiation = on_negotiation
+        self.on_subnegotiation = on_subnegotiation
+        self.reset()
+
+    def reset(self):
+        self.state = self.DATA
+        self._neg_cmd = 0
+        self._sb_opt = 0
+        self._sb = bytearray()
+
+    def feed(self, data):
+        """Consume a chunk of client data, return the payload bytes."""
+        if self.state == self.DATA:
+            idx = data.find(IAC)
+            if idx == -1:
+                return data
+        else:
+            idx = -1
+
+        out = []
+        pos = 0
+        n = len(data)
+        while pos < n:
+            state = self.state
+            if state == self.DATA:
+                if idx == -1:
+                    idx = data.find(IAC, pos)
+                if idx == -1:
+                    out.append(data[pos:])
+                    break
+                if idx > pos:
+                    out.append(data[pos:idx])
+                pos = idx + 1
+                idx = -1
+                self.state = self.IAC_SEEN
+                continue
+
+            byte = data[pos]
+            pos += 1
+            if state == self.IAC_SEEN:
+                if byte == IAC:
+                    # Escaped IAC: literal 0xFF
+                    out.append(b'\xff')
+                    self.state = self.DATA
+                elif byte in (DO, DONT, WILL, WONT):
+                    self._neg_cmd = byte
+                    self.state = self.NEG
+                elif byte == SB:
+                    self.state = self.SB_OPT
+                else:
+                    # Other two-byte commands (NOP, GA, ...) are ignored
+                    self.state = self.DATA
+            elif state == self.NEG:
+                self.state = self.DATA
+                self.on_negotiation(self._neg_cmd, byte)
+            elif state == self.SB_OPT:
+                self._sb_opt = byte
+                self._sb.clear()
+                self.state = self.SB_DATA
+            elif state == self.SB_DATA:
+                # Copy up to the next IAC in one slice
+                end = data.find(IAC, pos - 1)
+                if end == -1:
+                    end = n
+                self._sb_append(data[pos - 1:end])
+                pos = end
+                if end < n:
+                    pos += 1
+                    self.state = self.SB_IAC
+            elif state == self.SB_IAC:
+                if byte == SE:
+                    self.state = self.DATA
+                    payload = bytes(self._sb)
+                    self._sb.clear()
+                    self.on_subnegotiation(self._sb_opt, payload)
+                elif byte == IAC:
+                    self._sb_append(b'\xff')
+                    self.state = self.SB_DATA
+                else:
+                    # Protocol violation: abandon the subnegotiation
+                    self._sb.clear()
+                    self.state = self.IAC_SEEN
+                    pos -= 1
+
+        if len(out) == 1:
+            return out[0]
+        return b''.join(out)
+
+    def _sb_append(self, chunk):
+        room = self.MAX_SB - len(self._sb)
+        if room > 0:
+            self._sb += chunk[:room]
+
+
+class ClientSession:
+    """One TCP client of a proxy.
+
+    The controlling client's data goes to the serial port and its COM-PORT
+    requests are applied; an observer only receives RX data, its requests
+    are acknowledged without touching the port and its data is discarded.
+    Every session has its own parser and bounded RX queue; the queues of
+    all sessions reference the same bytes object read from the port.
+
+    A *raw* session (raw port) has no parser and is always an observer: it
+    receives serial data as it is, 0xFF included, and whatever it sends is
+    discarded unparsed.
+    """
+
+    def __init__(self, sock, addr, controlling, on_negotiation, on_subnegotiation, raw=False):
+        self.sock = sock
+        self.peer = f"{addr[0]}:{addr[1]}"
+        self.controlling = controlling
+        self.role = 'control' if controlling else 'observer'
+        self.raw = raw
+        limit = RX_QUEUE_LIMIT if controlling else OBSERVER_QUEUE_LIMIT
+        self.rx_queue = WriteQueue(sock.sendmsg, limit)
+        self.parser = None if raw else RFC2217Parser(functools.partial(on_negotiation, self),
+                                                     functools.partial(on_subnegotiation, self))
+        self.overflow = False
+        self.ignored = 0        # observer bytes discarded
+
+
+class _Escapes(dict):
+    """Memoized replacement text for characters matched by _control_re()"""
+
+    def __missing__(self, c):
+        value = self[c] = c if c.isprintable() else f'\\x{ord(c):02x}'
+        return value
+
+
+_ESCAPES = _Escapes()
+
+
+@functools.lru_cache(maxsize=None)
+def _control_re():
+    """Regex matching every non-printable character except \\n, \\r and \\t.
+
+    Built on first use (in the log writer thread) from str.isprintable()
+    over the BMP; astral characters are matched wholesale and checked
+    individually by _ESCAPES.
+    """
+    ranges = []
+    start = None
+    for c in range(0x10001):
+        bad = c < 0x10000 and not chr(c).isprintable() and chr(c) not in '\n\r\t'
+        if bad and start is None:
+            start = c
+        elif not bad and start is not None:
+            ranges.append(f'{re.escape(chr(start))}-{re.escape(chr(c - 1))}')
+            start = None
+    return re.compile(f"([{''.join(ranges)}\U00010000-\U0010ffff])")
+
+
+# Control events recorded by SerialLogger.log_event() and their text form
+EV_BAUD = 1
+EV_DATASIZE = 2
+EV_PARITY = 3
+EV_STOPSIZE = 4
+EV_DTR = 5
+EV_RTS = 6
+
+EVENT_TEXT = {
+    EV_BAUD: "Baudrate changed to {}",
+    EV_DATASIZE: "Data size changed to {}",
+    EV_PARITY: "Parity changed to {}",
+    EV_STOPSIZE: "Stop bits changed to {}",
+    EV_DTR: "DTR {}",
+    EV_RTS: "RTS {}",
+}
+
+# Binary log format (.bin): MAGIC followed by records of
+#   <int64 monotonic ns> <uint8 type> <uint32 length> <payload>
+# REC_ANCHOR payloads carry the wall-clock ns matching their monotonic
+# timestamp and are written whenever a file is opened; REC_EVENT payloads
+# are <uint8 event code> + UTF-8 value.
+BINARY_LOG_MAGIC = b'SPXLOG\x00\x01'
+REC_ANCHOR = 0
+REC_RX = 1
+REC_TX = 2
+REC_INFO = 3
+REC_EVENT = 4
+_REC_HEADER = struct.Struct('<qBI')
+_REC_TYPES = {'RX': REC_RX, 'TX': REC_TX, 'INFO': REC_INFO, 'EVENT': REC_EVENT}
+_REC_NAMES = {REC_RX: 'RX', REC_TX: 'TX', REC_INFO: 'INFO', REC_EVENT: 'EVENT'}
+
+
+class TextRenderer:
+    """Renders log records in the text log format"""
+
+    def __init__(self):
+        self._ts_sec = None
+        self._ts_prefix = ''
+
+    def timestamp(self, ts):
+        """Format *ts* as 'YYYY-mm-dd HH:MM:SS.mmm', re-rendering only the ms"""
+        sec, usec = divmod(round(ts * 1000000), 1000000)
+        if sec != self._ts_sec:
+            self._ts_sec = sec
+            self._ts_prefix = datetime.fromtimestamp(sec).strftime('%Y-%m-%d %H:%M:%S')
+        return f"{self._ts_prefix}.{usec // 1000:03d}"
+
+    def line(self, ts, direction, message):
+        return f"[{self.timestamp(ts)}] [{direction}] {message}\n"
+
+    def data(self, ts, direction, data):
+        """Render binary data as escaped text lines"""
+        head = f"[{self.timestamp(ts)}] [{direction}] "
+        text = data.decode('utf-8', errors='replace')
+        # Escape control characters (except newline/CR/tab) in bulk: split
+        # around them and map only the matched characters.
+        parts = _control_re().split(text)
+        if len(parts) > 1:
+            parts[1::2] = [_ESCAPES[c] for c in parts[1::2]]
+            text = ''.join(parts)
+        return [f"{head}{line.rstrip()}\n" for line in text.split('\n') if line.strip()]
+
+    def event(self, ts, code, value):
+        return self.line(ts, 'INFO', EVENT_TEXT.get(code, f"Event {code}: {{}}").format(value))
+
+    def record(self, ts, direction, payload):
+        """Render one (ts, direction, payload) record as a list of lines"""
+        if direction == 'EVENT':
+            return [self.event(ts, *payload)]
+        if isinstance(payload, str):
+            return [self.line(ts, direction, payload)]
+        return self.data(ts, direction, payload)
+
+
+def read_binary_log(f, offset=0):
+    """Yield (wall_ts, direction, payload) records from a binary log file.
+
+    *payload* is bytes for RX/TX, str for INFO and (code, value) for
+    EVENT.  A non-zero *offset* must come from the sparse index (it
+    points at an anchor record).  A truncated trailing record (e.g. after
+    power loss) ends the stream quietly.
+    """
+    if offset:
+        f.seek(offset)
+    elif f.read(len(BINARY_LOG_MAGIC)) != BINARY_LOG_MAGIC:
+        raise ValueError("not a serial_proxy binary log")
+    wall_ns = mono_ns = 0
+    while True:
+        header = f.read(_REC_HEADER.size)
+        if len(header) < _REC_HEADER.size:
+            return
+        ts, kind, length = _REC_HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length:
+            return
+        if kind == REC_ANCHOR:
+            wall_ns, mono_ns = struct.unpack('<q', payload)[0], ts
+            continue
+        wall = (wall_ns + ts - mono_ns) / 1e9
+        if kind == REC_INFO:
+            yield wall, 'INFO', payload.decode('utf-8', errors='replace')
+        elif kind == REC_EVENT:
+            yield wall, 'EVENT', (payload[0], payload[1:].decode('utf-8', errors='replace'))
+        elif kind in _REC_NAMES:
+            yield wall, _REC_NAMES[kind], payload
+
+
+def export_binary_log(path, out):
+    """Render a binary log file to *out* in the text log format"""
+    renderer = TextRenderer()
+    with open(path, 'rb') as f:
+        for record in read_binary_log(f):
+            out.writelines(renderer.record(*record))
+
+
+# Sparse time index: a <log file>.idx sidecar of (wall ts, offset) entries,
+# one per LOG_INDEX_INTERVAL bytes written, for seeking by time.
+LOG_INDEX_INTERVAL = 64 * 1024
+INDEX_SUFFIX = '.idx'
+_INDEX_ENTRY = struct.Struct('<dQ')
+
+
+def index_path(log_path):
+    """Sidecar index for a (possibly compressed) log file"""
+    log_path = str(log_path)
+    for suffix in ('.gz', '.zst'):
+        if log_path.endswith(suffix):
+            log_path = log_path[:-len(suffix)]
+    return log_path + INDEX_SUFFIX
+
+
+def index_lookup(log_path, ts):
+    """Offset of the last indexed position at or before *ts* (0 if none).
+
+    Binary search over the fixed-size entries, so memory stays constant.
+    """
+    try:
+        f = open(index_path(log_path), 'rb')
+    except OSError:
+        return 0
+    with f:
+        count = os.fstat(f.fileno()).st_size // _INDEX_ENTRY.size
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid * _INDEX_ENTRY.size)
+            if _INDEX_ENTRY.unpack(f.read(_INDEX_ENTRY.size))[0] <= ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return 0
+        f.seek((lo - 1) * _INDEX_ENTRY.size)
+        return _INDEX_ENTRY.unpack(f.read(_INDEX_ENTRY.size))[1]
+
+
+def log_files(log_dir, name):
+    """(day, path) of *name*'s log files in chronological order"""
+    pattern = re.compile(re.escape(name) + r'_(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.(?:log|bin)(?:\.gz|\.zst)?$')
+    found = []
+    for entry in os.scandir(log_dir):
+        m = pattern.match(entry.name)
+        if m:
+            segment = int(m.group(2)) if m.group(2) else float('inf')
+            found.append((m.group(1), segment, entry.path))
+    found.sort()
+    return [(day, path) for day, _, path in found]
+
+
+def _open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def iter_log_range(log_dir, name, start, end):
+    """Yield text log lines of *name* with start <= timestamp <= end.
+
+    *start*/*end* are epoch seconds.  Each file is entered at the offset
+    its sparse index gives for *start* and read sequentially, so only the
+    requested range (plus at most one index interval) is scanned.
+    """
+    renderer = TextRenderer()
+    start_s, end_s = renderer.timestamp(start), renderer.timestamp(end)
+    for day, path in log_files(log_dir, name):
+        if day < start_s[:10] or day > end_s[:10]:
+            continue
+        offset = index_lookup(path, start)
+        with _open_log(path) as f:
+            if '.bin' in os.path.basename(path):
+                for record in read_binary_log(f, offset):
+                    if record[0] < start:
+                        continue
+                    if record[0] > end:
+                        return
+                    yield from renderer.record(*record)
+            else:
+                f.seek(offset)
+                for raw in f:
+                    stamp = raw[1:24].decode('ascii', errors='replace')
+                    if stamp < start_s:
+                        continue
+                    if stamp > end_s:
+                        return
+                    yield raw.decode('utf-8', errors='replace')
 
-    def __init__(self, log_dir, device_name, device_info=None):
+
+# Compression methods for closed log segments; zstd needs the optional
+# 'zstandard' package and falls back to gzip without it
+COMPRESS_METHODS = ('none', 'gzip', 'zstd')
+_COMPRESS_SUFFIX = {'gzip': '.gz', 'zstd': '.zst'}
+# Taken by whichever janitor is enforcing retention on the directory
+JANITOR_LOCK = '.janitor.lock'
+
+
+class LogJanitor:
+    """Background maintenance for a log directory.
+
+    Compresses closed log segments with streaming gzip/zstd and keeps the
+    whole directory (all slots) under *retention_bytes* by deleting the
+    oldest closed segments first.  Every proxy has a janitor on the same
+    directory, so they coordinate through flock(): a retention pass holds
+    JANITOR_LOCK, and a file is only compressed or deleted while holding an
+    exclusive lock on it, which fails as long as a SerialLogger has it open
+    (loggers hold a shared one).  Open files, index sidecars and other
+    janitors' *.tmp files count towards the budget but are never deleted.
+    Work runs on its own thread, fed through a queue.
+    """
+
+    COPY_CHUNK = 256 * 1024
+
+    def __init__(self, log_dir, compress='none', retention_bytes=0, log=None):
+        if compress == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                compress = 'gzip'
+                if log:
+                    log("zstandard not installed, compressing logs with gzip")
+        self.log_dir = Path(log_dir)
+        self.compress = compress
+        self.retention_bytes = retention_bytes
+        self._log = log or (lambda message: None)
+        self._queue = queue.Queue()
+        self.compressed = 0
+        self.deleted = 0
+        self._thread = threading.Thread(target=self._run, name='log-janitor', daemon=True)
+        self._thread.start()
+
+    def submit(self, path):
+        """Hand over a closed segment (None just re-checks retention)"""
+        self._queue.put(path)
+
+    def close(self):
+        """Stop once the current item is done, without waiting for it.
+
+        Compression writes a temporary file and renames it, so an item cut
+        short at exit leaves nothing half-written; the next logger for the
+        device queues the segment again (_submit_stale_segments).
+        """
+        self._queue.put(StopIteration)
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            if path is StopIteration:
+                return
+            try:
+                if path is not None and self.compress != 'none':
+                    self._compress(Path(path))
+                if self.retention_bytes:
+                    self._enforce_retention()
+            except OSError as e:
+                self._log(f"Log maintenance error: {e}")
+
+    def _compress(self, path):
+        if path.suffix in ('.gz', '.zst') or not path.exists():
+            return
+        target = path.with_name(path.name + _COMPRESS_SUFFIX[self.compress])
+        tmp = target.with_name(target.name + '.tmp')
+        with open(path, 'rb') as src:
+            if not _try_lock(src.fileno()):
+                # Still open by a logger, or another janitor has it
+                return
+            self._compress_file(path, src, target, tmp)
+        self.compressed += 1
+
+    def _compress_file(self, path, src, target, tmp):
+        """Compress the locked *src* into *target* through *tmp*, then drop *path*"""
+        with open(tmp, 'wb') as raw:
+            if self.compress == 'zstd':
+                import zstandard
+                with zstandard.ZstdCompressor().stream_writer(raw, closefd=False) as dst:
+                    shutil.copyfileobj(src, dst, self.COPY_CHUNK)
+            else:
+                with gzip.GzipFile(filename=path.name, mode='wb', fileobj=raw, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst, self.COPY_CHUNK)
+        shutil.copystat(path, tmp)
+        os.replace(tmp, target)
+        path.unlink()
+
+    def _enforce_retention(self):
+        with open(self.log_dir / JANITOR_LOCK, 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            self._delete_oldest()
+
+    def _delete_oldest(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.log_dir):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            total += st.st_size
+            if (entry.name.startswith('.') or entry.name.endswith('.tmp')
+                    or entry.name.endswith(INDEX_SUFFIX)):
+                # Index sidecars go together with their log file
+                continue
+            files.append((st.st_mtime, entry.path, st.st_size))
+        if total <= self.retention_bytes:
+            return
+        files.sort()
+        for _, path, size in files:
+            if total <= self.retention_bytes:
+                break
+            if not _unlink_unused(path):
+                continue
+            total -= size
+            try:
+                idx = index_path(path)
+                total -= os.path.getsize(idx)
+                os.unlink(idx)
+            except OSError:
+                pass
+            self.deleted += 1
+            self._log(f"Retention: deleted {os.path.basename(path)} ({size} bytes)")
+
+
+def _try_lock(fd):
+    """Take an exclusive flock on *fd* without waiting; False if it is held"""
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlink_unused(path):
+    """Delete *path* unless a logger has it open; True if it is gone"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return True
+    try:
+        if not _try_lock(fd):
+            return False
+        os.unlink(path)
+        return True
+    finally:
+        os.close(fd)
+
+
+class SerialLogger:
+    """Logs serial data with timestamps.
+
+    log(), log_data() and log_event() only capture (time, direction,
+    payload) and hand the record to a writer thread through a bounded
+    deque; formatting and file I/O happen off the forwarding path, batched
+    into large writes.  When QUEUE_LIMIT records are pending, new records
+    are dropped and an overflow marker with the count is written once the
+    writer catches up.
+
+    log_format 'text' writes the readable *.log format; 'binary' writes
+    byte-exact length-prefixed records to *.bin (see read_binary_log and
+    rfc2217-log-export).
+    """
+
+    QUEUE_LIMIT = 8192          # records pending for the writer thread
+    FILE_BUFFER = 64 * 1024
+    LOG_FORMATS = ('text', 'binary')
+
+    def __init__(self, log_dir, device_name, device_info=None, queue_limit=QUEUE_LIMIT,
+                 log_format='text', max_bytes=0, compress='none', retention_bytes=0,
+                 log_name=None):
+        if log_format not in self.LOG_FORMATS:
+            raise ValueError(f"unknown log format: {log_format}")
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
 
@@ -67,107 +841,600 @@ class SerialLogger:
         else:
             self.device_name = device_name.replace('/', '_').replace('dev_', '')
 
+        # An explicit log name (the portal passes the slot label) replaces
+        # the device-derived one in file names
+        self.description = self.device_name
+        if log_name:
+            self.device_name = log_name.replace('/', '_')
+
+        self.log_format = log_format
+        self.binary = log_format == 'binary'
+        self._clock = time.monotonic_ns if self.binary else time.time
+        self.renderer = TextRenderer()
+        self._anchor_mono = time.monotonic_ns()
+        self._anchor_wall = time.time_ns()
+
+        self.queue_limit = queue_limit
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._closing = False
+        self.records_written = 0
+        self.records_dropped = 0
+        self.batches = 0
+        self._dropped_reported = 0
+
+        self.max_bytes = max_bytes
+        self.janitor = None
+        if compress != 'none' or retention_bytes:
+            self.janitor = LogJanitor(log_dir, compress, retention_bytes, log=self.log)
+
         self.log_file = None
+        self.log_path = None
         self.current_date = None
-        self._rotate_log()
-
-    def _rotate_log(self):
-        """Create new log file for current date"""
+        self.log(self._opened_message())
+        if self.janitor:
+            self._submit_stale_segments()
+        self._thread = threading.Thread(
+            target=self._writer, name=f"log-{self.device_name}", daemon=True)
+        self._thread.start()
+
+    def _rotate_log(self, today, force=False):
+        """Switch to the log file for *today* (writer thread only).
+
+        With *force* the current file is closed as a numbered segment
+        (size rotation) and a fresh file is started for the same day.
+        """
+        if today == self.current_date and not force:
+            return
+        rotated = self.log_file is not None
+        if self.log_file:
+            self.log_file.close()
+            self._index_file.close()
+            closed = self.log_path
+            if force:
+                closed = self._next_segment_path(today)
+                os.replace(self.log_path, closed)
+                try:
+                    os.replace(index_path(self.log_path), index_path(closed))
+                except OSError:
+                    pass
+            if self.janitor:
+                self.janitor.submit(closed)
+        self.current_date = today
+        suffix = 'bin' if self.binary else 'log'
+        self.log_path = self.log_dir / f"{self.device_name}_{today}.{suffix}"
+        self.log_file = self._open_locked(self.log_path)
+        if self.binary:
+            if self.log_file.tell() == 0:
+                self.log_file.write(BINARY_LOG_MAGIC)
+            self._anchor_mono = time.monotonic_ns()
+            self._anchor_wall = time.time_ns()
+            self.log_file.write(self._encode(
+                self._anchor_mono, REC_ANCHOR, struct.pack('<q', self._anchor_wall)))
+        self._index_file = open(index_path(self.log_path), 'ab')
+        self._indexed_pos = -LOG_INDEX_INTERVAL
+        if rotated:
+            self._flush_records([(self._clock(), 'INFO', self._opened_message())])
+
+    def _open_locked(self, path):
+        """Open *path* for appending with a shared flock held until close.
+
+        The lock keeps every LogJanitor away from the file; if a janitor
+        deleted it while we waited for the lock, open it again.
+        """
+        while True:
+            f = open(path, 'ab' if self.binary else 'a', buffering=self.FILE_BUFFER)
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+            if os.fstat(f.fileno()).st_nlink:
+                return f
+            f.close()
+
+    def _opened_message(self):
+        if self.description != self.device_name:
+            return f"=== Log opened for {self.device_name} ({self.description}) ==="
+        return f"=== Log opened for {self.device_name} ==="
+
+    def _next_segment_path(self, day):
+        """{device}_{day}.N.{log,bin} with N one past the highest existing"""
+        suffix = 'bin' if self.binary else 'log'
+        pattern = re.compile(re.escape(f"{self.device_name}_{day}.") + r'(\d+)\.')
+        highest = 0
+        for name in os.listdir(self.log_dir):
+            m = pattern.match(name)
+            if m:
+                highest = max(highest, int(m.group(1)))
+        return self.log_dir / f"{self.device_name}_{day}.{highest + 1}.{suffix}"
+
+    def _submit_stale_segments(self):
+        """Queue this device's uncompressed files from earlier runs"""
+        pattern = re.compile(re.escape(self.device_name) + r'_\d{4}-\d{2}-\d{2}(\.\d+)?\.(log|bin)$')
         today = datetime.now().strftime('%Y-%m-%d')
-        if today != self.current_date:
-            if self.log_file:
-                self.log_file.close()
-            self.current_date = today
-            log_path = self.log_dir / f"{self.device_name}_{today}.log"
-            self.log_file = open(log_path, 'a', buffering=1)  # Line buffered
-            self.log(f"=== Log opened for {self.device_name} ===")
+        active = {f"{self.device_name}_{today}.log", f"{self.device_name}_{today}.bin"}
+        for name in sorted(os.listdir(self.log_dir)):
+            if pattern.match(name) and name not in active:
+                self.janitor.submit(self.log_dir / name)
+        self.janitor.submit(None)
 
     def log(self, message, direction='INFO'):
         """Log a message with timestamp"""
-        self._rotate_log()
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        self.log_file.write(f"[{timestamp}] [{direction}] {message}\n")
+        self._submit((self._clock(), direction, message))
 
     def log_data(self, data, direction='RX'):
         """Log binary data, converting to readable format"""
-        self._rotate_log()
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        self._submit((self._clock(), direction, data))
+
+    def log_event(self, code, value):
+        """Log a control event (EV_BAUD, EV_DTR, ...)"""
+        self._submit((self._clock(), 'EVENT', (code, value)))
+
+    def _submit(self, record):
+        # deque.append is atomic; the Event is only touched when the
+        # writer is idle, so the hot path takes no lock under load.
+        if len(self._queue) >= self.queue_limit:
+            self.records_dropped += 1
+            return
+        self._queue.append(record)
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _wall_time(self, ts):
+        """Record timestamp -> wall-clock seconds"""
+        if self.binary:
+            return (self._anchor_wall + ts - self._anchor_mono) / 1e9
+        return ts
+
+    def _writer(self):
+        """Writer thread: drain the queue, render, write one batch"""
+        queue = self._queue
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while queue:
+                batch = []
+                for _ in range(len(queue)):
+                    record = queue.popleft()
+                    day = self.renderer.timestamp(self._wall_time(record[0]))[:10]
+                    if day != self.current_date:
+                        self._flush_records(batch)
+                        batch = []
+                        self._rotate_log(day)
+                    batch.append(record)
+                self.records_written += len(batch)
+                dropped = self.records_dropped
+                if dropped != self._dropped_reported:
+                    batch.append((self._clock(), 'INFO',
+                                  f"Log queue overflow: {dropped - self._dropped_reported} "
+                                  f"record(s) dropped"))
+                    self._dropped_reported = dropped
+                self._flush_records(batch)
+                if self.max_bytes and self.log_file and self.log_file.tell() >= self.max_bytes:
+                    self._rotate_log(self.current_date, force=True)
+            if self._closing:
+                return
+
+    def _render(self, records):
+        """Render records into a list of str (text) or bytes (binary) chunks"""
+        out = []
+        if self.binary:
+            for ts, direction, payload in records:
+                if direction == 'EVENT':
+                    code, value = payload
+                    payload = bytes([code]) + str(value).encode()
+                elif isinstance(payload, str):
+                    payload = payload.encode()
+                out.append(self._encode(ts, _REC_TYPES.get(direction, REC_INFO), payload))
+        else:
+            for record in records:
+                out.extend(self.renderer.record(*record))
+        return out
+
+    @staticmethod
+    def _encode(ts, kind, payload):
+        return _REC_HEADER.pack(ts, kind, len(payload)) + payload
 
-        # Try to decode as text, fall back to hex
+    def _flush_records(self, records):
+        if records and self.log_file:
+            self._index_point(records[0][0])
+            self._write_batch(self._render(records))
+
+    def _index_point(self, ts):
+        """Append a sparse index entry for the next write if one is due"""
         try:
-            text = data.decode('utf-8', errors='replace')
-            # Remove or escape control characters except newline
-            printable = ''.join(c if c.isprintable() or c in '\n\r\t' else f'\\x{ord(c):02x}' for c in text)
-            for line in printable.split('\n'):
-                if line.strip():
-                    self.log_file.write(f"[{timestamp}] [{direction}] {line.rstrip()}\n")
-        except:
-            # Fall back to hex dump
-            hex_str = data.hex()
-            self.log_file.write(f"[{timestamp}] [{direction}] HEX: {hex_str}\n")
+            pos = self.log_file.tell()
+            if pos - self._indexed_pos < LOG_INDEX_INTERVAL:
+                return
+            if self.binary:
+                # Indexed offsets point at an anchor so readers can start there
+                self.log_file.write(self._encode(
+                    self._anchor_mono, REC_ANCHOR, struct.pack('<q', self._anchor_wall)))
+            self._index_file.write(_INDEX_ENTRY.pack(self._wall_time(ts), pos))
+            self._index_file.flush()
+            self._indexed_pos = pos
+        except (OSError, ValueError):
+            pass
 
-    def close(self):
+    def _write_batch(self, chunks):
+        if not chunks or not self.log_file:
+            return
+        try:
+            self.log_file.write((b'' if self.binary else '').join(chunks))
+            self.log_file.flush()
+            self.batches += 1
+        except (OSError, ValueError):
+            pass
+
+    def stats(self):
+        return {
+            'pending': len(self._queue),
+            'written': self.records_written,
+            'dropped': self.records_dropped,
+            'batches': self.batches,
+        }
+
+    def close(self, wait=True):
+        """Flush pending records and stop the writer thread.
+
+        With *wait* False the flush finishes on a background thread, for
+        callers on an event loop shared with other slots.
+        """
+        if self._closing:
+            return
+        self.log(f"Log stats: written={self.records_written} dropped={self.records_dropped} "
+                 f"batches={self.batches}")
+        self._queue.append((self._clock(), 'INFO', "=== Log closed ==="))
+        self._closing = True
+        self._wakeup.set()
+        if wait:
+            self._finish()
+        else:
+            threading.Thread(target=self._finish, name='log-close', daemon=True).start()
+
+    def _finish(self):
+        self._thread.join(timeout=5)
         if self.log_file:
-            self.log("=== Log closed ===")
             self.log_file.close()
+            self._index_file.close()
+            self.log_file = None
+        if self.janitor:
+            self.janitor.close()
+
+
+# esptool serial bootloader protocol (SLIP framed)
+SLIP_END = 0xC0
+ESPTOOL_SYNC = b'\xc0\x00\x08\x24\x00\x00\x00\x00\x00\x07\x07\x12\x20'
+ESPTOOL_COMMANDS = {
+    0x02: 'FLASH_BEGIN', 0x03: 'FLASH_DATA', 0x04: 'FLASH_END',
+    0x05: 'MEM_BEGIN', 0x06: 'MEM_END', 0x07: 'MEM_DATA',
+    0x08: 'SYNC', 0x09: 'WRITE_REG', 0x0a: 'READ_REG',
+    0x0b: 'SPI_SET_PARAMS', 0x0d: 'SPI_ATTACH', 0x0f: 'CHANGE_BAUDRATE',
+    0x10: 'FLASH_DEFL_BEGIN', 0x11: 'FLASH_DEFL_DATA', 0x12: 'FLASH_DEFL_END',
+    0x13: 'SPI_FLASH_MD5', 0x14: 'GET_SECURITY_INFO',
+    0xd0: 'ERASE_FLASH', 0xd1: 'ERASE_REGION', 0xd2: 'READ_FLASH', 0xd3: 'RUN_USER_CODE',
+}
+_ESPTOOL_DATA_OPS = (0x03, 0x07, 0x11)
+_ESPTOOL_BEGIN_OPS = (0x02, 0x05, 0x10)
+FLASH_LOG_MODES = ('summary', 'raw', 'off')
+
+
+class _SlipScanner:
+    """Tracks SLIP frame boundaries in one direction, keeping frame heads"""
+
+    HEAD = 32   # raw bytes kept from the start of each frame
+
+    def __init__(self):
+        self.started = False
+        self.head = bytearray()
+        self.frames = []
+
+    def feed(self, data):
+        """Scan *data*; returns the heads of frames completed in it"""
+        self.frames = []
+        pos = 0
+        n = len(data)
+        if not self.started:
+            pos = data.find(SLIP_END)
+            if pos == -1:
+                return self.frames
+            self.started = True
+            pos += 1
+        while pos < n:
+            end = data.find(SLIP_END, pos)
+            stop = n if end == -1 else end
+            room = self.HEAD - len(self.head)
+            if room > 0 and stop > pos:
+                self.head += data[pos:min(stop, pos + room)]
+            if end == -1:
+                break
+            if self.head:
+                self.frames.append(bytes(self.head)
+                                   .replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb'))
+                self.head.clear()
+            pos = end + 1
+        return self.frames
+
+
+class FlashSessionMonitor:
+    """Protocol-aware front end for SerialLogger traffic logging.
+
+    Watches client->device traffic for the esptool SYNC frame (normally
+    sent right after the DTR/RTS reset into the bootloader).  While such a
+    flash session lasts, SLIP traffic is counted instead of logged as
+    escaped text, and a summary (command opcodes, data blocks, flash
+    regions, bytes/s, duration) is logged when it ends: on client
+    disconnect, or when non-SLIP output arrives after a DTR/RTS reset,
+    i.e. the application booting.
+
+    mode 'raw' additionally keeps the payload (byte-exact with the binary
+    log format); 'off' disables detection.
+    """
+
+    def __init__(self, logger, mode='summary'):
+        if mode not in FLASH_LOG_MODES:
+            raise ValueError(f"unknown flash log mode: {mode}")
+        self.logger = logger
+        self.mode = mode
+        self.active = False
+        self.sessions = 0
+        self._tail = b''
+        self._resets = 0
+
+    def log(self, message, direction='INFO'):
+        self.logger.log(message, direction)
+
+    def log_event(self, code, value):
+        if code in (EV_DTR, EV_RTS):
+            self._resets += 1
+            self._reset_since_frame = True
+        self.logger.log_event(code, value)
+
+    def log_data(self, data, direction='RX'):
+        if self.mode == 'off':
+            self.logger.log_data(data, direction)
+            return
+        if not self.active:
+            if direction == 'TX' and self._sync_in(data):
+                self._start()
+            else:
+                self.logger.log_data(data, direction)
+                return
+        elif direction == 'RX' and self._reset_since_frame and SLIP_END not in data:
+            self.finish('app started')
+            self.logger.log_data(data, direction)
+            return
+
+        if self.mode == 'raw':
+            self.logger.log_data(data, direction)
+        self._count(data, direction)
+
+    def _sync_in(self, data):
+        if ESPTOOL_SYNC in data:
+            return True
+        # SYNC split across two chunks
+        n = len(ESPTOOL_SYNC) - 1
+        joined = self._tail + data[:n]
+        self._tail = data[-n:] if len(data) >= n else (self._tail + data)[-n:]
+        return ESPTOOL_SYNC in joined
+
+    def _start(self):
+        self.active = True
+        self.sessions += 1
+        self._started = time.monotonic()
+        self._last_frame = self._started
+        self._reset_since_frame = False
+        self._tail = b''
+        self._scanners = {'TX': _SlipScanner(), 'RX': _SlipScanner()}
+        self._bytes = {'TX': 0, 'RX': 0}
+        self._commands = {}
+        self._blocks = 0
+        self._regions = []
+        self.logger.log(f"esptool session started (bootloader sync after "
+                        f"{self._resets} DTR/RTS change(s)); logging summary only")
+
+    def _count(self, data, direction):
+        self._bytes[direction] += len(data)
+        frames = self._scanners[direction].feed(data)
+        if not frames:
+            return
+        self._last_frame = time.monotonic()
+        self._reset_since_frame = False
+        if direction != 'TX':
+            return
+        for frame in frames:
+            if len(frame) < 2 or frame[0] != 0x00:
+                continue
+            op = frame[1]
+            self._commands[op] = self._commands.get(op, 0) + 1
+            if op in _ESPTOOL_DATA_OPS:
+                self._blocks += 1
+            elif op in _ESPTOOL_BEGIN_OPS and len(frame) >= 24:
+                size, _, _, offset = struct.unpack_from('<IIII', frame, 8)
+                self._regions.append((op, offset, size))
+
+    def finish(self, reason):
+        """End the current session and log its summary"""
+        if not self.active:
+            return
+        self.active = False
+        self._resets = 0
+        duration = max(self._last_frame - self._started, 1e-3)
+        tx, rx = self._bytes['TX'], self._bytes['RX']
+        commands = ', '.join(f"{ESPTOOL_COMMANDS.get(op, hex(op))} x{count}"
+                             for op, count in sorted(self._commands.items()))
+        regions = ', '.join(
+            f"{'RAM' if op == 0x05 else 'flash'} 0x{offset:x} ({size // 1024} KB)"
+            for op, offset, size in self._regions)
+        self.logger.log(
+            f"esptool session ended ({reason}): {duration:.1f} s, TX {tx} bytes "
+            f"({tx / duration / 1024:.1f} KB/s), RX {rx} bytes, {self._blocks} data block(s)")
+        if commands:
+            self.logger.log(f"esptool commands: {commands}")
+        if regions:
+            self.logger.log(f"esptool writes: {regions}")
+
+
+class StatusNotifier:
+    """Reports proxy state changes to the supervising portal.
+
+    Each change is one line of JSON written to an inherited pipe
+    (--notify-fd), e.g. {"event": "listening", "ts": 512.3, "port": 4001},
+    with ts taken from the system-wide monotonic clock.  Events:
+    serial_opened, listening (ready for clients), client_connected and
+    client_disconnected (with the peer and its role, control or observer)
+    and fatal (with the error text).  A notifier bound
+    to a label (daemon mode) adds "label" to every message.  Writes never
+    block; without a pipe, or once the reader is gone, messages are dropped.
+    """
+
+    def __init__(self, fd=None, label=None):
+        self.fd = fd
+        self.label = label
+
+    def bind(self, label):
+        """Notifier on the same pipe that tags messages with *label*"""
+        return StatusNotifier(self.fd, label)
+
+    def notify(self, event, **fields):
+        if self.fd is None:
+            return
+        msg = {'event': event, 'ts': round(time.monotonic(), 4), **fields}
+        if self.label is not None:
+            msg['label'] = self.label
+        try:
+            # One write per message, below PIPE_BUF, so lines never interleave
+            os.write(self.fd, json.dumps(msg).encode() + b'\n')
+        except OSError:
+            pass
+
+
+def dispatch(selector, events, running=None):
+    """Run the callbacks for one select() batch.
+
+    Keys unregistered (or re-registered) by an earlier callback in the same
+    batch are skipped; the selector is level-triggered, so anything still
+    pending is reported again on the next select().
+    """
+    fd_map = selector.get_map()
+    for key, mask in events:
+        if fd_map.get(key.fd) is not key:
+            continue
+        key.data(mask)
+        if running is not None and not running():
+            break
+
+
+class Timers:
+    """Deadlines for an event loop driven by dispatch().
+
+    The loop passes timeout() to select() and calls run_due() after each
+    batch, so callbacks run on the loop thread like selector callbacks.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0       # orders entries with equal deadlines
+
+    def call_at(self, deadline, callback):
+        """Run *callback()* once time.monotonic() reaches *deadline*; returns a handle"""
+        self._seq += 1
+        entry = [deadline, self._seq, callback]
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def cancel(self, entry):
+        """Forget a pending callback; a no-op if it already ran"""
+        entry[2] = None
+
+    def timeout(self):
+        """Seconds until the next deadline, or None if there is none"""
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def run_due(self):
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            callback = heapq.heappop(self._heap)[2]
+            if callback is not None:
+                callback()
 
 
 class RFC2217Proxy:
     """RFC2217 proxy with logging"""
 
-    def __init__(self, device, port, baudrate=115200, log_dir='/var/log/serial'):
+    def __init__(self, device, port, baudrate=115200, log_dir='/var/log/serial', log_format='text',
+                 log_max_bytes=0, log_compress='none', log_retention_bytes=0, log_name=None,
+                 flash_log='summary', listen_socket=None, notifier=None,
+                 max_observers=MAX_OBSERVERS, scrollback_bytes=SCROLLBACK_BYTES,
+                 replay_port=None, replay_socket=None, raw_port=None, raw_socket=None):
         self.device = device
         self.port = port
+        # Pre-bound listening socket handed over by the portal (or systemd);
+        # start_server() binds its own when None
+        self.listen_socket = listen_socket
+        # Second port whose clients get the scrollback before live data;
+        # pre-bound like listen_socket, or bound by start_server() when only
+        # replay_port is given
+        self.replay_port = replay_port
+        self.replay_socket = replay_socket
+        # Third port sending serial output verbatim to read-only clients,
+        # without telnet/RFC2217; pre-bound or bound like the replay port
+        self.raw_port = raw_port
+        self.raw_socket = raw_socket
+        self.scrollback = ScrollbackBuffer(scrollback_bytes) if scrollback_bytes > 0 else None
         self.baudrate = baudrate
         self.serial = None
         self.server_socket = None
-        self.client_socket = None
+        self.client = None          # controlling ClientSession
+        self.observers = []         # read-only ClientSessions
+        self.max_observers = max_observers
+        self.selector = None
         self.running = False
+        self.tx_queue = WriteQueue(self._write_serial, TX_QUEUE_LIMIT)
+        # Timers of the loop driving this proxy; set by attach()
+        self.timers = None
+        # ESP_RESET sequence in progress: (session, name, steps, next step,
+        # start time), and the timer of its current sleep
+        self._reset = None
+        self._reset_timer = None
+        self._stopped = False
+        # Self-pipe so stop() can wake the selector; created by run(), a
+        # daemon-hosted proxy shares the daemon's loop and has none
+        self._wakeup_r = self._wakeup_w = None
+        # Called with the proxy when the serial device fails
+        self.on_failure = None
+        self.last_error = None
+        self.notifier = notifier or StatusNotifier()
 
         # Get device info for better log naming
         device_info = self._get_device_info(device)
-        self.logger = SerialLogger(log_dir, os.path.basename(device), device_info)
+        self.logger = SerialLogger(log_dir, os.path.basename(device), device_info,
+                                   log_format=log_format, max_bytes=log_max_bytes,
+                                   compress=log_compress, retention_bytes=log_retention_bytes,
+                                   log_name=log_name)
+        self.traffic = FlashSessionMonitor(self.logger, flash_log)
 
     def _get_device_info(self, device):
-        """Read device info from sysfs"""
-        info = {}
-        tty_name = os.path.basename(device)
-        sysfs_path = f"/sys/class/tty/{tty_name}/device"
-
-        if not os.path.exists(sysfs_path):
-            return info
-
-        try:
-            device_path = os.path.realpath(sysfs_path)
-            # Walk up to find USB device attributes
-            for _ in range(5):
-                device_path = os.path.dirname(device_path)
-                product_file = os.path.join(device_path, 'product')
-                if os.path.exists(product_file):
-                    break
-
-            for attr in ['product', 'serial', 'manufacturer']:
-                attr_file = os.path.join(device_path, attr)
-                if os.path.exists(attr_file):
-                    try:
-                        with open(attr_file) as f:
-                            info[attr] = f.read().strip()
-                    except:
-                        pass
-        except:
-            pass
-
-        return info
+        """Read USB device info (product, serial, ...) from sysfs"""
+        # The daemon outlives devices; a reused device number must not
+        # report the previous device's attributes
+        props = usb_sysfs.lookup(device, refresh=True)
+        if not props:
+            return {}
+        return {key: props[key] for key in usb_sysfs.USB_ATTRIBUTES if key in props}
 
     def open_serial(self):
         """Open serial port"""
         self.serial = serial.Serial(
             self.device,
             baudrate=self.baudrate,
-            timeout=0.1,
-            write_timeout=1
+            timeout=0,          # non-blocking reads, driven by the selector
+            write_timeout=0
         )
+        os.set_blocking(self.serial.fileno(), False)
         self.logger.log(f"Opened {self.device} at {self.baudrate} baud")
+        self.notifier.notify('serial_opened', device=self.device, baudrate=self.baudrate)
 
     def close_serial(self):
         """Close serial port"""
@@ -177,281 +1444,1020 @@ class RFC2217Proxy:
 
     def start_server(self):
         """Start TCP server"""
+        if self.listen_socket is not None:
+            # Already bound and listening; clients may be queued in its backlog
+            self.server_socket, self.listen_socket = self.listen_socket, None
+            self.server_socket.setblocking(False)
+            self.port = self.server_socket.getsockname()[1]
+            self.logger.log(f"Listening on port {self.port} (inherited socket)")
+            print(f"Serial proxy for {self.device} listening on port {self.port}")
+            self.notifier.notify('listening', port=self.port)
+            return
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind(('0.0.0.0', self.port))
-        self.server_socket.listen(1)
+        self.server_socket.listen(LISTEN_BACKLOG)
         self.server_socket.setblocking(False)
         self.logger.log(f"Listening on port {self.port}")
         print(f"Serial proxy for {self.device} listening on port {self.port}")
-
-    def handle_rfc2217(self, data):
-        """Handle RFC2217 commands from client"""
-        i = 0
-        output = bytearray()
-
-        while i < len(data):
-            if data[i] == IAC and i + 1 < len(data):
-                cmd = data[i + 1]
-
-                if cmd == IAC:
-                    # Escaped IAC, pass through
-                    output.append(IAC)
-                    i += 2
-                    continue
-
-                if cmd == SB and i + 2 < len(data):
-                    # Subnegotiation
-                    if data[i + 2] == COM_PORT_OPTION:
-                        # Find SE
-                        se_idx = data.find(bytes([IAC, SE]), i + 3)
-                        if se_idx != -1:
-                            subcmd = data[i + 3] if i + 3 < se_idx else 0
-                            subdata = data[i + 4:se_idx]
-                            self._handle_com_port_option(subcmd, subdata)
-                            i = se_idx + 2
-                            continue
-                    i += 2
-                    continue
-
-                if cmd in (DO, DONT, WILL, WONT):
-                    # Telnet option negotiation
-                    if i + 2 < len(data):
-                        opt = data[i + 2]
-                        if cmd == DO and opt == COM_PORT_OPTION:
-                            # Client wants us to do COM-PORT
-                            self._send_telnet(WILL, COM_PORT_OPTION)
-                        elif cmd == WILL and opt == COM_PORT_OPTION:
-                            # Client will do COM-PORT
-                            self._send_telnet(DO, COM_PORT_OPTION)
-                        i += 3
-                        continue
-
-                i += 2
-            else:
-                output.append(data[i])
-                i += 1
-
-        return bytes(output)
-
-    def _handle_com_port_option(self, subcmd, data):
+        self.notifier.notify('listening', port=self.port)
+
+    def start_replay_server(self):
+        """Listen on the replay port, if one is configured and scrollback is on"""
+        if self.scrollback is None:
+            if self.replay_socket is not None:
+                self.replay_socket.close()
+                self.replay_socket = None
+            return
+        if self.replay_socket is None:
+            if not self.replay_port:
+                return
+            self.replay_socket = self._bind_extra_port(self.replay_port, 'Replay')
+            if self.replay_socket is None:
+                return
+        self.replay_socket.setblocking(False)
+        self.replay_port = self.replay_socket.getsockname()[1]
+        self.logger.log(f"Replay port {self.replay_port} ({self.scrollback.size} bytes scrollback)")
+
+    def start_raw_server(self):
+        """Listen on the raw port, if one is configured"""
+        if self.raw_socket is None:
+            if not self.raw_port:
+                return
+            self.raw_socket = self._bind_extra_port(self.raw_port, 'Raw')
+            if self.raw_socket is None:
+                return
+        self.raw_socket.setblocking(False)
+        self.raw_port = self.raw_socket.getsockname()[1]
+        self.logger.log(f"Raw port {self.raw_port}")
+
+    def _bind_extra_port(self, port, name):
+        """Listening socket on *port*, or None (logged) if it cannot be bound"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(('0.0.0.0', port))
+            sock.listen(LISTEN_BACKLOG)
+        except OSError as e:
+            sock.close()
+            self.logger.log(f"{name} port {port} unavailable: {e}")
+            return None
+        return sock
+
+    def handle_rfc2217(self, session, data):
+        """Handle RFC2217 commands from *session*, return raw serial data"""
+        return session.parser.feed(data)
+
+    def _handle_negotiation(self, session, cmd, opt):
+        """Telnet option negotiation"""
+        if cmd == DO and opt == COM_PORT_OPTION:
+            # Client wants us to do COM-PORT
+            self._send_telnet(session, WILL, COM_PORT_OPTION)
+        elif cmd == WILL and opt == COM_PORT_OPTION:
+            # Client will do COM-PORT
+            self._send_telnet(session, DO, COM_PORT_OPTION)
+
+    def _handle_subnegotiation(self, session, opt, payload):
+        """Dispatch a complete IAC SB ... IAC SE block"""
+        if opt == COM_PORT_OPTION:
+            subcmd = payload[0] if payload else 0
+            self._handle_com_port_option(session, subcmd, bytes(payload[1:]))
+
+    def _handle_com_port_option(self, session, subcmd, data):
         """Handle COM-PORT-OPTION subnegotiation"""
         try:
             # Response command is subcmd + 100
             resp_cmd = subcmd + 100
 
+            if not session.controlling:
+                if subcmd == ESP_RESET:
+                    self._send_com_port_option(session, resp_cmd, b'error read-only client')
+                    return
+                # Read-only: acknowledge as requested, so pyserial-based
+                # monitors open (and their DTR/RTS never reset the board)
+                self._send_com_port_option(session, resp_cmd, data if data else bytes([0]))
+                return
+
+            if subcmd == ESP_RESET:
+                self._start_reset(session, data.decode('ascii', 'replace'))
+                return
+
             if subcmd == SET_BAUDRATE and len(data) >= 4:
                 baudrate = int.from_bytes(data[:4], 'big')
                 if baudrate > 0:
                     self.serial.baudrate = baudrate
-                    self.logger.log(f"Baudrate changed to {baudrate}")
+                    self.traffic.log_event(EV_BAUD, baudrate)
                 # Send acknowledgment with actual baudrate
-                self._send_com_port_option(resp_cmd, self.serial.baudrate.to_bytes(4, 'big'))
+                self._send_com_port_option(session, resp_cmd, self.serial.baudrate.to_bytes(4, 'big'))
 
             elif subcmd == SET_DATASIZE and len(data) >= 1:
                 datasize = data[0]
                 if datasize >= 5 and datasize <= 8:
                     self.serial.bytesize = datasize
-                    self.logger.log(f"Data size changed to {datasize}")
-                self._send_com_port_option(resp_cmd, bytes([self.serial.bytesize]))
+                    self.traffic.log_event(EV_DATASIZE, datasize)
+                self._send_com_port_option(session, resp_cmd, bytes([self.serial.bytesize]))
 
             elif subcmd == SET_PARITY and len(data) >= 1:
                 parity_map = {1: 'N', 2: 'O', 3: 'E', 4: 'M', 5: 'S'}
                 parity_rmap = {'N': 1, 'O': 2, 'E': 3, 'M': 4, 'S': 5}
                 parity = parity_map.get(data[0], 'N')
                 self.serial.parity = parity
-                self.logger.log(f"Parity changed to {parity}")
-                self._send_com_port_option(resp_cmd, bytes([parity_rmap.get(self.serial.parity, 1)]))
+                self.traffic.log_event(EV_PARITY, parity)
+                self._send_com_port_option(session, resp_cmd, bytes([parity_rmap.get(self.serial.parity, 1)]))
 
             elif subcmd == SET_STOPSIZE and len(data) >= 1:
                 stopbits_map = {1: 1, 2: 2, 3: 1.5}
                 stopbits_rmap = {1: 1, 1.5: 3, 2: 2}
                 stopbits = stopbits_map.get(data[0], 1)
                 self.serial.stopbits = stopbits
-                self.logger.log(f"Stop bits changed to {stopbits}")
-                self._send_com_port_option(resp_cmd, bytes([stopbits_rmap.get(int(self.serial.stopbits), 1)]))
+                self.traffic.log_event(EV_STOPSIZE, stopbits)
+                self._send_com_port_option(session, resp_cmd, bytes([stopbits_rmap.get(int(self.serial.stopbits), 1)]))
 
             elif subcmd == SET_CONTROL and len(data) >= 1:
                 control = data[0]
                 # DTR control: 8=ON, 9=OFF
                 if control == 8:
                     self.serial.dtr = True
-                    self.logger.log("DTR ON")
-                    self._send_com_port_option(resp_cmd, bytes([8]))
+                    self.traffic.log_event(EV_DTR, 'ON')
+                    self._send_com_port_option(session, resp_cmd, bytes([8]))
                 elif control == 9:
                     self.serial.dtr = False
-                    self.logger.log("DTR OFF")
-                    self._send_com_port_option(resp_cmd, bytes([9]))
+                    self.traffic.log_event(EV_DTR, 'OFF')
+                    self._send_com_port_option(session, resp_cmd, bytes([9]))
                 # RTS control: 11=ON, 12=OFF
                 elif control == 11:
                     self.serial.rts = True
-                    self.logger.log("RTS ON")
-                    self._send_com_port_option(resp_cmd, bytes([11]))
+                    self.traffic.log_event(EV_RTS, 'ON')
+                    self._send_com_port_option(session, resp_cmd, bytes([11]))
                 elif control == 12:
                     self.serial.rts = False
-                    self.logger.log("RTS OFF")
-                    self._send_com_port_option(resp_cmd, bytes([12]))
+                    self.traffic.log_event(EV_RTS, 'OFF')
+                    self._send_com_port_option(session, resp_cmd, bytes([12]))
                 else:
                     # Echo back for other control requests
-                    self._send_com_port_option(resp_cmd, bytes([control]))
+                    self._send_com_port_option(session, resp_cmd, bytes([control]))
 
             elif subcmd == SET_LINESTATE_MASK:
                 # Acknowledge linestate mask
-                self._send_com_port_option(resp_cmd, data if data else bytes([0]))
+                self._send_com_port_option(session, resp_cmd, data if data else bytes([0]))
 
             elif subcmd == SET_MODEMSTATE_MASK:
                 # Acknowledge modemstate mask
-                self._send_com_port_option(resp_cmd, data if data else bytes([0]))
+                self._send_com_port_option(session, resp_cmd, data if data else bytes([0]))
 
             else:
                 # Unknown command, try to acknowledge anyway
-                self._send_com_port_option(resp_cmd, data if data else bytes([0]))
+                self._send_com_port_option(session, resp_cmd, data if data else bytes([0]))
 
         except Exception as e:
             self.logger.log(f"Error handling COM-PORT option: {e}")
 
-    def _send_telnet(self, cmd, opt):
+    def _start_reset(self, session, name):
+        """Start reset sequence *name*; the reply follows when it is done.
+
+        Each sleep is a loop timer, so the loop keeps serving in between
+        and the boot output reaches the client as it arrives.  The lines
+        change and their events are logged on the loop thread, in order
+        with SET_CONTROL requests and the flash monitor.
+        """
+        steps = RESET_SEQUENCES.get(name)
+        if steps is None:
+            self._send_com_port_option(session, ESP_RESET + 100,
+                                       f"error unknown sequence {name!r}".encode())
+            return
+        if self._reset is not None:
+            self._send_com_port_option(session, ESP_RESET + 100, b'error reset in progress')
+            return
+        self._reset = (session, name, steps, 0, time.monotonic())
+        self._reset_step()
+
+    def _reset_step(self):
+        """Run the current sequence up to its next sleep, or to the end"""
+        self._reset_timer = None
+        session, name, steps, index, start = self._reset
+        error = None
+        try:
+            while index < len(steps):
+                op, value = steps[index]
+                index += 1
+                if op == 'sleep':
+                    self._reset = (session, name, steps, index, start)
+                    self._reset_timer = self.timers.call_at(time.monotonic() + value,
+                                                            self._reset_step)
+                    return
+                if op == 'dtr':
+                    self.serial.dtr = value
+                    self.traffic.log_event(EV_DTR, 'ON' if value else 'OFF')
+                else:
+                    self.serial.rts = value
+                    self.traffic.log_event(EV_RTS, 'ON' if value else 'OFF')
+        except (serial.SerialException, OSError, ValueError, TypeError) as e:
+            error = str(e)
+        self._reset = None
+        ms = (time.monotonic() - start) * 1000
+        if error:
+            self.logger.log(f"Reset sequence {name} failed: {error}")
+            reply = f"error {error}"
+        else:
+            self.logger.log(f"Reset sequence {name} ({ms:.1f} ms)")
+            reply = f"ok {name} {ms:.1f}"
+        if session is self.client:
+            self._send_com_port_option(session, ESP_RESET + 100, reply.encode())
+
+    def _send_telnet(self, session, cmd, opt):
         """Send telnet command to client"""
-        if self.client_socket:
+        self._send_to_client(session, bytes([IAC, cmd, opt]))
+
+    def _send_com_port_option(self, session, subcmd, data):
+        """Send COM-PORT-OPTION subnegotiation response"""
+        msg = bytes([IAC, SB, COM_PORT_OPTION, subcmd]) + data + bytes([IAC, SE])
+        self._send_to_client(session, msg)
+
+    def _send_to_client(self, session, data):
+        """Queue data for *session*; drains on writability"""
+        try:
+            dropped = session.rx_queue.push(data)
+        except OSError as e:
+            self._drop_client(session, f"Client send error: {e}")
+            return
+        if dropped and not session.overflow:
+            session.overflow = True
+            self.logger.log(f"Client {session.peer} too slow, dropping RX data "
+                            f"(queue full, {session.rx_queue.limit} bytes)")
+        self._update_client_events(session)
+
+    def _sessions(self):
+        if self.client:
+            return [self.client, *self.observers]
+        return list(self.observers)
+
+    def _write_serial(self, buffers):
+        return os.writev(self.serial.fileno(), buffers)
+
+    def _update_client_events(self, session):
+        """Read unless the serial TX queue is backed up, write while RX is queued"""
+        events = 0
+        if not session.controlling or len(self.tx_queue) <= self.tx_queue.limit - READ_CHUNK:
+            events |= selectors.EVENT_READ
+        if len(session.rx_queue):
+            events |= selectors.EVENT_WRITE
+        self._set_events(session.sock, events, functools.partial(self._on_client_event, session))
+
+    def _update_serial_events(self):
+        events = selectors.EVENT_READ
+        if len(self.tx_queue):
+            events |= selectors.EVENT_WRITE
+        self._set_events(self.serial.fileno(), events, self._on_serial_event)
+
+    def _set_events(self, fileobj, events, callback):
+        try:
+            key = self.selector.get_key(fileobj)
+        except KeyError:
+            if events:
+                self.selector.register(fileobj, events, callback)
+            return
+        if not events:
+            self.selector.unregister(fileobj)
+        elif key.events != events:
+            self.selector.modify(fileobj, events, callback)
+
+    def stats(self):
+        """Write queue counters for both directions, RX per connected client"""
+        return {'rx': self.client.rx_queue.stats() if self.client else None,
+                'tx': self.tx_queue.stats(),
+                'observers': {o.peer: o.rx_queue.stats() for o in self.observers}}
+
+    def run(self):
+        """Main loop.
+
+        Fully event-driven: the tty fd, the listening socket and the client
+        socket are registered with a selector (epoll on Linux) and the loop
+        blocks until one of them becomes ready or a timer is due.  Writes go
+        through per-direction WriteQueues that drain on writability, so a
+        slow peer never blocks the loop.
+        """
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        selector = selectors.DefaultSelector()
+        selector.register(self._wakeup_r, selectors.EVENT_READ, self._on_wakeup)
+        timers = Timers()
+        self.attach(selector, timers)
+
+        try:
+            while self.running:
+                try:
+                    events = selector.select(timers.timeout())
+                except InterruptedError:
+                    continue
+                dispatch(selector, events, lambda: self.running)
+                timers.run_due()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._shutdown()
+
+    def attach(self, selector, timers):
+        """Open the serial port and listening socket and register them on *selector*.
+
+        run() uses its own selector and Timers; ProxyDaemon attaches many
+        proxies to one shared pair and drives them from a single loop.
+        """
+        self.selector = selector
+        self.timers = timers
+        self.running = True
+        self.open_serial()
+        try:
+            self.start_server()
+        except OSError:
+            self.close_serial()
+            raise
+        selector.register(self.server_socket, selectors.EVENT_READ, self._on_accept)
+        self.start_replay_server()
+        if self.replay_socket is not None:
+            selector.register(self.replay_socket, selectors.EVENT_READ,
+                              functools.partial(self._on_accept, replay=True))
+        self.start_raw_server()
+        if self.raw_socket is not None:
+            selector.register(self.raw_socket, selectors.EVENT_READ,
+                              functools.partial(self._on_accept, raw=True))
+        self._update_serial_events()
+
+    def _on_wakeup(self, mask):
+        """Drain the self-pipe; stop() has already cleared self.running"""
+        try:
+            while os.read(self._wakeup_r, 512):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _on_accept(self, mask, replay=False, raw=False):
+        """New client connection: the controlling session if none, else an observer.
+
+        A client of the replay port is sent the scrollback before any live
+        data.  A client of the raw port gets a raw session, which never
+        takes control: a log reader must not demote a later esptool.
+        """
+        if raw:
+            server = self.raw_socket
+        else:
+            server = self.replay_socket if replay else self.server_socket
+        try:
+            conn, addr = server.accept()
+        except (BlockingIOError, OSError):
+            return
+
+        controlling = self.client is None and not raw
+        if not controlling and len(self.observers) >= self.max_observers:
+            self.logger.log(f"Refused {addr[0]}:{addr[1]}: {self.max_observers} observers connected")
+            conn.close()
+            return
+
+        conn.setblocking(False)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if controlling:
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_COUNT)
+        session = ClientSession(conn, addr, controlling,
+                                self._handle_negotiation, self._handle_subnegotiation, raw=raw)
+        if controlling:
+            self.client = session
+        else:
+            self.observers.append(session)
+        self._update_client_events(session)
+        self.logger.log(f"Client connected from {session.peer} ({session.role}"
+                        f"{', raw' if raw else ''})")
+        self.notifier.notify('client_connected', peer=session.peer, role=session.role, raw=raw)
+        if replay and len(self.scrollback):
+            backlog = self.scrollback.snapshot()
+            # Room for the whole backlog on top of the live-data limit
+            session.rx_queue.limit += len(backlog)
+            self.logger.log(f"Replaying {len(backlog)} bytes to {session.peer}")
+            self._send_to_client(session, backlog)
+
+    def _drop_client(self, session, reason):
+        """Unregister and close *session*"""
+        if session is self.client:
+            self.client = None
+        elif session in self.observers:
+            self.observers.remove(session)
+        else:
+            return
+        try:
+            self.selector.unregister(session.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            session.sock.close()
+        except OSError:
+            pass
+        session.rx_queue.clear()
+        if session.controlling:
+            self.traffic.finish('client disconnected')
+        self.logger.log(f"{reason} ({session.peer}, {session.role})")
+        self.notifier.notify('client_disconnected', peer=session.peer, role=session.role, reason=reason)
+        rx = session.rx_queue
+        self.logger.log(
+            f"Queue stats {session.peer}: RX written={rx.written} stalled={rx.stalled} "
+            f"dropped={rx.dropped} peak={rx.peak}"
+            + (f" ignored={session.ignored}" if session.ignored else "")
+        )
+
+    def _log_stats(self):
+        tx = self.tx_queue
+        self.logger.log(
+            f"Queue stats: TX written={tx.written} stalled={tx.stalled} "
+            f"dropped={tx.dropped} peak={tx.peak}"
+        )
+
+    def _on_client_event(self, session, mask):
+        if mask & selectors.EVENT_WRITE:
+            try:
+                session.rx_queue.flush()
+            except OSError as e:
+                self._drop_client(session, f"Client send error: {e}")
+                return
+            if not len(session.rx_queue):
+                session.overflow = False
+        if mask & selectors.EVENT_READ:
+            self._on_client_readable(session)
+        if session is self.client or session in self.observers:
+            self._update_client_events(session)
+
+    def _on_client_readable(self, session):
+        """Data from client"""
+        try:
+            data = session.sock.recv(READ_CHUNK)
+        except BlockingIOError:
+            return
+        except (ConnectionResetError, BrokenPipeError):
+            self._drop_client(session, "Client connection reset")
+            return
+        except OSError as e:
+            self._drop_client(session, f"Client error: {e}")
+            return
+
+        if not data:
+            self._drop_client(session, "Client disconnected")
+            return
+
+        # Process RFC2217 commands, get raw data; raw sessions skip the parser
+        raw_data = data if session.raw else self.handle_rfc2217(session, data)
+        if not raw_data:
+            return
+        if not session.controlling:
+            # Read-only: observers never write to the device
+            session.ignored += len(raw_data)
+            return
+        self.traffic.log_data(raw_data, 'TX')
+        try:
+            self.tx_queue.push(raw_data)
+        except OSError as e:
+            self._serial_failed(e)
+            return
+        self._update_serial_events()
+
+    def _on_serial_event(self, mask):
+        if mask & selectors.EVENT_WRITE:
+            try:
+                self.tx_queue.flush()
+            except OSError as e:
+                self._serial_failed(e)
+                return
+            self._update_serial_events()
+            # Resume client reads once the TX backlog has drained
+            if self.client:
+                self._update_client_events(self.client)
+        if mask & selectors.EVENT_READ:
+            self._on_serial_readable()
+
+    def _on_serial_readable(self):
+        """Data from serial"""
+        try:
+            data = self.serial.read(READ_CHUNK)
+        except (serial.SerialException, OSError) as e:
+            # Readable but no data means the device went away (unplug)
+            self._serial_failed(e)
+            return
+
+        if not data:
+            return
+        self.traffic.log_data(data, 'RX')
+        if self.scrollback is not None:
+            self.scrollback.write(data)
+        # Every session queues the same bytes object; nothing is copied per client
+        for session in self._sessions():
+            self._send_to_client(session, data)
+
+    def _serial_failed(self, error):
+        self.logger.log(f"Serial device error: {error}")
+        self.last_error = f"Serial device error: {error}"
+        self.running = False
+        self.notifier.notify('fatal', error=self.last_error)
+        if self.on_failure:
+            self.on_failure(self)
+
+    def stop(self):
+        """Request shutdown; safe to call from signal handlers and other threads"""
+        self.running = False
+        if self._wakeup_w is not None:
             try:
-                self.client_socket.send(bytes([IAC, cmd, opt]))
+                os.write(self._wakeup_w, b'\0')
+            except OSError:
+                pass
+
+    def _shutdown(self):
+        """Release sockets, selector and serial port (idempotent)"""
+        self.detach()
+
+        if self.selector:
+            try:
+                self.selector.close()
             except:
                 pass
 
-    def _send_com_port_option(self, subcmd, data):
-        """Send COM-PORT-OPTION subnegotiation response"""
-        if self.client_socket:
+        for fd in (self._wakeup_r, self._wakeup_w):
+            if fd is None:
+                continue
             try:
-                msg = bytes([IAC, SB, COM_PORT_OPTION, subcmd]) + data + bytes([IAC, SE])
-                self.client_socket.send(msg)
+                os.close(fd)
+            except OSError:
+                pass
+        self._wakeup_r = self._wakeup_w = None
+
+    def detach(self, wait=True):
+        """Unregister from the selector and release sockets, serial port and log (idempotent).
+
+        With *wait* False the log is flushed and closed in the background
+        (see SerialLogger.close), so a shared loop is not held up.
+        """
+        self.running = False
+        if self._stopped:
+            return
+        self._stopped = True
+        self.logger.log("Shutting down")
+        self._log_stats()
+
+        sessions = self._sessions()
+        self.client = None
+        self.observers = []
+        for sock in (*(c.sock for c in sessions), self.server_socket, self.listen_socket,
+                     self.replay_socket, self.raw_socket):
+            if sock is None:
+                continue
+            try:
+                self.selector.unregister(sock)
+            except (KeyError, ValueError, AttributeError):
+                pass
+            try:
+                sock.close()
             except:
                 pass
+        self.server_socket = None
+        self.listen_socket = None
+        self.replay_socket = None
+        self.raw_socket = None
+
+        if self._reset_timer is not None:
+            # Abandon a sequence in progress; nobody is left to reply to
+            self.timers.cancel(self._reset_timer)
+            self._reset_timer = None
+        self._reset = None
+
+        if self.serial and self.serial.is_open:
+            try:
+                self.selector.unregister(self.serial.fileno())
+            except (KeyError, ValueError, AttributeError):
+                pass
+        self.close_serial()
+        self.traffic.finish('shutdown')
+        self.logger.close(wait=wait)
+
+
+SD_LISTEN_FDS_START = 3
+
+# Slot options in portal requests (daemon "add", pool assignment) ->
+# RFC2217Proxy keyword arguments
+SLOT_OPTIONS = {
+    'baudrate': 'baudrate',
+    'log_format': 'log_format',
+    'log_max_bytes': 'log_max_bytes',
+    'log_compress': 'log_compress',
+    'log_retention_bytes': 'log_retention_bytes',
+    'log_flash': 'flash_log',
+    'scrollback_bytes': 'scrollback_bytes',
+    'replay_port': 'replay_port',
+    'raw_port': 'raw_port',
+}
+
+
+def inherited_listen_socket(fd=None):
+    """Listening socket passed in by the parent, or None.
+
+    *fd* comes from --listen-fd (the portal); otherwise systemd-style socket
+    activation is honoured: LISTEN_FDS >= 1 and, when set, LISTEN_PID equal
+    to our pid mean the socket is fd 3.
+    """
+    if fd is None:
+        listen_pid = os.environ.get('LISTEN_PID')
+        if int(os.environ.get('LISTEN_FDS', '0') or 0) < 1:
+            return None
+        if listen_pid and int(listen_pid) != os.getpid():
+            return None
+        fd = SD_LISTEN_FDS_START
+        for name in ('LISTEN_PID', 'LISTEN_FDS', 'LISTEN_FDNAMES'):
+            os.environ.pop(name, None)
+    return socket.socket(fileno=fd)
+
+
+def await_assignment(fd, log_dir, notifier):
+    """Pool worker (--standby): block until the portal assigns a slot.
+
+    *fd* is the worker's end of a socketpair.  Once imports are done,
+    "standby" is reported on it; the portal then sends one JSON line with
+    label, device, port and slot options, the pre-bound listening socket
+    attached as SCM_RIGHTS (followed by the replay port's socket when the
+    request has "replay_fd": true, then the raw port's with "raw_fd": true).
+    Returns the proxy for that slot, which keeps reporting on the same
+    socket, or None if the portal closed it first.
+    """
+    notifier.notify('standby')
+    channel = socket.socket(fileno=os.dup(fd))
+    buf = b''
+    fds = []
+    try:
+        while b'\n' not in buf:
+            data, received, _, _ = socket.recv_fds(channel, READ_CHUNK, 3)
+            fds.extend(received)
+            if not data:
+                return None
+            buf += data
+    finally:
+        channel.close()
+    request = json.loads(buf.split(b'\n', 1)[0])
+    kwargs = {SLOT_OPTIONS[k]: v for k, v in request.items() if k in SLOT_OPTIONS}
+    sockets = deque(socket.socket(fileno=fd) for fd in fds)
+    listen_socket = sockets.popleft() if sockets else None
+    replay_socket = sockets.popleft() if request.get('replay_fd') and sockets else None
+    raw_socket = sockets.popleft() if request.get('raw_fd') and sockets else None
+    return RFC2217Proxy(request['device'], int(request['port']), log_dir=log_dir,
+                        log_name=request.get('label'), listen_socket=listen_socket,
+                        replay_socket=replay_socket, raw_socket=raw_socket,
+                        notifier=notifier, **kwargs)
+
+
+def process_usage(pid='self'):
+    """Resident memory (KB) and consumed CPU time (s) of a process, from /proc"""
+    rss_kb = 0
+    cpu_s = 0.0
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_kb = int(line.split()[1])
+                    break
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu_s = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        pass
+    return {'rss_kb': rss_kb, 'cpu_s': round(cpu_s, 2)}
+
+
+def _close_sockets(*sockets):
+    for sock in sockets:
+        if sock is not None:
+            sock.close()
+
+
+class ProxyDaemon:
+    """Serves any number of slots from one process and one event loop.
+
+    Every slot is an RFC2217Proxy attached to a shared selector.  Slots are
+    added and removed at runtime over a Unix control socket speaking
+    newline-delimited JSON, one reply line per request:
+
+        {"cmd": "add", "label": "SLOT1", "device": "/dev/ttyACM0", "port": 4001, ...}
+        {"cmd": "remove", "label": "SLOT1"}
+        {"cmd": "status"}
+
+    "add" also takes baudrate, the portal's per-slot log settings
+    (log_format, log_max_bytes, log_compress, log_retention_bytes,
+    log_flash), scrollback_bytes, replay_port and raw_port; adding an
+    existing label replaces it.  With "listen_fd": true the slot uses a
+    pre-bound listening socket sent with the request as SCM_RIGHTS ancillary
+    data instead of binding its own; "replay_fd": true sends the replay
+    port's socket next and "raw_fd": true the raw port's after that.
+
+    A slot whose serial device fails is removed and its error reported by
+    "status" until the label is added again.  Per-slot state changes go to
+    the daemon's StatusNotifier tagged with the slot label.
+    """
+
+    def __init__(self, control_path, log_dir='/var/log/serial', notifier=None):
+        self.control_path = control_path
+        self.log_dir = log_dir
+        self.notifier = notifier or StatusNotifier()
+        self.proxies = {}
+        self.failed = {}
+        self.selector = None
+        self.timers = Timers()
+        self.control_socket = None
+        self._buffers = {}
+        self._fds = {}
+        self.running = False
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
 
     def run(self):
-        """Main loop"""
-        self.running = True
-        self.open_serial()
-        self.start_server()
+        """Listen on the control socket and drive every slot until stop()"""
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, self._on_wakeup)
 
+        os.makedirs(os.path.dirname(self.control_path) or '.', exist_ok=True)
         try:
-            while self.running:
-                # Build list of sockets to monitor
-                read_list = [self.server_socket]
-                if self.serial and self.serial.is_open:
-                    read_list.append(self.serial)
-                if self.client_socket:
-                    read_list.append(self.client_socket)
+            os.unlink(self.control_path)
+        except FileNotFoundError:
+            pass
+        self.control_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.control_socket.bind(self.control_path)
+        os.chmod(self.control_path, 0o660)
+        self.control_socket.listen(8)
+        self.control_socket.setblocking(False)
+        self.selector.register(self.control_socket, selectors.EVENT_READ, self._on_control_accept)
+        print(f"Proxy daemon listening on {self.control_path}", flush=True)
+        self.notifier.notify('listening', control=self.control_path)
 
+        self.running = True
+        try:
+            while self.running:
                 try:
-                    readable, _, _ = select.select(read_list, [], [], 0.1)
-                except (ValueError, OSError):
+                    events = self.selector.select(self.timers.timeout())
+                except InterruptedError:
                     continue
-
-                for sock in readable:
-                    if sock == self.server_socket:
-                        # New client connection
-                        try:
-                            if self.client_socket:
-                                self.client_socket.close()
-                                self.logger.log("Previous client disconnected (new connection)")
-
-                            self.client_socket, addr = self.server_socket.accept()
-                            self.client_socket.setblocking(False)
-                            self.logger.log(f"Client connected from {addr[0]}:{addr[1]}")
-                        except:
-                            pass
-
-                    elif sock == self.client_socket:
-                        # Data from client
-                        try:
-                            data = self.client_socket.recv(4096)
-                            if data:
-                                # Process RFC2217 commands, get raw data
-                                raw_data = self.handle_rfc2217(data)
-                                if raw_data:
-                                    self.serial.write(raw_data)
-                                    self.logger.log_data(raw_data, 'TX')
-                            else:
-                                # Client disconnected
-                                self.logger.log("Client disconnected")
-                                self.client_socket.close()
-                                self.client_socket = None
-                        except (ConnectionResetError, BrokenPipeError):
-                            self.logger.log("Client connection reset")
-                            self.client_socket.close()
-                            self.client_socket = None
-                        except BlockingIOError:
-                            pass
-
-                    elif sock == self.serial:
-                        # Data from serial
-                        try:
-                            data = self.serial.read(self.serial.in_waiting or 1)
-                            if data:
-                                self.logger.log_data(data, 'RX')
-                                if self.client_socket:
-                                    try:
-                                        self.client_socket.send(data)
-                                    except:
-                                        pass
-                        except:
-                            pass
-
-                # Also check for serial data even if not in select
-                if self.serial and self.serial.is_open and self.serial not in readable:
-                    try:
-                        if self.serial.in_waiting:
-                            data = self.serial.read(self.serial.in_waiting)
-                            if data:
-                                self.logger.log_data(data, 'RX')
-                                if self.client_socket:
-                                    try:
-                                        self.client_socket.send(data)
-                                    except:
-                                        pass
-                    except:
-                        pass
-
+                dispatch(self.selector, events, lambda: self.running)
+                self.timers.run_due()
         except KeyboardInterrupt:
             pass
         finally:
-            self.stop()
+            self._shutdown()
 
     def stop(self):
-        """Stop the proxy"""
+        """Request shutdown; safe to call from signal handlers and other threads"""
         self.running = False
-        self.logger.log("Shutting down")
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except OSError:
+            pass
 
-        if self.client_socket:
-            try:
-                self.client_socket.close()
-            except:
+    def _on_wakeup(self, mask):
+        try:
+            while os.read(self._wakeup_r, 512):
                 pass
+        except (BlockingIOError, OSError):
+            pass
 
-        if self.server_socket:
+    def _shutdown(self):
+        for label in list(self.proxies):
+            # The process exits next: flush every log before it does
+            self.remove_slot(label, wait=True)
+        for conn in list(self._buffers):
+            self._close_control(conn)
+        if self.control_socket:
+            self.control_socket.close()
             try:
-                self.server_socket.close()
-            except:
+                os.unlink(self.control_path)
+            except OSError:
                 pass
+        self.selector.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    # -- slots --
+
+    def add_slot(self, label, device, port, listen_socket=None, replay_socket=None,
+                 raw_socket=None, **options):
+        """Attach a proxy for *device* on TCP *port*; replaces an existing *label*"""
+        if label in self.proxies:
+            self.remove_slot(label)
+        self.failed.pop(label, None)
+        try:
+            kwargs = {SLOT_OPTIONS[k]: v for k, v in options.items() if k in SLOT_OPTIONS}
+            proxy = RFC2217Proxy(device, int(port), log_dir=self.log_dir, log_name=label,
+                                 listen_socket=listen_socket, replay_socket=replay_socket,
+                                 raw_socket=raw_socket, notifier=self.notifier.bind(label), **kwargs)
+        except Exception:
+            # No proxy owns the passed sockets yet; left open they would
+            # keep their ports bound and the portal's retry would fail
+            _close_sockets(listen_socket, replay_socket, raw_socket)
+            raise
+        proxy.on_failure = self._proxy_failed
+        try:
+            proxy.attach(self.selector, self.timers)
+        except Exception:
+            proxy.detach()
+            raise
+        self.proxies[label] = proxy
+        print(f"Slot {label}: {device} on port {port}", flush=True)
+
+    def remove_slot(self, label, wait=False):
+        """Detach and close the proxy for *label*; returns False if unknown.
+
+        The slot's log is closed in the background unless *wait* is set,
+        so the other slots keep forwarding meanwhile.
+        """
+        proxy = self.proxies.pop(label, None)
+        if proxy is None:
+            return False
+        proxy.detach(wait=wait)
+        print(f"Slot {label}: removed", flush=True)
+        return True
+
+    def _proxy_failed(self, proxy):
+        for label, candidate in list(self.proxies.items()):
+            if candidate is proxy:
+                self.failed[label] = proxy.last_error
+                self.remove_slot(label)
+
+    def status(self):
+        """Process resource usage plus per-slot state and queue counters"""
+        slots = {}
+        for label, proxy in self.proxies.items():
+            slots[label] = {'device': proxy.device, 'port': proxy.port,
+                            'replay_port': proxy.replay_port if proxy.replay_socket else None,
+                            'raw_port': proxy.raw_port if proxy.raw_socket else None,
+                            'client': proxy.client.peer if proxy.client else None,
+                            'observers': [o.peer for o in proxy.observers],
+                            'queues': proxy.stats()}
+        return {'pid': os.getpid(), 'usage': process_usage(),
+                'slots': slots, 'failed': dict(self.failed)}
+
+    # -- control channel --
+
+    def _on_control_accept(self, mask):
+        try:
+            conn, _ = self.control_socket.accept()
+        except (BlockingIOError, OSError):
+            return
+        conn.setblocking(False)
+        self._buffers[conn] = b''
+        self._fds[conn] = deque()
+        self.selector.register(conn, selectors.EVENT_READ,
+                               lambda mask, c=conn: self._on_control_readable(c))
+
+    def _close_control(self, conn):
+        self._buffers.pop(conn, None)
+        for fd in self._fds.pop(conn, ()):
+            os.close(fd)
+        try:
+            self.selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
 
-        self.close_serial()
-        self.logger.close()
+    def _on_control_readable(self, conn):
+        try:
+            data, fds, _, _ = socket.recv_fds(conn, READ_CHUNK, 8)
+        except BlockingIOError:
+            return
+        except OSError:
+            data, fds = b'', []
+        self._fds[conn].extend(fds)
+        if not data:
+            self._close_control(conn)
+            return
+        lines = (self._buffers[conn] + data).split(b'\n')
+        self._buffers[conn] = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            reply = json.dumps(self._command(line, self._fds[conn])).encode() + b'\n'
+            try:
+                conn.sendall(reply)
+            except OSError:
+                self._close_control(conn)
+                return
+
+    def _command(self, line, fds):
+        """Execute one control request and return the reply object"""
+        try:
+            request = json.loads(line)
+            cmd = request.pop('cmd')
+            if cmd == 'add':
+                sockets = {}
+                try:
+                    for flag, name in (('listen_fd', 'listen_socket'), ('replay_fd', 'replay_socket'),
+                                       ('raw_fd', 'raw_socket')):
+                        if request.pop(flag, False):
+                            if not fds:
+                                raise ValueError(f'{flag} requested but no descriptor received')
+                            sockets[name] = socket.socket(fileno=fds.popleft())
+                    self.add_slot(**request, **sockets)
+                except Exception:
+                    # e.g. a missing descriptor or argument; detach() may
+                    # have closed them already, which makes this a no-op
+                    _close_sockets(*sockets.values())
+                    raise
+                return {'ok': True, 'pid': os.getpid()}
+            if cmd == 'remove':
+                return {'ok': self.remove_slot(request['label'])}
+            if cmd == 'status':
+                return dict(self.status(), ok=True)
+            return {'ok': False, 'error': f"unknown command {cmd!r}"}
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
 
 
 def main():
     parser = argparse.ArgumentParser(description='Serial proxy with logging')
-    parser.add_argument('device', help='Serial device (e.g., /dev/ttyUSB0)')
+    parser.add_argument('device', nargs='?', help='Serial device (e.g., /dev/ttyUSB0)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Serve many slots from one process; slots are added and '
+                             'removed over the --control socket')
+    parser.add_argument('--notify-fd', type=int,
+                        help='Inherited pipe to report state changes on (JSON lines)')
+    parser.add_argument('--standby', type=int, metavar='FD',
+                        help='Warm pool worker: wait on this socket for a slot assignment '
+                             'from the portal, then report state changes on it')
+    parser.add_argument('--control', default=DAEMON_CONTROL_PATH,
+                        help=f'Daemon control socket (default: {DAEMON_CONTROL_PATH})')
     parser.add_argument('-p', '--port', type=int, default=4001, help='TCP port (default: 4001)')
+    parser.add_argument('--listen-fd', type=int,
+                        help='Use this already-bound listening socket instead of binding '
+                             '--port (systemd LISTEN_FDS is honoured as well)')
     parser.add_argument('-b', '--baudrate', type=int, default=115200, help='Baud rate (default: 115200)')
     parser.add_argument('-l', '--log-dir', default='/var/log/serial', help='Log directory')
+    parser.add_argument('--log-flash', choices=FLASH_LOG_MODES, default='summary',
+                        help='esptool flash sessions: log a summary (default), summary '
+                             'plus raw traffic, or off (log as ordinary traffic)')
+    parser.add_argument('--log-name',
+                        help='Base name for log files (default: derived from USB product/serial)')
+    parser.add_argument('--log-format', choices=SerialLogger.LOG_FORMATS, default='text',
+                        help='Traffic log format (default: text)')
+    parser.add_argument('--log-max-bytes', type=int, default=0,
+                        help='Rotate the log file once it reaches this size (default: daily only)')
+    parser.add_argument('--log-compress', choices=COMPRESS_METHODS, default='none',
+                        help='Compress closed log segments in the background (default: none)')
+    parser.add_argument('--log-retention-bytes', type=int, default=0,
+                        help='Total size budget for the log directory, oldest segments '
+                             'deleted first (default: unlimited)')
+    parser.add_argument('--scrollback-bytes', type=int, default=SCROLLBACK_BYTES,
+                        help='Recent serial output kept for the replay port, 0 disables '
+                             f'(default: {SCROLLBACK_BYTES})')
+    parser.add_argument('--replay-port', type=int,
+                        help='TCP port whose clients first receive the scrollback')
+    parser.add_argument('--replay-listen-fd', type=int,
+                        help='Already-bound listening socket for the replay port')
+    parser.add_argument('--raw-port', type=int,
+                        help='TCP port sending serial output verbatim to read-only clients, '
+                             'without telnet/RFC2217')
+    parser.add_argument('--raw-listen-fd', type=int,
+                        help='Already-bound listening socket for the raw port')
+    parser.add_argument('--max-observers', type=int, default=MAX_OBSERVERS,
+                        help='Read-only clients allowed besides the controlling one '
+                             f'(default: {MAX_OBSERVERS})')
     args = parser.parse_args()
 
-    proxy = RFC2217Proxy(
-        device=args.device,
-        port=args.port,
-        baudrate=args.baudrate,
-        log_dir=args.log_dir
-    )
+    notify_fd = args.standby if args.standby is not None else args.notify_fd
+    notifier = StatusNotifier(notify_fd)
+
+    if args.standby is not None:
+        proxy = await_assignment(args.standby, args.log_dir, notifier)
+        if proxy is None:
+            return
+    elif args.daemon:
+        proxy = ProxyDaemon(args.control, log_dir=args.log_dir, notifier=notifier)
+    elif not args.device:
+        parser.error('a serial device is required unless --daemon is given')
+    else:
+        proxy = RFC2217Proxy(
+            device=args.device,
+            port=args.port,
+            baudrate=args.baudrate,
+            log_dir=args.log_dir,
+            log_format=args.log_format,
+            log_max_bytes=args.log_max_bytes,
+            log_compress=args.log_compress,
+            log_retention_bytes=args.log_retention_bytes,
+            log_name=args.log_name,
+            flash_log=args.log_flash,
+            listen_socket=inherited_listen_socket(args.listen_fd),
+            notifier=notifier,
+            max_observers=args.max_observers,
+            scrollback_bytes=args.scrollback_bytes,
+            replay_port=args.replay_port,
+            replay_socket=(socket.socket(fileno=args.replay_listen_fd)
+                           if args.replay_listen_fd is not None else None),
+            raw_port=args.raw_port,
+            raw_socket=(socket.socket(fileno=args.raw_listen_fd)
+                        if args.raw_listen_fd is not None else None)
+        )
+    if notify_fd is not None:
+        os.set_blocking(notify_fd, False)
 
     def signal_handler(sig, frame):
         print("\nShutting down...")
@@ -461,7 +2467,11 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    proxy.run()
+    try:
+        proxy.run()
+    except Exception as e:
+        notifier.notify('fatal', error=str(e))
+        raise
 
 
 if __name__ == '__main__':
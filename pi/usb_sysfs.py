@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+usb_sysfs - slot_key and USB attributes of serial ttys, read from sysfs
+
+Computes the same ID_PATH that udev's path_id builtin assigns (the slot_key)
+plus the USB device's product, serial, manufacturer and VID/PID, without
+running udevadm.  Shared by the portal, serial_proxy.py and
+rfc2217-learn-slots; installed alongside them.
+
+Results are cached per device number (major:minor).  A device number is
+reused when another device is plugged in, so every add/remove event the
+portal handles drops the cached entry (Resolver.invalidate), and a lookup
+for a just-added device passes refresh=True.
+
+Usage:
+    usb_sysfs.py [--sysfs ROOT] [tty ...]   # what the tools see (JSON)
+    usb_sysfs.py --check [tty ...]          # compare with udev's database
+    usb_sysfs.py --record DIR [tty ...]     # copy the ttys' sysfs entries
+
+A tree saved with --record on real hardware can be inspected anywhere
+later with --sysfs DIR.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import shutil
+import threading
+
+SYSFS_ROOT = "/sys"
+UDEV_DATA_DIR = "/run/udev/data"
+TTY_PATTERNS = ("ttyACM*", "ttyUSB*")
+USB_ATTRIBUTES = {
+    "product": "product",
+    "serial": "serial",
+    "manufacturer": "manufacturer",
+    "vid": "idVendor",
+    "pid": "idProduct",
+}
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _subsystem(path):
+    link = os.path.join(path, "subsystem")
+    if not os.path.islink(link):
+        return None
+    return os.path.basename(os.readlink(link))
+
+
+def _skip_subsystem(path, subsystem, top):
+    """Topmost ancestor of *path* (inclusive) in an unbroken *subsystem* chain"""
+    while True:
+        parent = os.path.dirname(path)
+        if parent == top or _subsystem(parent) != subsystem:
+            return path
+        path = parent
+
+
+def path_id(device_dir, sysfs_root=SYSFS_ROOT):
+    """udev ID_PATH of the sysfs device at *device_dir*, or "" if none.
+
+    Follows path_id's rules for the buses a USB serial adapter can sit
+    behind (usb, pci, platform, acpi); other ancestors are skipped.
+    """
+    top = os.path.join(sysfs_root, "devices")
+    parts = []
+    supported = False
+    path = device_dir
+    while path.startswith(top + "/"):
+        subsystem = _subsystem(path)
+        name = os.path.basename(path)
+        if subsystem == "usb":
+            port = name.partition("-")[2]
+            if port:
+                parts.append(f"usb-0:{port}")
+                supported = True
+            path = _skip_subsystem(path, "usb", top)
+        elif subsystem in ("pci", "platform", "acpi"):
+            parts.append(f"{subsystem}-{name}")
+            supported = True
+            path = _skip_subsystem(path, subsystem, top)
+        path = os.path.dirname(path)
+    if not supported:
+        return ""
+    return "-".join(reversed(parts))
+
+
+def usb_attributes(device_dir, sysfs_root=SYSFS_ROOT):
+    """Attributes of the USB device (not interface) above *device_dir*"""
+    top = os.path.join(sysfs_root, "devices")
+    path = device_dir
+    while path.startswith(top + "/"):
+        if _subsystem(path) == "usb" and os.path.exists(os.path.join(path, "idVendor")):
+            info = {}
+            for key, attr in USB_ATTRIBUTES.items():
+                value = _read(os.path.join(path, attr))
+                if value is not None:
+                    info[key] = value
+            return info
+        path = os.path.dirname(path)
+    return {}
+
+
+class Resolver:
+    """Cached tty name -> slot_key / USB attribute lookups against one sysfs tree"""
+
+    def __init__(self, sysfs_root=SYSFS_ROOT):
+        self.sysfs_root = os.path.realpath(sysfs_root)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, devnode, refresh=False):
+        """Properties of tty *devnode* (/dev/ttyACM0 or ttyACM0), or None.
+
+        Keys: devnum, devpath (as udev's DEVPATH), id_path, slot_key
+        (id_path, else devpath) and whichever of product, serial,
+        manufacturer, vid, pid the USB device reports.  *refresh* ignores
+        a cached entry for the device number.
+        """
+        # Resolve /dev/serial/by-* style links to the kernel name
+        name = os.path.basename(os.path.realpath(devnode) if os.path.isabs(devnode) else devnode)
+        class_dir = os.path.join(self.sysfs_root, "class", "tty", name)
+        devnum = _read(os.path.join(class_dir, "dev"))
+        if not devnum:
+            return None
+        if not refresh:
+            with self._lock:
+                props = self._cache.get(devnum)
+            if props is not None:
+                return props
+
+        device_dir = os.path.realpath(class_dir)
+        devpath = device_dir[len(self.sysfs_root):]
+        id_path = path_id(device_dir, self.sysfs_root)
+        props = {
+            "devnum": devnum,
+            "devpath": devpath,
+            "id_path": id_path,
+            "slot_key": id_path or devpath,
+        }
+        props.update(usb_attributes(device_dir, self.sysfs_root))
+        with self._lock:
+            self._cache[devnum] = props
+        return props
+
+    def invalidate(self, devnum=None, devpath=None):
+        """Forget *devnum* ("major:minor") or the entry for *devpath*, or
+        everything when neither is given"""
+        with self._lock:
+            if devnum is not None:
+                self._cache.pop(devnum, None)
+            elif devpath is not None:
+                for key in [k for k, p in self._cache.items() if p["devpath"] == devpath]:
+                    del self._cache[key]
+            else:
+                self._cache.clear()
+
+
+resolver = Resolver()
+
+
+def lookup(devnode, refresh=False):
+    """Resolver.lookup() against the live /sys"""
+    return resolver.lookup(devnode, refresh)
+
+
+def record(devnode, dest, sysfs_root=SYSFS_ROOT):
+    """Copy the sysfs entries lookup() reads for *devnode* below *dest*"""
+    sysfs_root = os.path.realpath(sysfs_root)
+    top = os.path.join(sysfs_root, "devices")
+    name = os.path.basename(devnode)
+    device_dir = os.path.realpath(os.path.join(sysfs_root, "class", "tty", name))
+
+    path = device_dir
+    while path.startswith(top + "/"):
+        target = os.path.join(dest, os.path.relpath(path, sysfs_root))
+        os.makedirs(target, exist_ok=True)
+        for attr in ("dev", *USB_ATTRIBUTES.values()):
+            if os.path.isfile(os.path.join(path, attr)):
+                shutil.copyfile(os.path.join(path, attr), os.path.join(target, attr))
+        subsystem = _subsystem(path)
+        link = os.path.join(target, "subsystem")
+        if subsystem and not os.path.islink(link):
+            subsystem_dir = os.path.join(dest, "bus", subsystem)
+            os.makedirs(subsystem_dir, exist_ok=True)
+            os.symlink(os.path.relpath(subsystem_dir, target), link)
+        path = os.path.dirname(path)
+
+    class_dir = os.path.join(dest, "class", "tty")
+    os.makedirs(class_dir, exist_ok=True)
+    link = os.path.join(class_dir, name)
+    if not os.path.islink(link):
+        target = os.path.join(dest, os.path.relpath(device_dir, sysfs_root))
+        os.symlink(os.path.relpath(target, class_dir), link)
+
+
+def udev_id_path(devnum):
+    """ID_PATH udev stored for *devnum*, or None without a database entry"""
+    try:
+        with open(os.path.join(UDEV_DATA_DIR, f"c{devnum}")) as f:
+            for line in f:
+                if line.startswith("E:ID_PATH="):
+                    return line[len("E:ID_PATH="):].rstrip("\n")
+    except OSError:
+        return None
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show slot_key and USB attributes of serial ttys')
+    parser.add_argument('ttys', nargs='*', help='tty names or device nodes (default: all USB serial ttys)')
+    parser.add_argument('--sysfs', default=SYSFS_ROOT, help='sysfs root (default: /sys)')
+    parser.add_argument('--check', action='store_true',
+                        help="Compare id_path with udev's database; exit 1 on a mismatch")
+    parser.add_argument('--record', metavar='DIR', help='Copy the ttys\' sysfs entries into DIR')
+    args = parser.parse_args()
+
+    res = Resolver(args.sysfs)
+    ttys = args.ttys or sorted(os.path.basename(p) for pattern in TTY_PATTERNS
+                               for p in glob.glob(os.path.join(res.sysfs_root, "class", "tty", pattern)))
+
+    if args.record:
+        for tty in ttys:
+            record(tty, args.record, res.sysfs_root)
+            print(f"recorded {os.path.basename(tty)}")
+        return
+
+    result = {os.path.basename(t): res.lookup(t) for t in ttys}
+    if not args.check:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+
+    mismatches = 0
+    for tty, props in result.items():
+        if props is None:
+            print(f"{tty}: not in sysfs")
+            mismatches += 1
+            continue
+        expected = udev_id_path(props["devnum"])
+        if expected is None:
+            print(f"{tty}: no udev database entry, skipped")
+        elif expected == props["id_path"]:
+            print(f"{tty}: ok {props['id_path']}")
+        else:
+            print(f"{tty}: MISMATCH sysfs={props['id_path']!r} udev={expected!r}")
+            mismatches += 1
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
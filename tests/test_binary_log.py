@@ -0,0 +1,176 @@
+"""
+SerialLogger output read back: binary log records, the sparse time index
+and iter_log_range over plain and compressed files
+"""
+
+import io
+import os
+import sys
+import time
+
+import pytest
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pi')
+sys.path.insert(0, PI_DIR)
+
+import serial_proxy as sp  # noqa: E402
+
+INDEX_INTERVAL = 1024
+
+
+def drain(logger):
+    """Wait until the writer thread has taken every queued record"""
+    deadline = time.monotonic() + 5
+    while logger._queue and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def read_records(path, offset=0):
+    with open(path, 'rb') as f:
+        return list(sp.read_binary_log(f, offset))
+
+
+def read_index(path):
+    with open(sp.index_path(path), 'rb') as f:
+        data = f.read()
+    return list(sp._INDEX_ENTRY.iter_unpack(data))
+
+
+@pytest.fixture(params=['text', 'binary'])
+def recorded(request, tmp_path, monkeypatch):
+    """A log of 40 separately flushed batches, indexed every INDEX_INTERVAL bytes"""
+    monkeypatch.setattr(sp, 'LOG_INDEX_INTERVAL', INDEX_INTERVAL)
+    logger = sp.SerialLogger(tmp_path, 'ttyACM0', log_format=request.param, log_name='A')
+    for i in range(40):
+        logger.log_data(f'line {i:03d} '.encode() * 40 + b'\n', 'RX')
+        if i % 7 == 0:
+            logger.log_event(sp.EV_BAUD, 115200 + i)
+        drain(logger)
+        time.sleep(0.002)
+    logger.close()
+    return tmp_path, str(logger.log_path), request.param
+
+
+def full_scan(path, fmt, start, end):
+    """What iter_log_range must return, from reading the whole file"""
+    renderer = sp.TextRenderer()
+    if fmt == 'binary':
+        lines = []
+        for record in read_records(path):
+            if start <= record[0] <= end:
+                lines.extend(renderer.record(*record))
+        return lines
+    start_s, end_s = renderer.timestamp(start), renderer.timestamp(end)
+    with open(path, 'rb') as f:
+        return [raw.decode() for raw in f if start_s <= raw[1:24].decode() <= end_s]
+
+
+def test_binary_round_trip(tmp_path):
+    before = time.time()
+    logger = sp.SerialLogger(tmp_path, 'ttyACM0', log_format='binary', log_name='A')
+    every_byte = bytes(range(256))
+    logger.log_data(every_byte, 'RX')
+    logger.log_data(b'\xff\xfe\x00', 'TX')
+    logger.log_event(sp.EV_DTR, 'ON')
+    logger.log('a message')
+    logger.close()
+    after = time.time()
+
+    records = read_records(logger.log_path)
+    assert [r[1:] for r in records[1:5]] == [
+        ('RX', every_byte),
+        ('TX', b'\xff\xfe\x00'),
+        ('EVENT', (sp.EV_DTR, 'ON')),
+        ('INFO', 'a message'),
+    ]
+    assert records[0][1:] == ('INFO', '=== Log opened for A (ttyACM0) ===')
+    assert records[-1][1:] == ('INFO', '=== Log closed ===')
+    stamps = [r[0] for r in records]
+    assert stamps == sorted(stamps)
+    assert before - 1 <= stamps[0] and stamps[-1] <= after + 1
+
+    renderer = sp.TextRenderer()
+    out = io.StringIO()
+    sp.export_binary_log(logger.log_path, out)
+    assert out.getvalue() == ''.join(line for r in records for line in renderer.record(*r))
+    assert '[INFO] DTR ON' in out.getvalue()
+
+
+def test_truncated_tail_ends_quietly(tmp_path):
+    logger = sp.SerialLogger(tmp_path, 'ttyACM0', log_format='binary', log_name='A')
+    logger.log_data(b'complete', 'RX')
+    logger.close()
+    records = read_records(logger.log_path)
+    with open(logger.log_path, 'ab') as f:
+        f.write(sp._REC_HEADER.pack(0, sp.REC_RX, 100) + b'cut short')
+    assert read_records(logger.log_path) == records
+
+
+def test_not_a_binary_log(tmp_path):
+    path = tmp_path / 'A_2026-01-01.bin'
+    path.write_bytes(b'[2026-01-01 00:00:00.000] [RX] text\n')
+    with pytest.raises(ValueError):
+        read_records(path)
+
+
+def test_index_offsets_enter_the_stream(recorded):
+    _, path, fmt = recorded
+    entries = read_index(path)
+    assert len(entries) > 5
+    assert [e[0] for e in entries] == sorted(e[0] for e in entries)
+    if fmt == 'binary':
+        full = read_records(path)
+        for ts, offset in entries:
+            tail = read_records(path, offset)
+            # Every indexed offset is an anchor: reading from it gives the
+            # same records, with the same timestamps, as a full read
+            assert tail == full[len(full) - len(tail):]
+            assert tail[0][0] == ts
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+        for ts, offset in entries:
+            assert offset == 0 or data[offset - 1:offset] == b'\n'
+            assert data[offset:offset + 1] == b'['
+
+
+def test_index_lookup(recorded):
+    _, path, _ = recorded
+    entries = read_index(path)
+    assert sp.index_lookup(path, entries[0][0] - 1) == 0
+    for (ts, offset), (next_ts, _) in zip(entries, entries[1:]):
+        assert sp.index_lookup(path, ts) == offset
+        assert sp.index_lookup(path, (ts + next_ts) / 2) == offset
+    assert sp.index_lookup(path, entries[-1][0] + 100) == entries[-1][1]
+
+
+def windows(path):
+    """(start, end) ranges around the indexed positions"""
+    entries = read_index(path)
+    first, last = entries[0][0], entries[-1][0]
+    middle = entries[len(entries) // 2][0]
+    return [
+        (first - 10, last + 10),
+        (middle, last + 10),
+        (middle + 0.0005, entries[len(entries) // 2 + 2][0]),
+        (last + 5, last + 10),
+    ]
+
+
+def test_iter_log_range_matches_full_scan(recorded):
+    log_dir, path, fmt = recorded
+    for start, end in windows(path):
+        assert list(sp.iter_log_range(log_dir, 'A', start, end)) == full_scan(path, fmt, start, end)
+
+
+def test_iter_log_range_on_compressed_file(recorded):
+    log_dir, path, fmt = recorded
+    ranges = windows(path)
+    expected = [full_scan(path, fmt, start, end) for start, end in ranges]
+    janitor = sp.LogJanitor(log_dir, compress='gzip')
+    janitor.submit(path)
+    janitor.close()
+    janitor._thread.join(5)
+    assert os.path.exists(path + '.gz') and not os.path.exists(path)
+    for (start, end), lines in zip(ranges, expected):
+        assert list(sp.iter_log_range(log_dir, 'A', start, end)) == lines
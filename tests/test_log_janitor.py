@@ -0,0 +1,125 @@
+"""
+LogJanitor retention and compression on a shared log directory
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pi')
+sys.path.insert(0, PI_DIR)
+
+import serial_proxy as sp  # noqa: E402
+
+
+def make_file(path, size, age):
+    """*size* bytes at *path*, last modified *age* seconds ago"""
+    path.write_bytes(b'x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def wait_idle(janitor):
+    janitor.close()
+    janitor._thread.join(5)
+
+
+@pytest.fixture
+def logs(tmp_path):
+    """Two slots' closed segments, oldest first, 1000 bytes each"""
+    return [make_file(tmp_path / name, 1000, age) for name, age in (
+        ('A_2026-01-01.log', 500),
+        ('B_2026-01-01.log', 400),
+        ('A_2026-01-02.log', 300),
+        ('B_2026-01-02.log', 200),
+    )]
+
+
+def test_retention_deletes_oldest(tmp_path, logs):
+    janitor = sp.LogJanitor(tmp_path, retention_bytes=2500)
+    janitor.submit(None)
+    wait_idle(janitor)
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith('.')) == \
+        ['A_2026-01-02.log', 'B_2026-01-02.log']
+    assert janitor.deleted == 2
+
+
+def test_retention_keeps_files_open_by_a_logger(tmp_path, logs):
+    """Yesterday's file of a logger idle since midnight is still open"""
+    logger = sp.SerialLogger(tmp_path, 'ttyACM0', log_name='A')
+    oldest = logger._open_locked(logs[0])
+    try:
+        janitor = sp.LogJanitor(tmp_path, retention_bytes=2500)
+        janitor.submit(None)
+        wait_idle(janitor)
+        assert logs[0].exists()
+        assert not logs[1].exists()
+        assert not logs[2].exists()
+    finally:
+        oldest.close()
+        logger.close()
+
+
+def test_retention_skips_tmp_files(tmp_path, logs):
+    tmp = make_file(tmp_path / 'C_2026-01-01.log.gz.tmp', 1000, 1000)
+    janitor = sp.LogJanitor(tmp_path, retention_bytes=1)
+    janitor.submit(None)
+    wait_idle(janitor)
+    assert tmp.exists()
+    assert not any(p.exists() for p in logs)
+
+
+def test_concurrent_janitors_share_one_budget(tmp_path, logs):
+    janitors = [sp.LogJanitor(tmp_path, retention_bytes=2500) for _ in range(4)]
+    for janitor in janitors:
+        janitor.submit(None)
+    for janitor in janitors:
+        wait_idle(janitor)
+    assert [p.exists() for p in logs] == [False, False, True, True]
+    assert sum(j.deleted for j in janitors) == 2
+
+
+def test_compress_skips_open_file(tmp_path, logs):
+    logger = sp.SerialLogger(tmp_path, 'ttyACM0', log_name='A')
+    held = logger._open_locked(logs[0])
+    try:
+        janitor = sp.LogJanitor(tmp_path, compress='gzip')
+        janitor.submit(logs[0])
+        janitor.submit(logs[1])
+        wait_idle(janitor)
+        assert logs[0].exists()
+        assert not logs[1].exists()
+        assert (tmp_path / 'B_2026-01-01.log.gz').exists()
+        assert janitor.compressed == 1
+    finally:
+        held.close()
+        logger.close()
+
+
+def test_logger_reopens_file_deleted_while_waiting(tmp_path):
+    logger = sp.SerialLogger(tmp_path, 'ttyACM0', log_name='A')
+    path = tmp_path / 'A_2026-01-01.log'
+    path.write_text('old\n')
+    # A janitor holds the file and is about to delete it
+    fd = os.open(path, os.O_RDONLY)
+    assert sp._try_lock(fd)
+    opened = []
+    opener = threading.Thread(target=lambda: opened.append(logger._open_locked(path)))
+    opener.start()
+    try:
+        time.sleep(0.1)
+        assert not opened
+        os.unlink(path)
+    finally:
+        os.close(fd)
+        opener.join(5)
+    try:
+        assert path.exists()
+        assert os.fstat(opened[0].fileno()).st_ino == path.stat().st_ino
+    finally:
+        opened[0].close()
+        logger.close()
@@ -0,0 +1,194 @@
+"""
+Portal HTTP API against an in-process server: /api/devices revalidation
+and compression, and /api/events replay
+"""
+
+import gzip
+import http.client
+import http.server
+import json
+import os
+import sys
+import threading
+from collections import deque
+
+import pytest
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pi')
+sys.path.insert(0, PI_DIR)
+
+import portal  # noqa: E402
+
+
+def add_slot(key, label, port):
+    slot = portal._make_dynamic_slot(key)
+    slot['label'] = label
+    slot['tcp_port'] = port
+    portal.slots[key] = slot
+    portal.publish_slot(slot)
+    return slot
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Portal on an ephemeral port with fresh state and two slots (seq 1, 2)"""
+    monkeypatch.setattr(portal, 'slots', {})
+    monkeypatch.setattr(portal, 'seq_counter', 0)
+    monkeypatch.setattr(portal, 'events', deque(maxlen=portal.EVENT_HISTORY))
+    monkeypatch.setattr(portal, 'events_evicted', 0)
+    monkeypatch.setattr(portal, 'response_cache', {})
+    monkeypatch.setattr(portal, 'SSE_KEEPALIVE', 0.2)
+    monkeypatch.setattr(portal.Handler, 'log_message', lambda *args: None)
+    add_slot('usb-1.1', 'SLOT1', 4001)
+    add_slot('usb-1.2', 'SLOT2', 4002)
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), portal.Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('GET', path, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, dict(resp.getheaders()), resp.read()
+    finally:
+        conn.close()
+
+
+def read_events(port, path, count, headers=None):
+    """The first *count* SSE events of *path* as (id, event, data)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('GET', path, headers=headers or {})
+        resp = conn.getresponse()
+        assert resp.status == 200
+        assert resp.getheader('Content-Type') == 'text/event-stream'
+        received = []
+        fields = {}
+        while len(received) < count:
+            line = resp.readline().decode().rstrip('\n')
+            if line.startswith(':'):
+                continue
+            if line:
+                name, _, value = line.partition(': ')
+                fields[name] = value
+            elif fields:
+                received.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+                fields = {}
+        return received
+    finally:
+        conn.close()
+
+
+def test_devices_etag_and_304(server):
+    status, headers, body = get(server, '/api/devices')
+    assert status == 200
+    etag = headers['ETag']
+    assert etag == f'"{portal.BOOT_TAG}-2"'
+    assert [s['label'] for s in json.loads(body)['slots']] == ['SLOT1', 'SLOT2']
+
+    status, headers, body = get(server, '/api/devices', {'If-None-Match': etag})
+    assert (status, body) == (304, b'')
+    assert headers['ETag'] == etag
+    status, _, _ = get(server, '/api/devices', {'If-None-Match': f'"other", {etag}'})
+    assert status == 304
+
+    # A published change is a new body under a new tag
+    slot = portal.slots['usb-1.1']
+    slot['present'] = True
+    portal.publish_slot(slot)
+    status, headers, body = get(server, '/api/devices', {'If-None-Match': etag})
+    assert status == 200
+    assert headers['ETag'] != etag
+    assert json.loads(body)['slots'][0]['present'] is True
+
+
+def test_unpublished_change_keeps_the_tag(server):
+    _, headers, _ = get(server, '/api/devices')
+    slot = portal.slots['usb-1.1']
+    portal.publish_slot(slot)
+    status, _, _ = get(server, '/api/devices', {'If-None-Match': headers['ETag']})
+    assert status == 304
+
+
+def test_devices_gzip(server):
+    for i in range(3, 10):
+        add_slot(f'usb-1.{i}', f'SLOT{i}', 4000 + i)
+    status, plain_headers, plain = get(server, '/api/devices')
+    assert status == 200 and 'Content-Encoding' not in plain_headers
+    assert len(plain) >= portal.GZIP_MIN_SIZE
+
+    status, headers, body = get(server, '/api/devices', {'Accept-Encoding': 'gzip'})
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers['ETag'] == plain_headers['ETag']
+    assert int(headers['Content-Length']) == len(body) < len(plain)
+    assert gzip.decompress(body) == plain
+
+
+def test_small_body_is_not_compressed(server):
+    status, headers, body = get(server, '/api/info', {'Accept-Encoding': 'gzip'})
+    assert status == 200
+    assert len(body) < portal.GZIP_MIN_SIZE
+    assert 'Content-Encoding' not in headers
+
+
+def test_events_start_with_snapshot(server):
+    [(seq, kind, data)] = read_events(server, '/api/events', 1)
+    assert (seq, kind) == (2, 'snapshot')
+    assert data['seq'] == 2
+    assert [s['label'] for s in data['slots']] == ['SLOT1', 'SLOT2']
+
+
+@pytest.mark.parametrize('headers, path', [
+    ({}, '/api/events?since=0'),
+    ({'Last-Event-ID': '0'}, '/api/events'),
+])
+def test_events_replay_since(server, headers, path):
+    received = read_events(server, path, 2, headers)
+    assert [(seq, kind, data['slot']['label']) for seq, kind, data in received] == \
+        [(1, 'slot', 'SLOT1'), (2, 'slot', 'SLOT2')]
+
+
+def test_events_replay_then_follow(server):
+    slot = portal.slots['usb-1.2']
+    slot['running'] = True
+    timer = threading.Timer(0.3, portal.publish_slot, (slot,))
+    timer.start()
+    try:
+        received = read_events(server, '/api/events?since=1', 2)
+    finally:
+        timer.join()
+    assert [(seq, kind) for seq, kind, _ in received] == [(2, 'slot'), (3, 'slot')]
+    assert received[1][2]['changed'] == ['running']
+    assert received[1][2]['slot']['running'] is True
+
+
+def test_events_evicted_seq_gets_snapshot(server, monkeypatch):
+    monkeypatch.setattr(portal, 'events', deque(portal.events, maxlen=2))
+    slot = portal.slots['usb-1.1']
+    for i in range(3):
+        slot['restarts'] = i + 1
+        portal.publish_slot(slot)
+    assert portal.events_evicted == 3
+
+    [(seq, kind, data)] = read_events(server, '/api/events?since=2', 1)
+    assert (seq, kind, data['seq']) == (5, 'snapshot', 5)
+    received = read_events(server, '/api/events?since=3', 2)
+    assert [(seq, kind) for seq, kind, _ in received] == [(4, 'slot'), (5, 'slot')]
+
+
+def test_events_from_another_boot_get_snapshot(server):
+    [(seq, kind, _)] = read_events(server, '/api/events', 1, {'Last-Event-ID': '99'})
+    assert (seq, kind) == (2, 'snapshot')
+
+
+def test_events_bad_since(server):
+    status, _, body = get(server, '/api/events?since=abc')
+    assert status == 400
+    assert json.loads(body) == {'error': 'bad since'}
@@ -0,0 +1,108 @@
+"""
+RFC2217Parser on telnet streams cut at arbitrary recv() boundaries
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pi')
+sys.path.insert(0, PI_DIR)
+
+import serial_proxy as sp  # noqa: E402
+from serial_proxy import COM_PORT_OPTION, DO, IAC, SB, SE, SET_BAUDRATE, SET_CONTROL, WILL  # noqa: E402
+
+NOP = 241
+
+# What a pyserial rfc2217:// client sends while opening, mixed with data:
+# negotiation, subnegotiations (one with an escaped 0xFF in its payload),
+# escaped 0xFF in the data and a two-byte command
+STREAM = b''.join([
+    b'boot\r\n',
+    bytes([IAC, WILL, COM_PORT_OPTION]),
+    bytes([IAC, DO, COM_PORT_OPTION]),
+    b'\x00\x01',
+    bytes([IAC, SB, COM_PORT_OPTION, SET_BAUDRATE]), (115200).to_bytes(4, 'big'), bytes([IAC, SE]),
+    bytes([IAC, IAC]), b'mid', bytes([IAC, IAC, IAC, IAC]),
+    bytes([IAC, SB, COM_PORT_OPTION, SET_BAUDRATE, 0, IAC, IAC, 0, 0, IAC, SE]),
+    bytes([IAC, NOP]),
+    bytes([IAC, SB, COM_PORT_OPTION, SET_CONTROL, 8, IAC, SE]),
+    b'\xc0\x00\x08tail',
+])
+EXPECTED_DATA = b'boot\r\n\x00\x01\xffmid\xff\xff\xc0\x00\x08tail'
+EXPECTED_CALLS = [
+    ('neg', WILL, COM_PORT_OPTION),
+    ('neg', DO, COM_PORT_OPTION),
+    ('sb', COM_PORT_OPTION, bytes([SET_BAUDRATE]) + (115200).to_bytes(4, 'big')),
+    ('sb', COM_PORT_OPTION, bytes([SET_BAUDRATE, 0, IAC, 0, 0])),
+    ('sb', COM_PORT_OPTION, bytes([SET_CONTROL, 8])),
+]
+
+
+def make_parser():
+    calls = []
+    parser = sp.RFC2217Parser(lambda cmd, opt: calls.append(('neg', cmd, opt)),
+                              lambda opt, payload: calls.append(('sb', opt, payload)))
+    return parser, calls
+
+
+def feed_chunks(chunks):
+    parser, calls = make_parser()
+    data = b''.join(parser.feed(chunk) for chunk in chunks)
+    return data, calls, parser
+
+
+def test_whole_stream():
+    data, calls, parser = feed_chunks([STREAM])
+    assert data == EXPECTED_DATA
+    assert calls == EXPECTED_CALLS
+    assert parser.state == parser.DATA
+
+
+@pytest.mark.parametrize('cut', range(1, len(STREAM)))
+def test_split_in_two(cut):
+    data, calls, _ = feed_chunks([STREAM[:cut], STREAM[cut:]])
+    assert (data, calls) == (EXPECTED_DATA, EXPECTED_CALLS)
+
+
+def test_byte_by_byte():
+    data, calls, _ = feed_chunks([STREAM[i:i + 1] for i in range(len(STREAM))])
+    assert (data, calls) == (EXPECTED_DATA, EXPECTED_CALLS)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_chunks(seed):
+    rng = random.Random(seed)
+    chunks = []
+    pos = 0
+    while pos < len(STREAM):
+        size = rng.randint(1, 8)
+        chunks.append(STREAM[pos:pos + size])
+        pos += size
+    data, calls, _ = feed_chunks(chunks)
+    assert (data, calls) == (EXPECTED_DATA, EXPECTED_CALLS)
+
+
+def test_plain_chunk_is_not_copied():
+    parser, _ = make_parser()
+    chunk = b'no telnet here' * 100
+    assert parser.feed(chunk) is chunk
+
+
+def test_oversized_subnegotiation_is_truncated():
+    payload = bytes(range(200)) * 10
+    stream = bytes([IAC, SB, COM_PORT_OPTION]) + payload + bytes([IAC, SE]) + b'after'
+    data, calls, _ = feed_chunks([stream[:700], stream[700:]])
+    assert data == b'after'
+    assert calls == [('sb', COM_PORT_OPTION, payload[:sp.RFC2217Parser.MAX_SB])]
+
+
+def test_unterminated_subnegotiation_is_abandoned():
+    """IAC followed by anything but SE/IAC inside SB ends it and is parsed as a command"""
+    stream = bytes([IAC, SB, COM_PORT_OPTION, 1, 2, IAC, WILL, COM_PORT_OPTION]) + b'data'
+    for cut in range(1, len(stream)):
+        data, calls, _ = feed_chunks([stream[:cut], stream[cut:]])
+        assert data == b'data'
+        assert calls == [('neg', WILL, COM_PORT_OPTION)]
@@ -0,0 +1,215 @@
+"""
+usb_sysfs against recorded sysfs trees
+
+tests/fixtures/sysfs holds trees saved with ``usb_sysfs.py --record``:
+
+  pi3 - Raspberry Pi 3, USB behind the SoC's dwc_otg controller (platform)
+        ttyACM0: ESP32-S3 USB-Serial/JTAG on hub port 1.2
+        ttyUSB0: CP2102 on hub port 1.3
+  pi4 - Raspberry Pi 4, USB behind the VL805 xHCI on PCIe
+        ttyACM0: ESP32-C3 USB-Serial/JTAG on hub port 1.3
+        ttyUSB0: CH340 on hub port 1.4
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PI_DIR = os.path.join(ROOT, 'pi')
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'sysfs')
+sys.path.insert(0, PI_DIR)
+
+import usb_sysfs  # noqa: E402
+
+PI3_USB = 'devices/platform/soc/3f980000.usb/usb1/1-1'
+PI4_USB = 'devices/platform/scb/fd500000.pcie/pci0000:00/0000:00:00.0/0000:01:00.0/usb1/1-1'
+
+EXPECTED = {
+    ('pi3', 'ttyACM0'): {
+        'devnum': '166:0',
+        'devpath': f'/{PI3_USB}/1-1.2/1-1.2:1.0/tty/ttyACM0',
+        'id_path': 'platform-3f980000.usb-usb-0:1.2:1.0',
+        'slot_key': 'platform-3f980000.usb-usb-0:1.2:1.0',
+        'product': 'USB JTAG/serial debug unit',
+        'serial': 'F4:12:FA:4D:2E:10',
+        'manufacturer': 'Espressif',
+        'vid': '303a',
+        'pid': '1001',
+    },
+    ('pi3', 'ttyUSB0'): {
+        'devnum': '188:0',
+        'devpath': f'/{PI3_USB}/1-1.3/1-1.3:1.0/ttyUSB0/tty/ttyUSB0',
+        'id_path': 'platform-3f980000.usb-usb-0:1.3:1.0',
+        'slot_key': 'platform-3f980000.usb-usb-0:1.3:1.0',
+        'product': 'CP2102 USB to UART Bridge Controller',
+        'serial': '0001',
+        'manufacturer': 'Silicon Labs',
+        'vid': '10c4',
+        'pid': 'ea60',
+    },
+    ('pi4', 'ttyACM0'): {
+        'devnum': '166:0',
+        'devpath': f'/{PI4_USB}/1-1.3/1-1.3:1.0/tty/ttyACM0',
+        'id_path': 'platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.3:1.0',
+        'slot_key': 'platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.3:1.0',
+        'product': 'USB JTAG/serial debug unit',
+        'serial': '84:F7:03:3A:1B:20',
+        'manufacturer': 'Espressif',
+        'vid': '303a',
+        'pid': '1001',
+    },
+    ('pi4', 'ttyUSB0'): {
+        'devnum': '188:0',
+        'devpath': f'/{PI4_USB}/1-1.4/1-1.4:1.0/ttyUSB0/tty/ttyUSB0',
+        'id_path': 'platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.4:1.0',
+        'slot_key': 'platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.4:1.0',
+        'product': 'USB Serial',
+        'serial': '',
+        'manufacturer': 'QinHeng Electronics',
+        'vid': '1a86',
+        'pid': '7523',
+    },
+}
+
+
+def device_dir(tree, tty):
+    return os.path.realpath(os.path.join(FIXTURES, tree, 'class', 'tty', tty))
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    """Writable copy of the fixture trees"""
+    root = tmp_path / 'sysfs'
+    shutil.copytree(FIXTURES, root, symlinks=True)
+    return root
+
+
+@pytest.mark.parametrize('tree, tty', sorted(EXPECTED))
+def test_path_id(tree, tty):
+    sysfs_root = os.path.join(FIXTURES, tree)
+    assert usb_sysfs.path_id(device_dir(tree, tty), sysfs_root) == EXPECTED[tree, tty]['id_path']
+
+
+def test_path_id_outside_supported_buses(tmp_path):
+    virtual = tmp_path / 'devices' / 'virtual' / 'tty' / 'ttyS0'
+    virtual.mkdir(parents=True)
+    assert usb_sysfs.path_id(str(virtual), str(tmp_path)) == ''
+
+
+@pytest.mark.parametrize('tree, tty', sorted(EXPECTED))
+def test_usb_attributes(tree, tty):
+    """CDC ACM ttys sit on the interface, usb-serial ones one level deeper"""
+    expected = {k: EXPECTED[tree, tty][k] for k in usb_sysfs.USB_ATTRIBUTES}
+    sysfs_root = os.path.join(FIXTURES, tree)
+    assert usb_sysfs.usb_attributes(device_dir(tree, tty), sysfs_root) == expected
+
+
+@pytest.mark.parametrize('tree', ['pi3', 'pi4'])
+@pytest.mark.parametrize('devnode', ['/dev/ttyACM0', 'ttyACM0'])
+def test_lookup_names(tree, devnode):
+    resolver = usb_sysfs.Resolver(os.path.join(FIXTURES, tree))
+    assert resolver.lookup(devnode) == EXPECTED[tree, 'ttyACM0']
+
+
+def test_lookup_by_id_symlink(tmp_path):
+    by_id = tmp_path / 'serial' / 'by-id'
+    by_id.mkdir(parents=True)
+    link = by_id / 'usb-Silicon_Labs_CP2102_USB_to_UART_Bridge_Controller_0001-if00-port0'
+    link.symlink_to('../../ttyUSB0')
+    resolver = usb_sysfs.Resolver(os.path.join(FIXTURES, 'pi3'))
+    assert resolver.lookup(str(link)) == EXPECTED['pi3', 'ttyUSB0']
+
+
+def test_lookup_unknown_tty():
+    resolver = usb_sysfs.Resolver(os.path.join(FIXTURES, 'pi4'))
+    assert resolver.lookup('ttyACM7') is None
+
+
+def test_lookup_cache(sysfs):
+    resolver = usb_sysfs.Resolver(sysfs / 'pi4')
+    first = resolver.lookup('ttyACM0')
+    product = sysfs / 'pi4' / PI4_USB / '1-1.3' / 'product'
+    product.write_text('Replugged board\n')
+
+    assert resolver.lookup('ttyACM0') is first
+    assert resolver.lookup('ttyACM0', refresh=True)['product'] == 'Replugged board'
+
+
+def test_invalidate_devnum(sysfs):
+    resolver = usb_sysfs.Resolver(sysfs / 'pi4')
+    acm = resolver.lookup('ttyACM0')
+    usb = resolver.lookup('ttyUSB0')
+
+    resolver.invalidate('166:0')
+    assert resolver.lookup('ttyACM0') is not acm
+    assert resolver.lookup('ttyUSB0') is usb
+
+
+def test_invalidate_devpath(sysfs):
+    resolver = usb_sysfs.Resolver(sysfs / 'pi4')
+    acm = resolver.lookup('ttyACM0')
+    usb = resolver.lookup('ttyUSB0')
+
+    resolver.invalidate(devpath=EXPECTED['pi4', 'ttyUSB0']['devpath'])
+    assert resolver.lookup('ttyACM0') is acm
+    assert resolver.lookup('ttyUSB0') is not usb
+
+
+def test_invalidate_all(sysfs):
+    resolver = usb_sysfs.Resolver(sysfs / 'pi3')
+    acm = resolver.lookup('ttyACM0')
+    usb = resolver.lookup('ttyUSB0')
+
+    resolver.invalidate()
+    assert resolver.lookup('ttyACM0') is not acm
+    assert resolver.lookup('ttyUSB0') is not usb
+
+
+def test_reused_devnum_resolves_new_device(sysfs):
+    """A different board getting the same major:minor after invalidate()"""
+    root = sysfs / 'pi4'
+    resolver = usb_sysfs.Resolver(root)
+    assert resolver.lookup('ttyACM0')['slot_key'] == EXPECTED['pi4', 'ttyACM0']['slot_key']
+
+    # Unplug: ttyACM0 goes away; the next board on port 1.4's interface gets it
+    (root / 'class' / 'tty' / 'ttyACM0').unlink()
+    target = root / PI4_USB / '1-1.4' / '1-1.4:1.0' / 'ttyUSB0' / 'tty' / 'ttyUSB0'
+    (root / 'class' / 'tty' / 'ttyACM0').symlink_to(os.path.relpath(target, root / 'class' / 'tty'))
+    (target / 'dev').write_text('166:0\n')
+
+    assert resolver.lookup('ttyACM0')['slot_key'] == EXPECTED['pi4', 'ttyACM0']['slot_key']
+    resolver.invalidate('166:0')
+    assert resolver.lookup('ttyACM0')['slot_key'] == EXPECTED['pi4', 'ttyUSB0']['slot_key']
+
+
+@pytest.mark.parametrize('tree', ['pi3', 'pi4'])
+def test_record_round_trip(tree, tmp_path):
+    """--record on a tree, then --sysfs on the copy, gives the same answers"""
+    source = os.path.join(FIXTURES, tree)
+    dest = tmp_path / 'recorded'
+    for tty in ('ttyACM0', 'ttyUSB0'):
+        usb_sysfs.record(tty, str(dest), source)
+
+    resolver = usb_sysfs.Resolver(dest)
+    for tty in ('ttyACM0', 'ttyUSB0'):
+        assert resolver.lookup(tty) == EXPECTED[tree, tty]
+
+    out = subprocess.run([sys.executable, os.path.join(PI_DIR, 'usb_sysfs.py'), '--sysfs', str(dest)],
+                         check=True, capture_output=True, text=True).stdout
+    assert json.loads(out) == {tty: EXPECTED[tree, tty] for tty in ('ttyACM0', 'ttyUSB0')}
+
+
+def test_record_cli(tmp_path):
+    dest = tmp_path / 'recorded'
+    script = os.path.join(PI_DIR, 'usb_sysfs.py')
+    source = os.path.join(FIXTURES, 'pi4')
+    subprocess.run([sys.executable, script, '--sysfs', source, '--record', str(dest), 'ttyACM0'],
+                   check=True, capture_output=True)
+    out = subprocess.run([sys.executable, script, '--sysfs', str(dest), 'ttyACM0'],
+                         check=True, capture_output=True, text=True).stdout
+    assert json.loads(out) == {'ttyACM0': EXPECTED['pi4', 'ttyACM0']}
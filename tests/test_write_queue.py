@@ -0,0 +1,156 @@
+"""
+WriteQueue against a sink that accepts partial writes, and ScrollbackBuffer
+"""
+
+import os
+import sys
+
+import pytest
+
+PI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pi')
+sys.path.insert(0, PI_DIR)
+
+import serial_proxy as sp  # noqa: E402
+
+
+class Sink:
+    """Non-blocking writer accepting *room* bytes until refilled"""
+
+    def __init__(self, room=0):
+        self.room = room
+        self.data = bytearray()
+        self.calls = []
+
+    def __call__(self, buffers):
+        self.calls.append(len(buffers))
+        if self.room == 0:
+            raise BlockingIOError
+        accepted = 0
+        for buf in buffers:
+            take = min(len(buf), self.room - accepted)
+            self.data += bytes(buf[:take])
+            accepted += take
+            if accepted == self.room:
+                break
+        self.room -= accepted
+        return accepted
+
+
+def test_write_through_when_empty():
+    sink = Sink(room=1000)
+    wq = sp.WriteQueue(sink, limit=100)
+    assert wq.push(b'hello') == 0
+    assert sink.data == b'hello'
+    assert len(wq) == 0
+    assert wq.stats()['written'] == 5
+    assert wq.stats()['stalls'] == 0
+
+
+def test_partial_write_queues_the_rest():
+    sink = Sink(room=3)
+    wq = sp.WriteQueue(sink, limit=100)
+    assert wq.push(b'0123456789') == 0
+    assert sink.data == b'012'
+    assert len(wq) == 7
+    assert wq.stats()['stalled'] == 7
+    assert wq.stats()['stalls'] == 1
+
+    # Queued data keeps its order ahead of new pushes
+    wq.push(b'abc')
+    assert sink.data == b'012'
+
+    sink.room = 4
+    assert not wq.flush()
+    assert sink.data == b'0123456'
+    sink.room = 100
+    assert wq.flush()
+    assert sink.data == b'0123456789abc'
+    assert len(wq) == 0
+    assert wq.stats()['written'] == 13
+
+
+@pytest.mark.parametrize('room', [1, 2, 5, 7, 64])
+def test_drains_in_order_for_any_write_size(room):
+    sink = Sink()
+    wq = sp.WriteQueue(sink, limit=10000)
+    chunks = [bytes([i]) * (i % 7 + 1) for i in range(100)]
+    for chunk in chunks:
+        wq.push(chunk)
+    while True:
+        sink.room = room
+        if wq.flush():
+            break
+    assert sink.data == b''.join(chunks)
+    assert wq.stats()['dropped'] == 0
+
+
+def test_flush_batches_at_most_iov_max_buffers():
+    sink = Sink()
+    wq = sp.WriteQueue(sink, limit=10000)
+    for i in range(sp.IOV_MAX * 2 + 1):
+        wq.push(b'x')
+    sink.room = 10000
+    sink.calls.clear()
+    assert wq.flush()
+    assert sink.calls == [sp.IOV_MAX, sp.IOV_MAX, 1]
+
+
+def test_limit_drops_and_counts():
+    sink = Sink()
+    wq = sp.WriteQueue(sink, limit=10)
+    assert wq.push(b'123456') == 0
+    assert wq.push(b'789abc') == 2
+    assert len(wq) == 10
+    assert wq.push(b'z') == 1
+    stats = wq.stats()
+    assert stats['dropped'] == 3
+    assert stats['peak'] == 10
+
+    sink.room = 100
+    assert wq.flush()
+    assert sink.data == b'123456789a'
+
+
+def test_blocking_sink_counts_a_stall():
+    sink = Sink()
+    wq = sp.WriteQueue(sink, limit=10)
+    wq.push(b'abc')
+    stalls = wq.stats()['stalls']
+    assert not wq.flush()
+    assert wq.stats()['stalls'] == stalls + 1
+    assert len(wq) == 3
+
+
+def test_clear_counts_pending_as_dropped():
+    wq = sp.WriteQueue(Sink(), limit=10)
+    wq.push(b'abcd')
+    wq.clear()
+    assert len(wq) == 0
+    assert wq.stats()['dropped'] == 4
+
+
+def test_scrollback_keeps_the_tail():
+    ring = sp.ScrollbackBuffer(8)
+    ring.write(b'abc')
+    assert ring.snapshot() == b'abc'
+    ring.write(b'defgh')
+    assert ring.snapshot() == b'abcdefgh'
+    # Wraps around the end of the storage
+    ring.write(b'ijk')
+    assert ring.snapshot() == b'defghijk'
+    # A chunk larger than the ring leaves only its tail
+    ring.write(b'0123456789')
+    assert ring.snapshot() == b'23456789'
+    assert ring.total == 21
+    assert len(ring) == 8
+
+
+@pytest.mark.parametrize('size', [1, 5, 16])
+def test_scrollback_matches_stream_tail(size):
+    ring = sp.ScrollbackBuffer(size)
+    stream = b''
+    for i in range(40):
+        chunk = bytes([65 + i % 26]) * (i % 6 + 1)
+        ring.write(chunk)
+        stream += chunk
+        assert ring.snapshot() == stream[-size:]